@@ -1,57 +1,208 @@
-import pandas as pd
-from google import genai
-from google.genai import types
 import os
 from dotenv import load_dotenv
 import json
 import csv
 import logging
+import concurrent.futures
+import asyncio
+import weakref
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+# Shared helpers (response cache, ...) live in University_Data/common
+COMMON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common")
+sys.path.append(COMMON_DIR)
+
+from model_calls import generate_with_cache, generate_with_cache_async
+from call_policy import call_stats, call_timeout_seconds
+from run_journal import RunJournal, make_run_id
+from result_store import get_result_store
+from telemetry import run_tagged, run_tagged_async
+from university_registry import get_registry, resolve_university, website_prompt
+from field_registry import (
+    COLUMN_MAPPING, FIELDS_BY_NAME, FINAL_COLUMNS, SECTIONS,
+    format_batched_answer, parse_json_from_response, section_fields,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Configure the client (using google-genai SDK 1.57.0)
-client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+# The google-genai client (SDK 1.57.0) is created on first use, so importing this module
+# (e.g. from the web backend) neither loads the SDK nor needs GOOGLE_API_KEY
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+    return _client
+
+def __getattr__(name):
+    # Keeps `from Institution import client` working without creating it at import time
+    if name == "client":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Wrapper for compatibility with existing code structure
 class GeminiModelWrapper:
     def __init__(self, client, model_name):
-        self.client = client
+        self._client = client
         self.model_name = model_name
 
-    def generate_content(self, prompt):
-        # Configure the search tool for every call to ensure live data
-        google_search_tool = types.Tool(
-            google_search=types.GoogleSearch()
-        )
-        
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[google_search_tool]
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    def generate_content(self, prompt, fresh_after=None):
+        def send():
+            from google.genai import types
+
+            # Configure the search tool for every call to ensure live data
+            google_search_tool = types.Tool(
+                google_search=types.GoogleSearch()
             )
-        )
-        return response
+
+            return self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    tools=[google_search_tool],
+                    http_options=types.HttpOptions(timeout=int(call_timeout_seconds() * 1000))
+                )
+            )
+
+        # Identical (model, tools, prompt) calls are answered from the on-disk response cache
+        return generate_with_cache(prompt, self.model_name, "google_search", send, fresh_after)
+
+# Maximum number of async model calls in flight at once (override with GEMINI_ASYNC_CONCURRENCY)
+ASYNC_MAX_CONCURRENCY = int(os.getenv("GEMINI_ASYNC_CONCURRENCY", "100"))
+
+# Async counterpart of GeminiModelWrapper, built on the SDK's native async client (client.aio)
+class AsyncGeminiModelWrapper:
+    def __init__(self, client, model_name, max_concurrency=None):
+        self._client = client
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency or ASYNC_MAX_CONCURRENCY
+        # asyncio semaphores belong to one event loop, so keep one per loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    @property
+    def client(self):
+        return self._client or get_client()
+
+    async def generate_content(self, prompt, fresh_after=None):
+        async def send():
+            from google.genai import types
+
+            google_search_tool = types.Tool(
+                google_search=types.GoogleSearch()
+            )
+
+            async with self._semaphore():
+                return await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(
+                        tools=[google_search_tool],
+                        http_options=types.HttpOptions(timeout=int(call_timeout_seconds() * 1000))
+                    )
+                )
+
+        return await generate_with_cache_async(prompt, self.model_name, "google_search", send, fresh_after)
 
 # Initialize the model wrapper
-model = GeminiModelWrapper(client, "gemini-2.5-pro")
+model = GeminiModelWrapper(None, "gemini-2.5-pro")
+async_model = AsyncGeminiModelWrapper(None, "gemini-2.5-pro")
+
+# Number of field lookups run in parallel per institution (override with INSTITUTION_MAX_WORKERS)
+MAX_WORKERS = int(os.getenv("INSTITUTION_MAX_WORKERS", "8"))
+
+# Ask for a whole section in one JSON prompt instead of one prompt per field
+BATCHED_SECTIONS = os.getenv("INSTITUTION_BATCHED_SECTIONS", "0") == "1"
 
 # Logic moved to process_institution_extraction
 
+def generate_text(prompt, fresh_after=None):
+    """
+    Model answer for prompt without markdown; raises once the call policy gives up.
+    Answers cached before fresh_after (a time.time() value) are asked again.
+    """
+    response = model.generate_content(prompt, fresh_after)
+    if response and response.text:
+        return response.text.replace("**", "").replace("```", "").strip()
+    return ""
+
+async def generate_text_async(prompt, fresh_after=None):
+    """Async version of generate_text."""
+    response = await async_model.generate_content(prompt, fresh_after)
+    if response and response.text:
+        return response.text.replace("**", "").replace("```", "").strip()
+    return ""
+
 def generate_text_safe(prompt):
     try:
-        response = model.generate_content(prompt)
-        if response and response.text:
-            return response.text.replace("**", "").replace("```", "").strip()
+        return generate_text(prompt)
     except Exception as e:
         logger.error(f"Error generating content: {e}")
     return ""
- 
- # Default values (will be overridden by function args)
 
+async def generate_text_safe_async(prompt):
+    try:
+        return await generate_text_async(prompt)
+    except Exception as e:
+        logger.error(f"Error generating content: {e}")
+    return ""
+
+def describe_failure(error):
+    """How a failed model call is recorded in the JSON output."""
+    return {"error_type": type(error).__name__, "error": str(error)}
+
+# Sentences every per-field prompt repeats; a batched prompt states them once
+BOILERPLATE_PREFIXES = ("no fabrication", "only if", "only return", "only refer", "also provide the evidence")
+
+def strip_prompt_boilerplate(prompt):
+    """Reduce a per-field prompt to its question and answer-format instructions."""
+    sentences = re.split(r'(?<=[.?!])\s*(?=[A-Z])', prompt)
+    kept = [s.strip() for s in sentences if s.strip() and not s.strip().lower().startswith(BOILERPLATE_PREFIXES)]
+    return " ".join(" ".join(kept).split())
+
+def build_section_prompt(university_name, website_url, questions):
+    """Build one prompt asking for every field of a section as a single JSON object."""
+    field_lines = "\n".join(f"- {field}: {question}" for field, question in questions.items())
+    return (
+        f"You are extracting information about the university {university_name} from its official website {website_url}.\n\n"
+        "Answer each of the questions below. No fabrication or guessing: only use information that is explicitly "
+        "stated on the official website or its pages. If the answer is not explicitly stated, use null as the value.\n\n"
+        f"Questions (field name: question):\n{field_lines}\n\n"
+        "Return a single JSON object keyed by the field names above. Each value must be an object with the keys "
+        "'value' (only the answer, in the format the question asks for, or null) and 'evidence' (the correct URL or "
+        "page where the answer is explicitly stated, or null). Do not return [Cite] in the response."
+    )
+
+def parse_section_response(response_text, questions):
+    """Map a batched section response back to per-field response texts."""
+    parsed = parse_json_from_response(response_text) if response_text else None
+    if not isinstance(parsed, dict):
+        return {}
+    return {field: format_batched_answer(parsed[field]) for field in questions if field in parsed}
 
 def extract_clean_value(response_text):
     """
@@ -92,1181 +243,770 @@ def extract_clean_value(response_text):
     # Return the cleaned text
     return text if text else None
 
-# New fields at the top
-def get_womens_college(website_url, university_name):
-    prompt = (
-        f"Is the university {university_name}, {website_url} a women's college? "
-        "Return only 'yes' or 'no', no other text. "
-        "No fabrication or guessing, just yes or no. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_cost_of_living_min(website_url, university_name):
-    prompt = (
-        f"What is the minimum cost of living for students at the university {university_name} ,{website_url}? "
-        "Return only the minimum cost of living amount, no other text. "
-        "No fabrication or guessing, just the minimum cost of living. "
-        "Only if the minimum cost of living is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the minimum cost of living is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_cost_of_living_max(website_url, university_name):
-    prompt = (
-        f"What is the maximum cost of living for students at the university {university_name}, {website_url}? "
-        "Return only the maximum cost of living amount, no other text. "
-        "No fabrication or guessing, just the maximum cost of living. "
-        "Only if the maximum cost of living is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the maximum cost of living is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_orientation_available(website_url, university_name):
-    prompt = (
-        f"Is orientation available for students at the university {university_name}, {website_url}? "
-        "Return only 'yes' or 'no', no other text. "
-        "No fabrication or guessing, just yes or no. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_college_tour_after_admissions(website_url, university_name):
-    prompt = (
-        f"Does the university {university_name}, {website_url} offer in-person college tours after admissions? "
-        "Return only 'yes' or 'no', no other text. "
-        "No fabrication or guessing, just yes or no. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_university_name(website_url, university_name):
-    prompt = (
-        f"What is the name of the university {university_name} for the website {website_url}? "
-        "Return only the name of the university, no other text. "
-        "No fabrication or guessing, just the name of the university. "
-        "Only if the name of the university is explicitly stated in the website, "
-        "otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where "
-        "the name of the university is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_college_setting(website_url, university_name):
-    prompt = (
-        f"What is the college setting for the university {university_name}, {website_url}? "
-        "Return only the college setting, no other text. "
-        "example: urban, suburban, rural, etc. "
-        "No fabrication or guessing, just the college setting. "
-        "Only if the college setting is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the college setting is explicitly stated."
-    )
-
-    return generate_text_safe(prompt)
+def extract_evidence(response_text):
+    """The evidence URLs cited in an AI response, in order of appearance."""
+    if not response_text:
+        return []
+    urls = re.findall(r"https?://[^\s)\]>\"'*`,]+", response_text)
+    return list(dict.fromkeys(url.rstrip('.') for url in urls))
 
-def get_type_of_institution(website_url, university_name):
-    prompt = (
-        f"What is the type of institution for the university {university_name}, {website_url}? "
-        "Return only the type of institution, no other text. "
-        "No fabrication or guessing, just the type of institution. "
-        "Only if the type of institution is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the type of institution is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_student_faculty(website_url, university_name):
-    prompt = (
-        f"What is the student faculty ratio for the university {university_name}, {website_url}? "
-        "Return only the student faculty, no other text. "
-        "No fabrication or guessing, just the student faculty ratio. "
-        "Only if the student faculty ratio is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the student faculty ratio is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_number_of_campuses(website_url, university_name):
-    prompt = (
-        f"What is the number of campuses for the university {university_name}, {website_url}? "
-        "Return only the number of campuses, no other text. "
-        "No fabrication or guessing, just the number of campuses. "
-        "Only if the number of campuses is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the number of campuses is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_faculty_available(website_url, university_name):
-    prompt = (
-        f"What is the total number of faculty available for the university {university_name}, {website_url}? "
-        "Return only the total number of faculty available, no other text. "
-        "No fabrication or guessing, just the total number of faculty available. "
-        "Only if the total number of faculty available is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of faculty available is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_programs_available(website_url, university_name):
-    prompt = (
-        f"What is the total number of programs available for the university {university_name}, {website_url}? "
-        "Return only the total number of programs available, no other text. "
-        "No fabrication or guessing, just the total number of programs available. "
-        "Only if the total number of programs available is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of programs available is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_students_enrolled(website_url, university_name):
-    prompt = (
-        f"What is the total number of students enrolled in the university {university_name}, {website_url} till date? "
-        "Return only the total number of students enrolled, no other text. "
-        "No fabrication or guessing, just the total number of students enrolled. "
-        "Only if the total number of students enrolled is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of students enrolled is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_graduate_programs(website_url, university_name):
-    prompt = (
-        f"What is the total number of graduate programs offered by the university {university_name}, {website_url}? "
-        "Return only the total number of graduate programs, no other text. "
-        "No fabrication or guessing, just the total number of graduate programs. "
-        "Only if the total number of graduate programs is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of graduate programs is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_international_students(website_url, university_name):
-    prompt = (
-        f"What is the total number of international students currently enrolled in the university {university_name}, {website_url}? "
-        "Return only the total number of international students, no other text. "
-        "No fabrication or guessing, just the total number of international students. "
-        "Only if the total number of international students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of international students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_students(website_url, university_name):
-    prompt = (
-        f"What is the total number of students enrolled in the university {university_name}, {website_url}? "
-        "Return only the total number of students, no other text. "
-        "No fabrication or guessing, just the total number of students. "
-        "Only if the total number of students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_total_undergrad_majors(website_url, university_name):
-    prompt = (
-        f"What is the total number of undergrad majors offered by the university {university_name}, {website_url}? "
-        "Return only the total number of undergrad majors, no other text. "
-        "No fabrication or guessing, just the total number of undergrad majors. "
-        "Only if the total number of undergrad majors is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of undergrad majors is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_countries_represented(website_url, university_name):
-    prompt = (
-        f"How many countries students are represented by the university {university_name}, {website_url}? "
-        "Return only the countries count, no other text. "
-        "No fabrication or guessing, just the countries represented. "
-        "Only if the countries represented is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the countries represented is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_street(website_url, university_name):
-    prompt = (
-        f"What is the street address for the university {university_name}, {website_url}? "
-        "Return only just the street address, no other text. do not return extra address like city, state, country etc."
-        "No fabrication or guessing, just the address. "
-        "Only if the address is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the address is explicitly stated."
-    )
-    return generate_text_safe(prompt)
+class QueryPlan:
+    """
+    Query plan for one run, built from the field registry. The prompts of every field are
+    known up front (its own question, or the questions of the fields it is derived from),
+    so identical prompts are sent once and each field is computed locally from the shared
+    answers. Constant fields and fields in saved ({section: {field: value}}, kept from an
+    earlier run) send no prompt. With fresh_after (a refresh run), the prompts that are sent
+    skip answers cached before that time.
+    """
+    def __init__(self, context, saved=None, fresh_after=None):
+        self.context = context
+        self.saved = saved or {}
+        self.fresh_after = fresh_after
+        self.sections = [(message, section_key, section_fields(section_key)) for section_key, message in SECTIONS]
+        self.prompts = {}
+        self.owners = {}
+        for _, section_key, specs in self.sections:
+            for spec in specs:
+                if spec.name in self.saved.get(section_key, {}):
+                    continue
+                prompts = self.field_prompts(spec)
+                if prompts:
+                    self.prompts[(section_key, spec.name)] = prompts
+                for prompt in prompts:
+                    self.owners.setdefault(prompt, []).append((section_key, spec.name))
+
+    def call_tags(self, prompt=None, section_key=None):
+        """Telemetry tags of a model call: the field that asks prompt, or a section's batched call."""
+        field = f"batch:{section_key}" if prompt is None else self.owners[prompt][0][1]
+        return {"pipeline": "institution", "university": self.context["university_name"], "field": field}
+
+    def field_prompts(self, spec):
+        if spec.question is not None:
+            return [spec.prompt(self.context)]
+        return [FIELDS_BY_NAME[name].prompt(self.context) for name in spec.depends_on]
+
+    def section_prompts(self, section_key, specs):
+        """Unique prompts needed to fill one section, in field order."""
+        prompts = []
+        for spec in specs:
+            prompts.extend(p for p in self.prompts.get((section_key, spec.name), []) if p not in prompts)
+        return prompts
+
+    def batch_questions(self, section_key, specs):
+        """Fields of a section that can go into one batched prompt: their own question, asked by no other field."""
+        questions = {}
+        for spec in specs:
+            prompts = self.prompts.get((section_key, spec.name))
+            if spec.question is not None and prompts and len(self.owners[prompts[0]]) == 1:
+                questions[spec.name] = prompts[0]
+        return questions
+
+    def resolve(self, section_key, specs, answers):
+        """Compute the field values of a section from {prompt: response text}."""
+        saved = self.saved.get(section_key, {})
+        results = {}
+        for spec in specs:
+            if spec.name in saved:
+                results[spec.name] = saved[spec.name]
+            elif spec.question is not None:
+                results[spec.name] = answers.get(spec.prompt(self.context), "")
+            elif spec.derive is not None:
+                dependencies = {
+                    name: answers.get(FIELDS_BY_NAME[name].prompt(self.context), "") for name in spec.depends_on
+                }
+                results[spec.name] = spec.derive(dependencies, self.context)
+            else:
+                results[spec.name] = spec.constant
+        return results
+
+    def ready_fields(self, answers, streamed):
+        """(section, field, value) of the fields not in streamed whose prompts are all in answers."""
+        ready = []
+        for _, section_key, specs in self.sections:
+            for spec in specs:
+                if (section_key, spec.name) in streamed:
+                    continue
+                if all(prompt in answers for prompt in self.prompts.get((section_key, spec.name), [])):
+                    ready.append((section_key, spec.name, self.resolve(section_key, [spec], answers)[spec.name]))
+        return ready
+
+    def failed_fields(self, section_key, specs, failures):
+        """{field: failure} for the fields of a section that depend on a failed model call."""
+        failed = {}
+        for spec in specs:
+            for prompt in self.prompts.get((section_key, spec.name), []):
+                if prompt in failures:
+                    failed[spec.name] = failures[prompt]
+                    break
+        return failed
+
+    def log_summary(self):
+        asked = sum(len(prompts) for prompts in self.prompts.values())
+        logger.info(f"Query plan: {len(self.prompts)} fields, {asked} questions, {len(self.owners)} unique model calls")
+
+
+def ask_section_batched(questions, university_name, website_url, fresh_after=None):
+    """Ask {field: prompt} in one batched prompt; returns {prompt: response text} for the fields answered."""
+    section_prompt = build_section_prompt(
+        university_name, website_url,
+        {field: strip_prompt_boilerplate(prompt) for field, prompt in questions.items()}
+    )
+    answers = parse_section_response(generate_text(section_prompt, fresh_after), questions)
+    return {questions[field]: text for field, text in answers.items()}
+
+
+async def ask_section_batched_async(questions, university_name, website_url, fresh_after=None):
+    """Async version of ask_section_batched."""
+    section_prompt = build_section_prompt(
+        university_name, website_url,
+        {field: strip_prompt_boilerplate(prompt) for field, prompt in questions.items()}
+    )
+    answers = parse_section_response(await generate_text_async(section_prompt, fresh_after), questions)
+    return {questions[field]: text for field, text in answers.items()}
+
+
+def submit_query_plan(executor, plan, university_name, website_url, batched=False):
+    """
+    Submit every model call of the plan up front so independent questions run in parallel.
+    Returns (batch futures by section, futures by prompt).
+    """
+    batch_futures = {}
+    prompt_futures = {}
+    for _, section_key, specs in plan.sections:
+        batched_prompts = set()
+        if batched:
+            questions = plan.batch_questions(section_key, specs)
+            if questions:
+                batch_futures[section_key] = executor.submit(
+                    run_tagged, plan.call_tags(section_key=section_key),
+                    ask_section_batched, questions, university_name, website_url, plan.fresh_after
+                )
+                batched_prompts = set(questions.values())
+        for prompt in plan.section_prompts(section_key, specs):
+            if prompt not in batched_prompts and prompt not in prompt_futures:
+                prompt_futures[prompt] = executor.submit(
+                    run_tagged, plan.call_tags(prompt), generate_text, prompt, plan.fresh_after
+                )
+    return batch_futures, prompt_futures
+
+
+def collect_section_answers(executor, plan, section_key, specs, batch_futures, prompt_futures):
+    """
+    Wait for the answers one section needs; returns ({prompt: text}, {prompt: failure}).
+    A field the batched answer left out (or a failed batched call) is asked on its own, so
+    a malformed batched response never silently drops a field.
+    """
+    answers = {}
+    failures = {}
+    if section_key in batch_futures:
+        try:
+            answers.update(batch_futures[section_key].result())
+        except Exception as e:
+            logger.error(f"Batched call for {section_key} failed, asking its fields one by one: {e}")
+    for prompt in plan.section_prompts(section_key, specs):
+        if prompt in answers:
+            continue
+        if prompt not in prompt_futures:
+            prompt_futures[prompt] = executor.submit(
+                run_tagged, plan.call_tags(prompt), generate_text, prompt, plan.fresh_after
+            )
+        try:
+            answers[prompt] = prompt_futures[prompt].result()
+        except Exception as e:
+            logger.error(f"Error generating content: {e}")
+            answers[prompt] = ""
+            failures[prompt] = describe_failure(e)
+    return answers, failures
+
+
+def section_futures(plan, section_key, specs, batch_futures, prompt_futures):
+    """The submitted calls (futures or tasks) one section waits for."""
+    futures = {prompt_futures[prompt] for prompt in plan.section_prompts(section_key, specs) if prompt in prompt_futures}
+    if section_key in batch_futures:
+        futures.add(batch_futures[section_key])
+    return futures
+
+
+def completed_answers(batch_futures, prompt_futures):
+    """{prompt: response text} of the calls (futures or tasks) that have already succeeded."""
+    answers = {}
+    for future in batch_futures.values():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            answers.update(future.result())
+    for prompt, future in prompt_futures.items():
+        if future.done() and not future.cancelled() and future.exception() is None:
+            answers[prompt] = future.result()
+    return answers
+
+
+def field_update(section_key, field, value, failure=None):
+    """SSE event for one extracted field: its cleaned value, evidence URLs and CSV column."""
+    return json.dumps({
+        "status": "field",
+        "section": section_key,
+        "field": field,
+        "column": COLUMN_MAPPING.get(field, field),
+        "value": extract_clean_value(value) if isinstance(value, str) else value,
+        "evidence": extract_evidence(value) if isinstance(value, str) else [],
+        "failure": failure,
+    }, ensure_ascii=False, default=str)
+
+
+def ready_field_updates(plan, batch_futures, prompt_futures, streamed):
+    """Field events for the fields (of any section) whose answers have all arrived and that were not streamed yet."""
+    updates = []
+    for section_key, field, value in plan.ready_fields(completed_answers(batch_futures, prompt_futures), streamed):
+        streamed.add((section_key, field))
+        updates.append(field_update(section_key, field, value))
+    return updates
+
+
+def section_field_updates(section_key, specs, results, failed, streamed):
+    """Field events for the fields of a resolved section that were not streamed yet (failed or asked late)."""
+    updates = []
+    for spec in specs:
+        if (section_key, spec.name) not in streamed:
+            streamed.add((section_key, spec.name))
+            updates.append(field_update(section_key, spec.name, results[spec.name], failed.get(spec.name)))
+    return updates
+
+
+def complete_update(section_results, section_failures, files, batch_id=None):
+    """Final event: the output files and the full flat record (the CSV row) inline."""
+    return json.dumps({
+        "status": "complete",
+        "failed_fields": sum(len(fields) for fields in section_failures.values()),
+        "files": files,
+        "record": institution_row(section_results, batch_id),
+    }, ensure_ascii=False, default=str)
+
+
+def institution_output_path(university_name, extension):
+    """Path of the csv/xlsx/json output for a university in Inst_outputs."""
+    # Sanitize university name for filename (replace spaces with underscores, remove special characters)
+    safe_university_name = university_name.replace(" ", "_").replace("/", "_").replace("\\", "_")
+    # Use absolute path based on the script location to ensure consistency
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(script_dir, "Inst_outputs")
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"{safe_university_name}_Institution.{extension}")
 
 
+def institution_row(section_results, batch_id=None):
+    """
+    The CSV/Excel row of one university: every section merged into one flat record, values
+    cleaned with extract_clean_value (no evidence, URLs or extra text), renamed to the final
+    column names and ordered as FINAL_COLUMNS (missing columns are empty).
+    """
+    flat_data = {}
+    for section_key, _ in SECTIONS:
+        for field, value in (section_results.get(section_key) or {}).items():
+            flat_data[COLUMN_MAPPING.get(field, field)] = extract_clean_value(value) if isinstance(value, str) else value
+    row = {column: flat_data.get(column, '') for column in FINAL_COLUMNS}
+    if batch_id:
+        row['BatchId'] = batch_id
+    return row
 
-def get_county(website_url, university_name):
-    prompt = (
-        f"What county is the university {university_name}, {website_url} located in? "
-        "Return only the county name, no other text. "
-        "No fabrication or guessing, just the county name. "
-        "Only if the county is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the county is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_city(website_url, university_name):
-    prompt = (
-        f"What city is the university {university_name}, {website_url} located in? "
-        "Return only the city name, no other text. "
-        "No fabrication or guessing, just the city name. "
-        "Only if the city is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the city is explicitly stated."
-    )
-    return generate_text_safe(prompt)
 
+def write_csv_output(csv_filename, row):
+    with open(csv_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FINAL_COLUMNS)
+        writer.writeheader()
+        writer.writerow(row)
 
-def get_state(website_url, university_name):
-    prompt = (
-        f"What state is the university {university_name}, {website_url} located in? "
-        "Return only the state name, no other text. "
-        "No fabrication or guessing, just the state name. "
-        "Only if the state is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the state is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_country(website_url, university_name):
-    prompt = (
-        f"What country is the university {university_name}, {website_url} located in? "
-        "Return only the country name, no other text. "
-        "No fabrication or guessing, just the country name. "
-        "Only if the country is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the country is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_zip_code(website_url, university_name):
-    prompt = (
-        f"What is the zip code for the university {university_name}, {website_url}? "
-        "Return only the zip code, no other text. "
-        "No fabrication or guessing, just the zip code. "
-        "Only if the zip code is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the zip code is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_application_requirements(website_url, university_name):
-    prompt = (
-        f"What are the application requirements for the university {university_name}, {website_url}? "
-        "Return only the application requirements, no other text. "
-        "No fabrication or guessing, just the application requirements. "
-        "Only if the application requirements is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the application requirements is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_contact_information(website_url, university_name):
-    prompt = (
-        f"What is the contact information for the university {university_name}, {website_url}? "
-        "Return only the contact information, no other text. "
-        "No fabrication or guessing, just the contact information. "
-        "Only if the contact information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the contact information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
 
+def write_json_output(json_filename, all_data):
+    with open(json_filename, 'w', encoding='utf-8') as f:
+        json.dump(all_data, f, ensure_ascii=False, indent=4)
 
 
-def get_grad_tuition(website_url, university_name, graduate_tuition_fee_urls=None, common_tuition_fee_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = graduate_tuition_fee_urls if graduate_tuition_fee_urls else (common_tuition_fee_urls if common_tuition_fee_urls else website_url)
-    prompt = (
-        f"What is the graduate tuition for the university {university_name} at {url_to_use}? "
-        "Return only the graduate tuition, no other text. "
-        "No fabrication or guessing, just the graduate tuition. "
-        "Only if the graduate tuition is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the graduate tuition is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_grad_international_students(website_url, university_name):
-    prompt = (
-        f"What is the number of graduate international students for the university {university_name}, {website_url}? "
-        "Return only the number of graduate international students, no other text. "
-        "No fabrication or guessing, just the number of graduate international students. "
-        "Only if the number of graduate international students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the number of graduate international students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_grad_scholarship_high(website_url, university_name, graduate_financial_aid_urls=None, common_financial_aid_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = graduate_financial_aid_urls if graduate_financial_aid_urls else (common_financial_aid_urls if common_financial_aid_urls else website_url)
-    prompt = (
-        f"What is the highest graduate scholarship for the university {university_name} at {url_to_use}? "
-        "Return only the highest graduate scholarship, no other text. "
-        "No fabrication or guessing, just the highest graduate scholarship. "
-        "Only if the highest graduate scholarship is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the highest graduate scholarship is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_logo_path(website_url, university_name):
-    prompt = (
-        f"What is the logo path or URL for the university {university_name}, {website_url}? "
-        "Return only the logo path or URL, no other text. "
-        "No fabrication or guessing, just the logo path. "
-        "Only if the logo path is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the logo path is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_phone(website_url, university_name):
-    prompt = (
-        f"What is the main phone number for the university {university_name}, {website_url}? "
-        "Return only the phone number, no other text. "
-        "No fabrication or guessing, just the phone number. "
-        "Only if the phone number is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the phone number is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_email(website_url, university_name):
-    prompt = (
-        f"What is the main contact email address for the university {university_name}, {website_url}? "
-        " If there is no main contact email address, find the admissions email address."
-        "Return only the email address, no other text. "
-        "No fabrication or guessing, just the email address. "
-        "Only if the email address is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the email address is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_secondary_email(website_url, university_name):
-    prompt = (
-        f"What is the secondary email address for the university {university_name}, {website_url}? "
-        "Return only the secondary email address, no other text. "
-        "No fabrication or guessing, just the secondary email address. "
-        "Only if the secondary email address is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the secondary email address is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_website_url(website_url, university_name):
-    prompt = (
-        f"What is the official website URL for the university {university_name}, {website_url}? "
-        "Return only the website URL, no other text. "
-        "No fabrication or guessing, just the website URL. "
-        "Only if the website URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the website URL is explicitly stated."
-        "the return response should be http or https URL"
-    )
-    return generate_text_safe(prompt)
-
-def get_admission_office_url(website_url, university_name):
-    prompt = (
-        f"What is the admission office URL for the university {university_name}, {website_url}? "
-        "Return only the admission office URL, no other text. "
-        "No fabrication or guessing, just the admission office URL. "
-        "Only if the admission office URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the admission office URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_virtual_tour_url(website_url, university_name):
-    prompt = (
-        f"What is the virtual tour URL for the university {university_name}, {website_url}? "
-        "Return only the virtual tour URL, no other text. "
-        "No fabrication or guessing, just the virtual tour URL. "
-        "Only if the virtual tour URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the virtual tour URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_financial_aid_url(website_url, university_name):
-    prompt = (
-        f"What is the financial aid URL for the university {university_name}, {website_url}? "
-        "Return only the financial aid URL, no other text. "
-        "No fabrication or guessing, just the financial aid URL. "
-        "Only if the financial aid URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the financial aid URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_application_fees(website_url, university_name):
-    prompt = (
-        f"Find the application fee for both domestic and international applicants for the university {university_name}, {website_url}? "
-        "Return a line of text with the application fee for both domestic and international applicants, no other text. " 
-        "Do not return the text like 'The application fee for graduate programs is not explicitly stated for domestic applicants on the university's website'. In this case just return what you find so far in the website. If you don't find something then don't explicitly mention in the return response."
-        "No fabrication or guessing, just the application fee for both domestic and international applicants."
-        "Example of the return response: 'The application fee for both domestic and international applicants is $amount. (or) The application fee for domestic applicants is $amount and for international applicants is $amount. '"
-        "Only if the application fees are explicitly stated in the website, otherwise return null. "
-        "Do not return [Cite] in the return response."
-        "Only refer the {website_url} or the {university_name}.edu or it's sub domains or it's pages to find the application fees."
-        "Do not refer any other third party websites to find the application fees."
-        "Also provide the evidence for your answer with correct URL or page where the application fees are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_test_policy(website_url, university_name):
-    prompt = (
-        f"Find a line of text about test policy for both undergraduate and graduate programs for the university {university_name}, {website_url}? "
-        "Return only the test policy, no other text. "
-        "No fabrication or guessing, just a short line of text not a long paragraph. "
-        "Only return the test policy if it is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the test policy is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_courses_and_grades(website_url, university_name):
-    prompt = (
-        f"What are the courses and grades requirements for the university {university_name}, {website_url}? "
-        "Return only the courses and grades requirements, no other text. "
-        "No fabrication or guessing, just the courses and grades requirements. "
-        "Only return the courses and grades requirements if they are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the courses and grades requirements are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_recommendations(website_url, university_name):
-    prompt = (
-        f"How many recommendations are required to apply for both undergraduate and graduate programs for the university {university_name}, {website_url}? "
-        "Return only the recommendation requirements, no other text. "
-        "No fabrication or guessing, just the recommendation requirements. "
-        "Only return the recommendation requirements if they are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the recommendation requirements are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_personal_essay(website_url, university_name):
-    prompt = (
-        f"Does applying to the university {university_name}, {website_url} require a personal essay? "
-        "If yes, return Required. if not, return Not Required. no extra text "
-        "No fabrication or guessing, just the personal essay requirements. "
-        "Only if the personal essay requirements are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the personal essay requirements are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_writing_sample(website_url, university_name):
-    prompt = (
-        f"Does applying to the university {university_name}, {website_url} require a writing sample? "
-        "If yes, return Required. if not, return Not Required. no extra text "
-        "No fabrication or guessing, just the writing sample requirements. "
-        "Only if the writing sample requirements are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the writing sample requirements are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_additional_information(website_url, university_name):
-    prompt = (
-        f"Is there any additional information required to apply to the university {university_name}, {website_url}? "
-        "If yes, return a short line of text about the additional information requirements. if not, return null. no extra text "
-        "No fabrication or guessing, just the additional information requirements. "
-        "Only if the additional information requirements are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the additional information requirements are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_additional_deadlines(website_url, university_name):
-    prompt = (
-        f"What are the additional deadlines of {university_name}, {website_url} apart from application deadlines? "
-        "The deadlines can be scholarships, financial aid, or other deadlines. "
-        "Return only the additional deadlines like scholarships, financial aid, or other deadlines, no other text. "
-        "No fabrication or guessing, just the additional deadlines. "
-        "Only if the additional deadlines are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the additional deadlines are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_multiple_applications_allowed(website_url, university_name):
-    prompt = (
-        f"Can a student apply to multiple programs at the university {university_name}, {website_url}? "
-        "Check through the website or its pages to find the answer. "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_act_required(website_url, university_name):
-    prompt = (
-        f"Is ACT scorerequired for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_analytical_not_required(website_url, university_name):
-    prompt = (
-        f"Is analytical writing not required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_analytical_optional(website_url, university_name):
-    prompt = (
-        f"Is analytical writing optional for the university {university_name}, {website_url}? "
-        "Check through the website or its pages to find the answer. "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_duolingo_required(website_url, university_name):
-    prompt = (
-        f"Is Duolingo required for the university {university_name}, {website_url}? "
-        "Check through the website or its pages to find the answer. "
-        "Does international students need to take Duolingo?"
-        "If the website explicitly states that the university does not require Duolingo, return 'False'. "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_els_required(website_url, university_name):
-    prompt = (
-        f"Is ELS required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_english_not_required(website_url, university_name):
-    prompt = (
-        f"Is English proficiency not required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_english_optional(website_url, university_name):
-    prompt = (
-        f"Is English proficiency test optional for the university {university_name}, {website_url}? "
-        "if the website explicitly states the international student does not need to take English proficiency test, return 'True'. "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_gmat_or_gre_required(website_url, university_name):
-    prompt = (
-        f"Is GMAT or GRE required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_gmat_required(website_url, university_name):
-    prompt = (
-        f"Is GMAT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_gre_required(website_url, university_name):
-    prompt = (
-        f"Is GRE score required for the university {university_name}, {website_url} to apply for any program for the international students? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_ielts_required(website_url, university_name):
-    prompt = (
-        f"Is IELTS score required for the university {university_name}, {website_url} to apply for any program for the international students? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_lsat_required(website_url, university_name):
-    prompt = (
-        f"Is LSAT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_mat_required(website_url, university_name):
-    prompt = (
-        f"Is MAT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_mcat_required(website_url, university_name):
-    prompt = (
-        f"Is MCAT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_pte_required(website_url, university_name):
-    prompt = (
-        f"Is PTE required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_sat_required(website_url, university_name):
-    prompt = (
-        f"Is SAT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_is_toefl_ib_required(website_url, university_name):
-    prompt = (
-        f"Is TOEFL iBT required for the university {university_name}, {website_url}? "
-        "Return only 'True' or 'False', no other text. "
-        "No fabrication or guessing, just True or False. "
-        "Only if this information is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_tuition_fees(website_url, university_name, common_tuition_fee_urls=None):
-    # Use common URL if provided, else use website_url
-    url_to_use = common_tuition_fee_urls if common_tuition_fee_urls else website_url
-    prompt = (
-        f"What are the tuition fees for the university {university_name} at {url_to_use}? "
-        "Please find the average tution fee for the international students for both the undergraduate and graduate programs. "
-        "The answer should be like this: 'Undergraduate (Full-Time): ~$7,438 per year (Resident), ~$19,318 (Non-Resident/Supplemental Tuition).Graduate (Full-Time): ~$8,872 per year (Resident), ~$18,952 (Non-Resident/Supplemental Tuition).' "
-        "Return exactly how the above format is. "
-        "No fabrication or guessing, just the answer you find in the website. or it's pages. "
-        "Only if the tuition fees are explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the tuition fees are explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_facebook(website_url, university_name):
-    prompt = (
-        f"What is the Facebook URL for the university {university_name}, {website_url}? "
-        "Return only the Facebook URL, no other text. "
-        "No fabrication or guessing, just the Facebook URL. "
-        "Only if the Facebook URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the Facebook URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_instagram(website_url, university_name):
-    prompt = (
-        f"What is the Instagram URL for the university {university_name}, {website_url}? "
-        "Return only the Instagram URL, no other text. "
-        "No fabrication or guessing, just the Instagram URL. "
-        "Only if the Instagram URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the Instagram URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_twitter(website_url, university_name):
-    prompt = (
-        f"What is the Twitter URL for the university {university_name}, {website_url}? "
-        "Return only the Twitter URL, no other text. "
-        "No fabrication or guessing, just the Twitter URL. "
-        "Only if the Twitter URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the Twitter URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_youtube(website_url, university_name):
-    prompt = (
-        f"What is the YouTube URL for the university {university_name}, {website_url}? "
-        "Return only the YouTube URL, no other text. "
-        "No fabrication or guessing, just the YouTube URL. "
-        "Only if the YouTube URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the YouTube URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_tiktok(website_url, university_name):
-    prompt = (
-        f"What is the TikTok URL for the university {university_name}, {website_url}? "
-        "Return only the TikTok URL, no other text. "
-        "No fabrication or guessing, just the TikTok URL. "
-        "Only if the TikTok URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the TikTok URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_linkedin(website_url, university_name):
-    prompt = (
-        f"What is the LinkedIn URL for the university {university_name}, {website_url}? "
-        "Return only the LinkedIn URL, no other text. "
-        "No fabrication or guessing, just the LinkedIn URL. "
-        "Only if the LinkedIn URL is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the LinkedIn URL is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_grad_avg_tuition(website_url, university_name, graduate_tuition_fee_urls=None, common_tuition_fee_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = graduate_tuition_fee_urls if graduate_tuition_fee_urls else (common_tuition_fee_urls if common_tuition_fee_urls else website_url)
-    prompt = (
-        f"What is the average graduate tuition for the university {university_name} at {url_to_use}? "
-        "Please look at the tution fees page for the university and it's pages and look for the average graduate tuition per year"
-        "Return only the average graduate tuition, no other text. "
-        "No fabrication or guessing, just the average graduate tuition. "
-        "Only if the average graduate tuition is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the average graduate tuition is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_grad_scholarship_low(website_url, university_name, graduate_financial_aid_urls=None, common_financial_aid_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = graduate_financial_aid_urls if graduate_financial_aid_urls else (common_financial_aid_urls if common_financial_aid_urls else website_url)
-    prompt = (
-        f"What is the lowest graduate scholarship for the university {university_name} at {url_to_use}? "
-        "Return only the lowest graduate scholarship, no other text. "
-        "No fabrication or guessing, just the lowest graduate scholarship. "
-        "Only if the lowest graduate scholarship is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the lowest graduate scholarship is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_grad_total_students(website_url, university_name):
-    prompt = (
-        f"What is the total number of graduate students at the university {university_name}, {website_url}? "
-        "Return only the total number of graduate students, no other text. "
-        "No fabrication or guessing, just the total number of graduate students. "
-        "Only if the total number of graduate students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of graduate students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_ug_avg_tuition(website_url, university_name, undergraduate_tuition_fee_urls=None, common_tuition_fee_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = undergraduate_tuition_fee_urls if undergraduate_tuition_fee_urls else (common_tuition_fee_urls if common_tuition_fee_urls else website_url)
-    prompt = (
-        f"What is the average undergraduate tuition for the university {university_name} at {url_to_use}? "
-        "Return only the average undergraduate tuition, no other text. "
-        "No fabrication or guessing, just the average undergraduate tuition. "
-        "Only if the average undergraduate tuition is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the average undergraduate tuition is explicitly stated."
-    )
+# Output files are written off the extraction thread, concurrently with each other
+_output_writers = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="output-writer")
 
-    return generate_text_safe(prompt)
 
-def get_ug_international_students(website_url, university_name):
-    prompt = (
-        f"What is the number of undergraduate international students for the university {university_name}, {website_url}? "
-        "Return only the number of undergraduate international students, no other text. "
-        "No fabrication or guessing, just the number of undergraduate international students. "
-        "Only if the number of undergraduate international students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the number of undergraduate international students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_ug_scholarship_high(website_url, university_name, undergraduate_financial_aid_urls=None, common_financial_aid_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = undergraduate_financial_aid_urls if undergraduate_financial_aid_urls else (common_financial_aid_urls if common_financial_aid_urls else website_url)
-    prompt = (
-        f"What is the highest undergraduate scholarship for the university {university_name} at {url_to_use}? "
-        "Return only the highest undergraduate scholarship, no other text. "
-        "The value can be in percentage or amount. "
-        "No fabrication or guessing, just the highest undergraduate scholarship. "
-        "Only if the highest undergraduate scholarship is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the highest undergraduate scholarship is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_ug_scholarship_low(website_url, university_name, undergraduate_financial_aid_urls=None, common_financial_aid_urls=None):
-    # Use specific URL if provided, else use common URL, else use website_url
-    url_to_use = undergraduate_financial_aid_urls if undergraduate_financial_aid_urls else (common_financial_aid_urls if common_financial_aid_urls else website_url)
-    prompt = (
-        f"What is the lowest scholarship that can be awarded to undergraduate students at the university {university_name} at {url_to_use}? "
-        "The value can be in percentage or amount. "
-        "Return only the lowest undergraduate scholarship, no other text. "
-        "No fabrication or guessing, just the lowest undergraduate scholarship. "
-        "Only if the lowest undergraduate scholarship is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the lowest undergraduate scholarship is explicitly stated."
-    )
-    return generate_text_safe(prompt)
-
-def get_ug_total_students(website_url, university_name):
-    prompt = (
-        f"What is the total number of undergraduate students at the university {university_name}, {website_url}? "
-        "Return only the total number of undergraduate students, no other text. "
-        "No fabrication or guessing, just the total number of undergraduate students. "
-        "Only if the total number of undergraduate students is explicitly stated in the website, otherwise return null. "
-        "Also provide the evidence for your answer with correct URL or page where the total number of undergraduate students is explicitly stated."
-    )
-    return generate_text_safe(prompt)
+def save_institution_outputs(university_name, section_results, failures=None, batch_id=None, field_times=None):
+    """
+    Write the CSV and JSON outputs for one university from its section results.
+    The Excel workbook is not written here: ensure_excel_output builds it from the JSON on
+    first download.
+    failures ({section: {field: failure}}) is stored in the JSON so a rerun can target those fields.
+    batch_id fills the BatchId column when the university is part of a batch run.
+    field_times ({section: {field: time}}) records when each value was extracted, for refresh runs.
+    The flat record is also kept in the result store, where /api/institutions serves it.
+    Returns the (csv, excel, json) file paths.
+    """
+    #combine the data into one dict
+    all_data = {section_key: section_results[section_key] for section_key, _ in SECTIONS}
+    all_data.update({
+        "extraction_failures": failures or {},
+        "failed_field_count": sum(len(fields) for fields in (failures or {}).values()),
+        "extracted_at": utc_timestamp(),
+        "field_extracted_at": field_times or {},
+    })
+    if batch_id:
+        all_data["batch_id"] = batch_id
+
+    # The CSV only has the final columns with their cleaned values; the JSON keeps
+    # everything (values, evidence, urls, failures)
+    csv_filename = institution_output_path(university_name, "csv")
+    excel_filename = institution_output_path(university_name, "xlsx")
+    json_filename = institution_output_path(university_name, "json")
+    row = institution_row(section_results, batch_id)
+    writes = [
+        _output_writers.submit(write_csv_output, csv_filename, row),
+        _output_writers.submit(write_json_output, json_filename, all_data),
+    ]
+    for write in writes:
+        write.result()
+    try:
+        get_result_store().put(
+            university_name, row, all_data["extracted_at"], all_data["failed_field_count"],
+            {"csv": csv_filename, "excel": excel_filename, "json": json_filename}
+        )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not store the {university_name} result for the read API: {e}")
 
+    print(f"Saved cleaned {university_name} data to {csv_filename} and {json_filename} (Excel is built on first download).")
+    return csv_filename, excel_filename, json_filename
 
-def process_institution_extraction(
-    university_name, 
-    undergraduate_tuition_fee_urls=None, 
-    graduate_tuition_fee_urls=None, 
-    undergraduate_financial_aid_urls=None, 
-    graduate_financial_aid_urls=None,
-    common_financial_aid_urls=None,
-    common_tuition_fee_urls=None
-):
-    print(f"Processing {university_name}...")
-    yield '{"status": "progress", "message": "Initializing extraction..."}'
-    
-    # 1. Get Website URL
-    yield f'{{"status": "progress", "message": "Finding official website for {university_name}..."}}'
-    prompt = f"What is the official university website for {university_name}?"
-    website_url = generate_text_safe(prompt)
-    print(f"Found Website URL: {website_url}")
 
-    # New fields at the top
-    yield '{"status": "progress", "message": "Extracting general information..."}'
-    new_fields_data = {
-        "womens_college": get_womens_college(website_url, university_name),
-        "cost_of_living_min": get_cost_of_living_min(website_url, university_name),
-        "cost_of_living_max": get_cost_of_living_max(website_url, university_name),
-        "orientation_available": get_orientation_available(website_url, university_name),
-        "college_tour_after_admissions": get_college_tour_after_admissions(website_url, university_name),
-    }
+_excel_locks = {}
+_excel_locks_lock = threading.Lock()
 
-    yield '{"status": "progress", "message": "Extracting university metrics..."}'
-    university_data = {
-        "university_name": get_university_name(website_url, university_name),
-        "college_setting": get_college_setting(website_url, university_name),
-        "type_of_institution": get_type_of_institution(website_url, university_name),
-        "student_faculty": get_student_faculty(website_url, university_name),
-        "number_of_campuses": get_number_of_campuses(website_url, university_name),
-        "total_faculty_available": get_total_faculty_available(website_url, university_name),
-        "total_programs_available": get_total_programs_available(website_url, university_name),
-        "total_students_enrolled": get_total_students_enrolled(website_url, university_name),
-        "total_graduate_programs": get_total_graduate_programs(website_url, university_name),
-        "total_international_students": get_total_international_students(website_url, university_name),
-        "total_students": get_total_students(website_url, university_name),
-        "total_undergrad_majors": get_total_undergrad_majors(website_url, university_name),
-        "countries_represented": get_countries_represented(website_url, university_name),
-    }
 
-    yield '{"status": "progress", "message": "Extracting address details..."}'
-    address_data = {
-        "street1": get_street(website_url, university_name),
-        "street2": None,  # This would need a separate function if needed
-        "county": get_county(website_url, university_name),
-        "city": get_city(website_url, university_name),
-        "state": get_state(website_url, university_name),
-        "country": get_country(website_url, university_name),
-        "zip_code": get_zip_code(website_url, university_name),
-    }
+def ensure_excel_output(excel_filename):
+    """
+    Build the Excel output of a run from its JSON output (same name, .json) the first time it
+    is requested, and reuse it while it is newer than the JSON.
+    Raises FileNotFoundError if there is no JSON output and ImportError without openpyxl.
+    """
+    json_filename = os.path.splitext(excel_filename)[0] + ".json"
+    with _excel_locks_lock:
+        lock = _excel_locks.setdefault(excel_filename, threading.Lock())
+    with lock:
+        if os.path.exists(excel_filename) and os.path.getmtime(excel_filename) >= os.path.getmtime(json_filename):
+            return excel_filename
+        with open(json_filename, 'r', encoding='utf-8') as f:
+            all_data = json.load(f)
+
+        import pandas as pd
+
+        df = pd.DataFrame([institution_row(all_data, all_data.get("batch_id"))], columns=FINAL_COLUMNS)
+        # Build next to the target and rename, so a half-written workbook is never served
+        tmp_filename = f"{excel_filename}.{os.getpid()}.{threading.get_ident()}.tmp.xlsx"
+        try:
+            df.to_excel(tmp_filename, index=False, engine='openpyxl')
+            os.replace(tmp_filename, excel_filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+    return excel_filename
+
+
+def utc_timestamp(seconds=None):
+    """ISO 8601 UTC time, as stored in the field_extracted_at map of the JSON output."""
+    return datetime.fromtimestamp(time.time() if seconds is None else seconds, timezone.utc).isoformat(timespec="seconds")
+
+
+def latest_institution_result(university_name):
+    """
+    The latest stored result of a university ({university_name, record, failed_fields,
+    files, extracted_at}), or None. Outputs written before the result store existed are
+    imported from their JSON file on first lookup.
+    """
+    store = get_result_store()
+    result = store.get(university_name)
+    if result is not None:
+        return result
+    json_filename = institution_output_path(university_name, "json")
+    if not os.path.exists(json_filename):
+        return None
+    try:
+        with open(json_filename, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read previous output {json_filename}: {e}")
+        return None
+    section_results = {section_key: previous.get(section_key) or {} for section_key, _ in SECTIONS}
+    store.put(
+        university_name,
+        institution_row(section_results, previous.get("batch_id")),
+        previous.get("extracted_at") or utc_timestamp(os.path.getmtime(json_filename)),
+        previous.get("failed_field_count", 0),
+        {
+            "csv": institution_output_path(university_name, "csv"),
+            "excel": institution_output_path(university_name, "xlsx"),
+            "json": json_filename,
+        },
+    )
+    return store.get(university_name)
 
-    yield '{"status": "progress", "message": "Extracting application requirements..."}'
-    application_data = {
-        "application_requirements": get_application_requirements(website_url, university_name),
-        "application_fees": get_application_fees(website_url, university_name),
-        "test_policy": get_test_policy(website_url, university_name),
-        "courses_and_grades": get_courses_and_grades(website_url, university_name),
-        "recommendations": get_recommendations(website_url, university_name),
-        "personal_essay": get_personal_essay(website_url, university_name),
-        "writing_sample": get_writing_sample(website_url, university_name),
-        "additional_information": get_additional_information(website_url, university_name),
-        "additional_deadlines": get_additional_deadlines(website_url, university_name),
-        "tuition_fees": get_tuition_fees(website_url, university_name, common_tuition_fee_urls),
-    }
 
-    yield '{"status": "progress", "message": "Extracting contact information..."}'
-    contact_data = {
-        "contact_information": get_contact_information(website_url, university_name),
-        "logo_path": get_logo_path(website_url, university_name),
-        "phone": get_phone(website_url, university_name),
-        "email": get_email(website_url, university_name),
-        "secondary_email": get_secondary_email(website_url, university_name),
-        "website_url": get_website_url(website_url, university_name),
-        "admission_office_url": get_admission_office_url(website_url, university_name),
-        "virtual_tour_url": get_virtual_tour_url(website_url, university_name),
-        "financial_aid_url": get_financial_aid_url(website_url, university_name),
-    }
+def field_expired(field, extracted_at, now):
+    """True when a value extracted at extracted_at (ISO time) is older than the TTL of its field's volatility."""
+    spec = FIELDS_BY_NAME.get(field)
+    return spec is None or now - datetime.fromisoformat(extracted_at).timestamp() > spec.ttl_seconds()
 
-    yield '{"status": "progress", "message": "Extracting social media links..."}'
-    social_media_data = {
-        "facebook": get_facebook(website_url, university_name),
-        "instagram": get_instagram(website_url, university_name),
-        "twitter": get_twitter(website_url, university_name),
-        "youtube": get_youtube(website_url, university_name),
-        "tiktok": get_tiktok(website_url, university_name),
-        "linkedin": get_linkedin(website_url, university_name),
-    }
 
-    yield '{"status": "progress", "message": "Extracting student statistics..."}'
-    student_statistics_data = {
-        "grad_avg_tuition": get_grad_avg_tuition(website_url, university_name, graduate_tuition_fee_urls, common_tuition_fee_urls),
-        "grad_international_students": get_grad_international_students(website_url, university_name),
-        "grad_scholarship_high": get_grad_scholarship_high(website_url, university_name, graduate_financial_aid_urls, common_financial_aid_urls),
-        "grad_scholarship_low": get_grad_scholarship_low(website_url, university_name, graduate_financial_aid_urls, common_financial_aid_urls),
-        "grad_total_students": get_grad_total_students(website_url, university_name),
-        "ug_avg_tuition": get_ug_avg_tuition(website_url, university_name, undergraduate_tuition_fee_urls, common_tuition_fee_urls),
-        "ug_international_students": get_ug_international_students(website_url, university_name),
-        "ug_scholarship_high": get_ug_scholarship_high(website_url, university_name, undergraduate_financial_aid_urls, common_financial_aid_urls),
-        "ug_scholarship_low": get_ug_scholarship_low(website_url, university_name, undergraduate_financial_aid_urls, common_financial_aid_urls),
-        "ug_total_students": get_ug_total_students(website_url, university_name),
+def carry_forward_fields(university_name, refresh=False):
+    """
+    For a rerun: the values of the previous output that can be kept, as
+    ({section: {field: value}}, {section: {field: extraction time}}). Failed fields are
+    always looked up again; with refresh, so are fields that came back empty and fields
+    older than the TTL of their volatility. Kept values carry their original evidence.
+    """
+    json_filename = institution_output_path(university_name, "json")
+    if not os.path.exists(json_filename):
+        return {}, {}
+    try:
+        with open(json_filename, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read previous output {json_filename}, running every field: {e}")
+        return {}, {}
+
+    # Outputs written before per-field times were recorded are dated by the file itself
+    default_time = previous.get("extracted_at") or utc_timestamp(os.path.getmtime(json_filename))
+    failures = previous.get("extraction_failures", {})
+    field_times = previous.get("field_extracted_at", {})
+    now = time.time()
+    saved = {}
+    times = {}
+    stale = 0
+    for section_key, _ in SECTIONS:
+        failed = failures.get(section_key, {})
+        saved[section_key] = {}
+        times[section_key] = {}
+        for field, value in (previous.get(section_key) or {}).items():
+            if field in failed:
+                continue
+            extracted_at = field_times.get(section_key, {}).get(field, default_time)
+            if refresh:
+                empty = extract_clean_value(value) is None if isinstance(value, str) else value is None
+                if empty or field_expired(field, extracted_at, now):
+                    stale += 1
+                    continue
+            saved[section_key][field] = value
+            times[section_key][field] = extracted_at
+    if refresh:
+        logger.info(f"Refreshing {stale} empty or expired and {previous.get('failed_field_count', 0)} failed fields from {json_filename}")
+    else:
+        logger.info(f"Retrying {previous.get('failed_field_count', 0)} failed fields from {json_filename}")
+    return saved, times
+
+
+def resume_run(university_name, retry_failed, refresh, **url_overrides):
+    """
+    Journal of this run plus the field values it can skip: the values completed by an
+    interrupted run with the same inputs, on top of the values carried forward from the
+    previous output when retry_failed or refresh is set. Journal values older than the TTL
+    of their field's volatility (an interrupted run left behind long ago) are asked again.
+    url_overrides are the effective ones (after registered_url_overrides), so runs that send
+    the same prompts share a journal.
+    Returns (journal, saved, extraction times of the saved values, number of resumed fields).
+    """
+    journal = RunJournal("institution", university_name, make_run_id(university_name, **url_overrides))
+    saved, times = carry_forward_fields(university_name, refresh) if retry_failed or refresh else ({}, {})
+    now = time.time()
+    resumed = 0
+    expired = 0
+    for section_key, records in journal.completed_records().items():
+        for field, record in records.items():
+            extracted_at = utc_timestamp(record["at"])
+            if field_expired(field, extracted_at, now):
+                expired += 1
+                continue
+            saved.setdefault(section_key, {})[field] = record["value"]
+            times.setdefault(section_key, {})[field] = extracted_at
+            resumed += 1
+    if expired:
+        logger.info(f"Asking {expired} fields of the interrupted run in {journal.path} again (older than their TTL)")
+    return journal, saved, times, resumed
+
+
+def field_extraction_times(section_results, carried_times):
+    """{section: {field: time}}: the original time for carried-forward and resumed values, now for the rest."""
+    now = utc_timestamp()
+    return {
+        section_key: {field: carried_times.get(section_key, {}).get(field, now) for field in values}
+        for section_key, values in section_results.items()
     }
 
-    yield '{"status": "progress", "message": "Finalizing data..."}'
-    boolean_fields_data = {
-        "is_additional_information_available": True if get_additional_information(website_url, university_name) else False, 
-        "is_multiple_applications_allowed": get_is_multiple_applications_allowed(website_url, university_name),
-        "is_act_required": get_is_act_required(website_url, university_name),
-        "is_analytical_not_required": get_is_analytical_not_required(website_url, university_name),
-        "is_analytical_optional": get_is_analytical_optional(website_url, university_name),
-        "is_duolingo_required": get_is_duolingo_required(website_url, university_name),
-        "is_els_required": get_is_els_required(website_url, university_name),
-        "is_english_not_required": get_is_english_not_required(website_url, university_name),
-        "is_english_optional": get_is_english_optional(website_url, university_name),
-        "is_gmat_or_gre_required": get_is_gmat_or_gre_required(website_url, university_name),
-        "is_gmat_required": get_is_gmat_required(website_url, university_name),
-        "is_gre_required": get_is_gre_required(website_url, university_name),
-        "is_ielts_required": get_is_ielts_required(website_url, university_name),
-        "is_lsat_required": get_is_lsat_required(website_url, university_name),
-        "is_mat_required": get_is_mat_required(website_url, university_name),
-        "is_mcat_required": get_is_mcat_required(website_url, university_name),
-        "is_pte_required": get_is_pte_required(website_url, university_name),
-        "is_sat_required": get_is_sat_required(website_url, university_name),
-        "is_toefl_ib_required": get_is_toefl_ib_required(website_url, university_name),
-        "is_import_verified": False,
-        "is_imported": False,
-        "is_enrolled": 0,
-    }
 
-    #combine the data into one dict
-    all_data = {
-        "new_fields_data": new_fields_data,
-        "university_data": university_data,
-        "address_data": address_data,
-        "application_data": application_data,
-        "contact_data": contact_data,
-        "social_media_data": social_media_data,
-        "student_statistics_data": student_statistics_data,
-        "boolean_fields_data": boolean_fields_data,
+def carried_epochs(carried_times, section_key):
+    """
+    {field: time.time() value} of a section's carried-forward and resumed values, so the run
+    journal keeps when they were really extracted instead of stamping them as new.
+    """
+    return {
+        field: datetime.fromisoformat(extracted_at).timestamp()
+        for field, extracted_at in carried_times.get(section_key, {}).items()
     }
 
-    # i want the final excel,csv with all the column names that we have in each dict and only the corresponding value for the each column, I don't want any other details like the evidence,urls,etc.
-    # Merge all dictionaries into one flat dictionary (without nesting) for CSV/Excel
-    merged_data = {}
-    merged_data.update(new_fields_data)
-    merged_data.update(university_data)
-    merged_data.update(address_data)
-    merged_data.update(application_data)
-    merged_data.update(contact_data)
-    merged_data.update(social_media_data)
-    merged_data.update(student_statistics_data)
-    merged_data.update(boolean_fields_data)
-
-    # Clean the values (remove evidence, URLs, etc.)
-    def clean_data_values(data_dict):
-        """
-        Cleans values in a dictionary using extract_clean_value.
-        Returns a dict with cleaned values (no evidence, URLs, or extra text).
-        """
-        cleaned = {}
-        for k, v in data_dict.items():
-            if isinstance(v, str):
-                cleaned[k] = extract_clean_value(v)
-            else:
-                cleaned[k] = v
-        return cleaned
-
-    flat_data = clean_data_values(merged_data)
-
-    # Define new fields that should be at the end
-    new_fields_list = list(new_fields_data.keys())
-
-    # Create ordered column list: university_name first, then others (excluding new fields), then new fields at end
-    ordered_columns = []
-    if 'university_name' in flat_data:
-        ordered_columns.append('university_name')
 
-    # Add all other columns except university_name and new fields
-    for key in flat_data.keys():
-        if key != 'university_name' and key not in new_fields_list:
-            ordered_columns.append(key)
-
-    # Add new fields at the end
-    for key in new_fields_list:
-        if key in flat_data:
-            ordered_columns.append(key)
-
-    # Sanitize university name for filename (replace spaces with underscores, remove special characters)
-    safe_university_name = university_name.replace(" ", "_").replace("/", "_").replace("\\", "_")
-
-    def rename_columns(df, flat_data):
-        """
-        Rename columns to match final required column names and ensure all required columns are present.
-        Missing columns will be added as empty.
-        """
-        # Mapping from current column names to final column names
-        column_mapping = {
-            'university_name': 'CollegeName',
-            'college_setting': 'CollegeSetting',
-            'type_of_institution': 'TypeofInstitution',
-            'student_faculty': 'Student_Faculty',
-            'number_of_campuses': 'NumberOfCampuses',
-            'total_faculty_available': 'TotalFacultyAvailable',
-            'total_programs_available': 'TotalProgramsAvailable',
-            'total_students_enrolled': 'TotalStudentsEnrolled',
-            'total_graduate_programs': 'TotalGraduatePrograms',
-            'total_international_students': 'TotalInternationalStudents',
-            'total_students': 'TotalStudents',
-            'total_undergrad_majors': 'TotalUndergradMajors',
-            'countries_represented': 'CountriesRepresented',
-            'street1': 'Street1',
-            'street2': 'Street2',
-            'county': 'County',
-            'city': 'City',
-            'state': 'State',
-            'country': 'Country',
-            'zip_code': 'ZipCode',
-            'application_fees': 'ApplicationFees',
-            'test_policy': 'TestPolicy',
-            'courses_and_grades': 'CoursesAndGrades',
-            'recommendations': 'Recommendations',
-            'personal_essay': 'PersonalEssay',
-            'writing_sample': 'WritingSample',
-            'additional_information': 'AdditionalInformation',
-            'additional_deadlines': 'AdditionalDeadlines',
-            'tuition_fees': 'TuitionFees',
-            'logo_path': 'LogoPath',
-            'phone': 'Phone',
-            'email': 'Email',
-            'secondary_email': 'SecondaryEmail',
-            'website_url': 'WebsiteUrl',
-            'admission_office_url': 'AdmissionOfficeUrl',
-            'virtual_tour_url': 'VirtualTourUrl',
-            'financial_aid_url': 'FinancialAidUrl',
-            'facebook': 'Facebook',
-            'instagram': 'Instagram',
-            'twitter': 'Twitter',
-            'youtube': 'Youtube',
-            'tiktok': 'Tiktok',
-            'linkedin': 'LinkedIn',
-            'grad_avg_tuition': 'GradAvgTuition',
-            'grad_international_students': 'GradInternationalStudents',
-            'grad_scholarship_high': 'GradScholarshipHigh',
-            'grad_scholarship_low': 'GradScholarshipLow',
-            'grad_total_students': 'GradTotalStudents',
-            'ug_avg_tuition': 'UGAvgTuition',
-            'ug_international_students': 'UGInternationalStudents',
-            'ug_scholarship_high': 'UGScholarshipHigh',
-            'ug_scholarship_low': 'UGScholarshipLow',
-            'ug_total_students': 'UGTotalStudents',
-            'is_additional_information_available': 'IsAdditionalInformationAvailable',
-            'is_multiple_applications_allowed': 'IsMultipleApplicationsAllowed',
-            'is_act_required': 'IsACTRequired',
-            'is_analytical_not_required': 'IsAnalyticalNotRequired',
-            'is_analytical_optional': 'IsAnalyticalOptional',
-            'is_duolingo_required': 'IsDuoLingoRequired',
-            'is_els_required': 'IsELSRequired',
-            'is_english_not_required': 'IsEnglishNotRequired',
-            'is_english_optional': 'IsEnglishOptional',
-            'is_gmat_or_gre_required': 'IsGMATOrGreRequired',
-            'is_gmat_required': 'IsGMATRequired',
-            'is_gre_required': 'IsGreRequired',
-            'is_ielts_required': 'IsIELTSRequired',
-            'is_lsat_required': 'IsLSATRequired',
-            'is_mat_required': 'IsMATRequired',
-            'is_mcat_required': 'IsMCATRequired',
-            'is_pte_required': 'IsPTERequired',
-            'is_sat_required': 'IsSATRequired',
-            'is_toefl_ib_required': 'IsTOEFLIBRequired',
-            'is_import_verified': 'IsImportVerified',
-            'is_imported': 'IsImported',
-            'is_enrolled': 'IsEnrolled',
-        }
-        
-        # All required final column names
-        final_columns = [
-            'CollegeName', 'CollegeCode', 'LogoPath', 'Phone', 'Email', 'SecondaryEmail',
-            'Street1', 'Street2', 'County', 'City', 'State', 'Country', 'ZipCode', 'WebsiteUrl',
-            'AdmissionOfficeUrl', 'VirtualTourUrl', 'Facebook', 'Instagram', 'Twitter', 'Youtube',
-            'Tiktok', 'ApplicationFees', 'TestPolicy', 'CoursesAndGrades', 'Recommendations',
-            'PersonalEssay', 'WritingSample', 'FinancialAidUrl', 'AdditionalInformation',
-            'AdditionalDeadlines', 'IsAdditionalInformationAvailable', 'Status',
-            'IsMultipleApplicationsAllowed', 'MaximumApplicationsAllowed', 'CreatedBy',
-            'CreatedDate', 'LiveDate', 'TuitionFees', 'UpdatedBy', 'UpdatedDate', 'CountryCode',
-            'LinkedIn', 'IsACTRequired', 'IsAnalyticalNotRequired', 'IsAnalyticalOptional',
-            'IsDuoLingoRequired', 'IsELSRequired', 'IsEnglishNotRequired', 'IsEnglishOptional',
-            'IsGMATOrGreRequired', 'IsGMATRequired', 'IsGreRequired', 'IsIELTSRequired',
-            'IsLSATRequired', 'IsMATRequired', 'IsMCATRequired', 'IsPTERequired', 'IsSATRequired',
-            'IsTOEFLIBRequired', 'QsWorldRanking', 'UsRanking', 'BatchId', 'IsImportVerified',
-            'IsImported', 'BannerImagePath', 'CollegeHtmlAdditionalInfo', 'Introduction',
-            'NumberOfCampuses', 'TotalFacultyAvailable', 'TotalProgramsAvailable',
-            'TotalStudentsEnrolled', 'CollegeSetting', 'TypeofInstitution', 'CountriesRepresented',
-            'GradAvgTuition', 'GradInternationalStudents', 'GradScholarshipHigh',
-            'GradScholarshipLow', 'GradTotalStudents', 'Student_Faculty', 'TotalGraduatePrograms',
-            'TotalInternationalStudents', 'TotalStudents', 'TotalUndergradMajors', 'UGAvgTuition',
-            'UGInternationalStudents', 'UGScholarshipHigh', 'UGScholarshipLow', 'UGTotalStudents',
-            'InstitutionType', 'IsEnrolled', 'OGAEnrolledProgramLevels'
-        ]
-        
-        # Rename existing columns
-        df_renamed = df.rename(columns=column_mapping)
-        
-        # Add missing columns with empty values
-        for col in final_columns:
-            if col not in df_renamed.columns:
-                df_renamed[col] = ''
-        
-        # Reorder columns to match final_columns order
-        df_renamed = df_renamed[final_columns]
-        
-        return df_renamed
-
-    # Create output directory if it doesn't exist
-    # Use absolute path based on the script location to ensure consistency
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_dir = os.path.join(script_dir, "Inst_outputs")
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Create DataFrame from flat_data
-    df = pd.DataFrame([flat_data])
+def registered_url_overrides(university_name, entry, **url_overrides):
+    """
+    Fill URL overrides the caller left empty with key URLs known for this university in the
+    registry. The tuition and financial aid URLs the caller gave are remembered there, so
+    later runs (and batch rows without them) use them too.
+    """
+    given = {name: value for name, value in url_overrides.items() if value}
+    if entry is not None and given:
+        get_registry().set_key_urls(university_name, **given)
+    key_urls = (entry or {}).get("key_urls", {})
+    return {name: value or key_urls.get(name) for name, value in url_overrides.items()}
+
+
+async def resolve_university_async(university_name):
+    """Async version of resolve_university: (website_url, registry entry or None)."""
+    registry = get_registry()
+    entry = registry.get(university_name)
+    if entry is not None:
+        return entry["website"], entry
+    answer = await generate_text_safe_async(website_prompt(university_name))
+    entry = registry.record(university_name, answer)
+    if entry is None:
+        return answer, None
+    return entry["website"], entry
 
-    # Rename columns and ensure all required columns are present
-    df_final = rename_columns(df, flat_data)
 
-    # Write to CSV
-    csv_filename = os.path.join(output_dir, f"{safe_university_name}_Institution.csv")
-    df_final.to_csv(csv_filename, index=False, encoding='utf-8')
+def process_institution_extraction(
+    university_name, 
+    undergraduate_tuition_fee_urls=None, 
+    graduate_tuition_fee_urls=None, 
+    undergraduate_financial_aid_urls=None, 
+    graduate_financial_aid_urls=None,
+    common_financial_aid_urls=None,
+    common_tuition_fee_urls=None,
+    max_workers=None,
+    batched=None,
+    retry_failed=False,
+    batch_id=None,
+    executor=None,
+    refresh=False
+):
+    """
+    Extract every field of one university, yielding JSON progress events and a final
+    "complete" event with the output files. executor is an optional pool shared with
+    other runs (see batch_runner.py); by default the run gets its own pool of max_workers.
+    """
+    print(f"Processing {university_name}...")
+    yield '{"status": "progress", "message": "Initializing extraction..."}'
+    
+    # 1. Get Website URL (from the university registry; the model is only asked on a miss)
+    yield f'{{"status": "progress", "message": "Finding official website for {university_name}..."}}'
+    website_url, entry = run_tagged(
+        {"pipeline": "institution", "university": university_name, "field": "website"},
+        resolve_university, university_name, generate_text_safe
+    )
+    print(f"Found Website URL: {website_url}")
 
-    # Write to Excel
-    excel_filename = os.path.join(output_dir, f"{safe_university_name}_Institution.xlsx")
+    url_overrides = registered_url_overrides(
+        university_name, entry,
+        undergraduate_tuition_fee_urls=undergraduate_tuition_fee_urls,
+        graduate_tuition_fee_urls=graduate_tuition_fee_urls,
+        undergraduate_financial_aid_urls=undergraduate_financial_aid_urls,
+        graduate_financial_aid_urls=graduate_financial_aid_urls,
+        common_financial_aid_urls=common_financial_aid_urls,
+        common_tuition_fee_urls=common_tuition_fee_urls,
+    )
+    context = dict(website_url=website_url, university_name=university_name, **url_overrides)
+    # The journal is keyed by the URLs the prompts actually use (registry-filled included)
+    journal, saved, carried_times, resumed_count = resume_run(university_name, retry_failed, refresh, **url_overrides)
+    if resumed_count:
+        yield json.dumps({"status": "progress", "message": f"Resuming interrupted run: {resumed_count} fields already extracted..."})
+    if refresh:
+        kept = sum(len(values) for values in carried_times.values())
+        yield json.dumps({"status": "progress", "message": f"Refreshing: keeping {kept} fields that are still fresh..."})
+
+    # Fields re-asked by a refresh must not be answered from the response cache
+    plan = QueryPlan(context, saved, fresh_after=time.time() if refresh else None)
+    plan.log_summary()
+
+    # All questions are independent once the website is known, so they are fired
+    # together on a bounded pool; progress is still reported section by section.
+    section_results = {}
+    section_failures = {}
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or MAX_WORKERS)
+    batch_futures, prompt_futures = {}, {}
     try:
-        df_final.to_excel(excel_filename, index=False, engine='openpyxl')
-    except ImportError:
-        print(f"Warning: openpyxl is not installed. Install it with: pip install openpyxl")
-        print(f"Excel file {excel_filename} not created, but CSV is available.")
-    except Exception as e:
-        print(f"Error saving to Excel: {e}")
-        print(f"Excel file {excel_filename} not created, but CSV is available.")
-
+        batch_futures, prompt_futures = submit_query_plan(
+            executor, plan, university_name, website_url,
+            batched=BATCHED_SECTIONS if batched is None else batched
+        )
+        streamed = set()
+        for message, section_key, specs in plan.sections:
+            yield json.dumps({"status": "progress", "message": message})
+            # While this section is pending, stream each field of any section as soon as its answers are in
+            pending = section_futures(plan, section_key, specs, batch_futures, prompt_futures)
+            while True:
+                yield from ready_field_updates(plan, batch_futures, prompt_futures, streamed)
+                pending = {future for future in pending if not future.done()}
+                if not pending:
+                    break
+                concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            answers, failures = collect_section_answers(executor, plan, section_key, specs, batch_futures, prompt_futures)
+            section_results[section_key] = plan.resolve(section_key, specs, answers)
+            failed = plan.failed_fields(section_key, specs, failures)
+            if failed:
+                section_failures[section_key] = failed
+            yield from section_field_updates(section_key, specs, section_results[section_key], failed, streamed)
+            journal.record_section(
+                section_key, section_results[section_key], failed, carried_epochs(carried_times, section_key)
+            )
+    finally:
+        # If the consumer stops early (e.g. the SSE client disconnects), drop queued lookups
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            for future in list(batch_futures.values()) + list(prompt_futures.values()):
+                future.cancel()
+
+    csv_filename, excel_filename, json_filename = save_institution_outputs(
+        university_name, section_results, section_failures, batch_id,
+        field_extraction_times(section_results, carried_times)
+    )
+    journal.discard()
+    failed_count = sum(len(fields) for fields in section_failures.values())
+    logger.info(f"{university_name}: {failed_count} fields failed; model calls {call_stats()}")
+    yield complete_update(
+        section_results, section_failures,
+        {"csv": csv_filename, "excel": excel_filename, "json": json_filename}, batch_id
+    )
+
+
+async def process_institution_extraction_async(
+    university_name,
+    undergraduate_tuition_fee_urls=None,
+    graduate_tuition_fee_urls=None,
+    undergraduate_financial_aid_urls=None,
+    graduate_financial_aid_urls=None,
+    common_financial_aid_urls=None,
+    common_tuition_fee_urls=None,
+    batched=None,
+    retry_failed=False,
+    batch_id=None,
+    refresh=False
+):
+    """
+    Async version of process_institution_extraction. Yields the same progress and
+    completion events, but every model call of the query plan is an asyncio task on the
+    calling event loop, capped by async_model's semaphore instead of a thread pool.
+    Closing the generator early cancels all outstanding calls.
+    """
+    print(f"Processing {university_name}...")
+    yield '{"status": "progress", "message": "Initializing extraction..."}'
 
-    # for the json, I want to save the data as a json file with all the fields like values, evidence, urls, etc.
-    json_filename = os.path.join(output_dir, f"{safe_university_name}_Institution.json")
-    with open(json_filename, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=4)
+    yield f'{{"status": "progress", "message": "Finding official website for {university_name}..."}}'
+    website_url, entry = await run_tagged_async(
+        {"pipeline": "institution", "university": university_name, "field": "website"},
+        resolve_university_async, university_name
+    )
+    print(f"Found Website URL: {website_url}")
 
-    print(f"Saved cleaned {university_name} data to {csv_filename}, {excel_filename}, and {json_filename}.")
-    yield f'{{"status": "complete", "files": {{"csv": "{csv_filename}", "excel": "{excel_filename}", "json": "{json_filename}"}}}}'
+    url_overrides = registered_url_overrides(
+        university_name, entry,
+        undergraduate_tuition_fee_urls=undergraduate_tuition_fee_urls,
+        graduate_tuition_fee_urls=graduate_tuition_fee_urls,
+        undergraduate_financial_aid_urls=undergraduate_financial_aid_urls,
+        graduate_financial_aid_urls=graduate_financial_aid_urls,
+        common_financial_aid_urls=common_financial_aid_urls,
+        common_tuition_fee_urls=common_tuition_fee_urls,
+    )
+    context = dict(website_url=website_url, university_name=university_name, **url_overrides)
+    # The journal is keyed by the URLs the prompts actually use (registry-filled included)
+    journal, saved, carried_times, resumed_count = resume_run(university_name, retry_failed, refresh, **url_overrides)
+    if resumed_count:
+        yield json.dumps({"status": "progress", "message": f"Resuming interrupted run: {resumed_count} fields already extracted..."})
+    if refresh:
+        kept = sum(len(values) for values in carried_times.values())
+        yield json.dumps({"status": "progress", "message": f"Refreshing: keeping {kept} fields that are still fresh..."})
+
+    if batched is None:
+        batched = BATCHED_SECTIONS
+
+    # Fields re-asked by a refresh must not be answered from the response cache
+    plan = QueryPlan(context, saved, fresh_after=time.time() if refresh else None)
+    plan.log_summary()
+
+    batch_tasks = {}
+    prompt_tasks = {}
+    for _, section_key, specs in plan.sections:
+        batched_prompts = set()
+        if batched:
+            questions = plan.batch_questions(section_key, specs)
+            if questions:
+                batch_tasks[section_key] = asyncio.ensure_future(run_tagged_async(
+                    plan.call_tags(section_key=section_key),
+                    ask_section_batched_async, questions, university_name, website_url, plan.fresh_after
+                ))
+                batched_prompts = set(questions.values())
+        for prompt in plan.section_prompts(section_key, specs):
+            if prompt not in batched_prompts and prompt not in prompt_tasks:
+                prompt_tasks[prompt] = asyncio.ensure_future(
+                    run_tagged_async(plan.call_tags(prompt), generate_text_async, prompt, plan.fresh_after)
+                )
+
+    section_results = {}
+    section_failures = {}
+    streamed = set()
+    try:
+        for message, section_key, specs in plan.sections:
+            yield json.dumps({"status": "progress", "message": message})
+            pending = section_futures(plan, section_key, specs, batch_tasks, prompt_tasks)
+            while True:
+                for update in ready_field_updates(plan, batch_tasks, prompt_tasks, streamed):
+                    yield update
+                pending = {task for task in pending if not task.done()}
+                if not pending:
+                    break
+                await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            answers = {}
+            failures = {}
+            if section_key in batch_tasks:
+                try:
+                    answers.update(await batch_tasks[section_key])
+                except Exception as e:
+                    logger.error(f"Batched call for {section_key} failed, asking its fields one by one: {e}")
+            for prompt in plan.section_prompts(section_key, specs):
+                if prompt in answers:
+                    continue
+                if prompt not in prompt_tasks:
+                    prompt_tasks[prompt] = asyncio.ensure_future(
+                        run_tagged_async(plan.call_tags(prompt), generate_text_async, prompt, plan.fresh_after)
+                    )
+                try:
+                    answers[prompt] = await prompt_tasks[prompt]
+                except Exception as e:
+                    logger.error(f"Error generating content: {e}")
+                    answers[prompt] = ""
+                    failures[prompt] = describe_failure(e)
+            section_results[section_key] = plan.resolve(section_key, specs, answers)
+            failed = plan.failed_fields(section_key, specs, failures)
+            if failed:
+                section_failures[section_key] = failed
+            for update in section_field_updates(section_key, specs, section_results[section_key], failed, streamed):
+                yield update
+            await asyncio.to_thread(
+                journal.record_section, section_key, section_results[section_key], failed,
+                carried_epochs(carried_times, section_key)
+            )
+    finally:
+        for task in list(batch_tasks.values()) + list(prompt_tasks.values()):
+            if not task.done():
+                task.cancel()
+
+    csv_filename, excel_filename, json_filename = await asyncio.to_thread(
+        save_institution_outputs, university_name, section_results, section_failures, batch_id,
+        field_extraction_times(section_results, carried_times)
+    )
+    journal.discard()
+    failed_count = sum(len(fields) for fields in section_failures.values())
+    logger.info(f"{university_name}: {failed_count} fields failed; model calls {call_stats()}")
+    yield complete_update(
+        section_results, section_failures,
+        {"csv": csv_filename, "excel": excel_filename, "json": json_filename}, batch_id
+    )
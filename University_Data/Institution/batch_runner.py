@@ -0,0 +1,192 @@
+"""
+Batch mode for the institution pipeline: many universities, one shared worker pool.
+
+    python batch_runner.py --csv universities.csv [--batch-id ID] [--parallel N]
+    python batch_runner.py "Kansas State University" "Quinnipiac University"
+
+The CSV needs a university_name column; the optional URL columns
+(undergraduate_tuition_fee_urls, graduate_tuition_fee_urls, undergraduate_financial_aid_urls,
+graduate_financial_aid_urls, common_financial_aid_urls, common_tuition_fee_urls) are passed
+to that university's run. Each university gets its usual Inst_outputs files, and the batch
+gets one consolidated Batch_<id>_Institutions.csv stamped with the batch ID.
+"""
+import argparse
+import concurrent.futures
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+from Institution import institution_output_path, process_institution_extraction
+from field_registry import FINAL_COLUMNS
+from rate_limiter import DEFAULT_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+URL_COLUMNS = (
+    "undergraduate_tuition_fee_urls",
+    "graduate_tuition_fee_urls",
+    "undergraduate_financial_aid_urls",
+    "graduate_financial_aid_urls",
+    "common_financial_aid_urls",
+    "common_tuition_fee_urls",
+)
+
+# Universities driven at once. They only wait on the shared pool, which is where the
+# model calls run; the rate limiter decides how many of those are actually in flight.
+BATCH_PARALLEL_UNIVERSITIES = int(os.getenv("BATCH_PARALLEL_UNIVERSITIES", "8"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", str(DEFAULT_MAX_CONCURRENCY)))
+
+
+def new_batch_id():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def university_job(item):
+    """Normalize a university name or {university_name, <url column>: ...} dict."""
+    if isinstance(item, str):
+        item = {"university_name": item}
+    name = (item.get("university_name") or "").strip()
+    if not name:
+        raise ValueError(f"Missing university_name in batch entry: {item}")
+    job = {"university_name": name}
+    for column in URL_COLUMNS:
+        job[column] = (item.get(column) or "").strip() or None
+    return job
+
+
+def read_universities(csv_path):
+    """Batch entries from a CSV with a university_name column (blank rows are skipped)."""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.DictReader(f))
+    if rows and "university_name" not in rows[0]:
+        raise ValueError(f"{csv_path} has no university_name column")
+    return [university_job(row) for row in rows if (row.get("university_name") or "").strip()]
+
+
+def batch_output_path(batch_id, suffix):
+    return os.path.join(os.path.dirname(institution_output_path("_", "csv")), f"Batch_{batch_id}_{suffix}")
+
+
+def run_university(job, executor, batch_id, batched, retry_failed, refresh, stop):
+    """Run one university to completion; returns its batch summary entry."""
+    name = job["university_name"]
+    summary = {"university_name": name, "status": "failed", "failed_fields": None, "files": {}}
+    generator = process_institution_extraction(
+        name, batched=batched, retry_failed=retry_failed, refresh=refresh, batch_id=batch_id, executor=executor,
+        **{column: job[column] for column in URL_COLUMNS}
+    )
+    try:
+        for update in generator:
+            if stop.is_set():
+                summary["status"] = "cancelled"
+                break
+            event = json.loads(update)
+            if event.get("status") == "complete":
+                summary.update(status="complete", failed_fields=event.get("failed_fields"), files=event["files"])
+    except Exception as e:
+        if stop.is_set():
+            # The shared pool was shut down under this run because the batch was stopped
+            summary["status"] = "cancelled"
+        else:
+            logger.exception(f"Batch {batch_id}: {name} failed")
+            summary["error"] = str(e)
+    finally:
+        generator.close()
+    return summary
+
+
+def write_consolidated_outputs(batch_id, summaries):
+    """One table with a row per completed university (in input order), plus the batch summary JSON."""
+    rows = []
+    for summary in summaries:
+        csv_filename = summary["files"].get("csv")
+        if summary["status"] == "complete" and csv_filename and os.path.exists(csv_filename):
+            with open(csv_filename, 'r', encoding='utf-8', newline='') as f:
+                rows.extend(csv.DictReader(f))
+
+    csv_filename = batch_output_path(batch_id, "Institutions.csv")
+    with open(csv_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FINAL_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, BatchId=batch_id))
+    json_filename = batch_output_path(batch_id, "summary.json")
+    with open(json_filename, 'w', encoding='utf-8') as f:
+        json.dump({"batch_id": batch_id, "universities": summaries}, f, ensure_ascii=False, indent=4)
+    return csv_filename, json_filename
+
+
+def run_batch(universities, batch_id=None, parallel=None, max_workers=None, batched=None, retry_failed=False,
+              refresh=False):
+    """
+    Extract a list of universities (names or dicts with URL overrides) through one shared
+    pool and the process-wide rate limiter. Yields JSON events like
+    process_institution_extraction: a progress event per finished university and a final
+    "complete" event with the consolidated files. Closing the generator early stops the batch.
+    With refresh, each university only re-extracts its empty, failed or expired fields.
+    """
+    jobs = [university_job(item) for item in universities]
+    batch_id = batch_id or new_batch_id()
+    yield json.dumps({"status": "progress", "batch_id": batch_id, "message": f"Starting batch {batch_id} with {len(jobs)} universities..."})
+
+    stop = threading.Event()
+    summaries = [None] * len(jobs)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or BATCH_MAX_WORKERS)
+    drivers = concurrent.futures.ThreadPoolExecutor(max_workers=parallel or BATCH_PARALLEL_UNIVERSITIES)
+    try:
+        futures = {
+            drivers.submit(run_university, job, executor, batch_id, batched, retry_failed, refresh, stop): index
+            for index, job in enumerate(jobs)
+        }
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            summary = summaries[futures[future]] = future.result()
+            yield json.dumps({
+                "status": "progress",
+                "message": f"[{done}/{len(jobs)}] {summary['university_name']}: {summary['status']}",
+                "university": summary,
+            })
+    finally:
+        stop.set()
+        drivers.shutdown(wait=False, cancel_futures=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    csv_filename, json_filename = write_consolidated_outputs(batch_id, summaries)
+    completed = sum(1 for summary in summaries if summary["status"] == "complete")
+    logger.info(f"Batch {batch_id}: {completed}/{len(jobs)} universities completed")
+    yield json.dumps({
+        "status": "complete",
+        "batch_id": batch_id,
+        "completed": completed,
+        "total": len(jobs),
+        "files": {"csv": csv_filename, "json": json_filename},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the institution extraction for many universities.")
+    parser.add_argument("universities", nargs="*", help="University names (or use --csv)")
+    parser.add_argument("--csv", help="CSV with a university_name column and optional URL columns")
+    parser.add_argument("--batch-id", help="Batch ID for the BatchId column (default: current timestamp)")
+    parser.add_argument("--parallel", type=int, help="Universities driven at once")
+    parser.add_argument("--max-workers", type=int, help="Size of the shared model call pool")
+    parser.add_argument("--batched", action="store_true", help="Ask each section in one batched prompt")
+    parser.add_argument("--retry-failed", action="store_true", help="Only redo fields that failed last time")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Only redo fields that failed, came back empty or passed their TTL last time")
+    args = parser.parse_args()
+
+    universities = read_universities(args.csv) if args.csv else []
+    universities += args.universities
+    if not universities:
+        parser.error("give university names or --csv")
+
+    for update in run_batch(universities, args.batch_id, args.parallel, args.max_workers,
+                            args.batched or None, args.retry_failed, args.refresh):
+        print(json.loads(update).get("message") or update)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,4 @@
 
-from google import genai
-from google.genai import types
 import os
 from dotenv import load_dotenv
 import sys
@@ -9,16 +7,19 @@ import sys
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from Institution import GeminiModelWrapper, client
+from Institution import GeminiModelWrapper
 
 load_dotenv()
 
 # 1. Update the initialization with a valid model name
 # 'gemini-2.0-flash' is generally fastest and most cost-effective for search
-model = GeminiModelWrapper(client, "gemini-2.5-flash") 
+# (the client is created on first use)
+model = GeminiModelWrapper(None, "gemini-2.5-flash") 
 
 # 2. Refined generate_content to print the actual Search Entry Point (the UI snippet)
 def generate_content(self, prompt):
+    from google.genai import types
+
     google_search_tool = types.Tool(
         google_search=types.GoogleSearch()
     
@@ -44,9 +45,6 @@ def generate_content(self, prompt):
         
     return response
 
-# Re-assign the fixed method to your wrapper
-GeminiModelWrapper.generate_content = generate_content
-
 def generate_text_safe(prompt):
     try:
         response = model.generate_content(prompt)
@@ -57,9 +55,16 @@ def generate_text_safe(prompt):
     return ""
 
 # 3. The Test Execution
-print("Starting live search test...")
-test_prompt
-result = generate_text_safe(test_prompt)
+def main():
+    # Re-assign the fixed method to your wrapper
+    GeminiModelWrapper.generate_content = generate_content
+
+    print("Starting live search test...")
+    test_prompt
+    result = generate_text_safe(test_prompt)
+
+    print("RESULT FROM MODEL:")
+    print(result)
 
-print("RESULT FROM MODEL:")
-print(result)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
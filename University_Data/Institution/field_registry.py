@@ -0,0 +1,1011 @@
+import json
+import os
+import re
+
+# How long refresh runs trust an extracted value, per volatility
+# (override with REFRESH_TTL_DAYS_STATIC / _YEARLY / _FREQUENT)
+VOLATILITY_TTL_DAYS = {
+    volatility: float(os.getenv(f"REFRESH_TTL_DAYS_{volatility.upper()}", default))
+    for volatility, default in (("static", "365"), ("yearly", "120"), ("frequent", "30"))
+}
+
+
+class FieldSpec:
+    """
+    One institution field.
+    name, section: key of the field in its section of the output (section None marks a
+        question that is only asked so other fields can be derived from it).
+    column: CSV/Excel column, or None if the field is only kept in the JSON output.
+    question: prompt template, filled with {university_name} and {url}.
+    url_source: URL overrides tried in order for {url}, before the official website.
+    value_type: text, number, money, url, email, phone, boolean or json.
+    volatility: how often the value changes on the website: static, yearly or frequent.
+    depends_on: fields whose answers derive() computes this field from.
+    derive: derive(answers, context) -> value, with answers as {dependency: response text}.
+    constant: value of fields that are never asked.
+    """
+    def __init__(self, name, section, column=None, question=None, url_source=(), value_type="text",
+                 volatility="static", depends_on=(), derive=None, constant=None):
+        self.name = name
+        self.section = section
+        self.column = column
+        self.question = question
+        self.url_source = url_source
+        self.value_type = value_type
+        self.volatility = volatility
+        self.depends_on = depends_on
+        self.derive = derive
+        self.constant = constant
+
+    def url(self, context):
+        """URL the question is asked about: the first URL override given, else the official website."""
+        for source in self.url_source:
+            if context.get(source):
+                return context[source]
+        return context["website_url"]
+
+    def prompt(self, context):
+        return self.question.format(university_name=context["university_name"], url=self.url(context))
+
+    def ttl_seconds(self):
+        """Age after which a refresh run asks for this field again."""
+        return VOLATILITY_TTL_DAYS[self.volatility] * 24 * 3600
+
+    def __repr__(self):
+        return f"FieldSpec({self.name!r}, {self.section!r})"
+
+
+def parse_json_from_response(text):
+    """Parse JSON from Gemini response, handling markdown code blocks."""
+    # Remove markdown formatting
+    text = text.replace("**", "").replace("```json", "").replace("```", "").strip()
+
+    # Try to extract JSON from the text
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group())
+        except json.JSONDecodeError:
+            pass
+
+    # If no match, try parsing the whole text
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def format_batched_answer(entry):
+    """Turn one {value, evidence} entry of a JSON response into the per-field response text format."""
+    if isinstance(entry, dict):
+        value, evidence = entry.get("value"), entry.get("evidence")
+    else:
+        value, evidence = entry, None
+    value = "null" if value is None else str(value)
+    return f"{value}\nEvidence: {evidence}" if evidence else value
+
+
+def enrollment_count(key):
+    """Derive one enrollment figure ('total_students', 'graduate_students' or 'undergraduate_students')."""
+    def derive(answers, context):
+        parsed = parse_json_from_response(answers["enrollment_breakdown"] or "")
+        if not isinstance(parsed, dict) or key not in parsed:
+            return ""
+        return format_batched_answer(parsed[key])
+    return derive
+
+
+def has_answer(dependency):
+    """Derive a boolean: whether the dependency got any answer."""
+    def derive(answers, context):
+        return True if answers[dependency] else False
+    return derive
+
+
+def official_website(answers, context):
+    """The official website looked up at the start of the run, reduced to its URL."""
+    match = re.search(r'https?://[^\s<>"\')\]]+', context["website_url"] or "")
+    return match.group(0).rstrip(".,") if match else context["website_url"]
+
+
+# Output sections in order, with the progress message shown while each is extracted
+SECTIONS = [
+    ("new_fields_data", "Extracting general information..."),
+    ("university_data", "Extracting university metrics..."),
+    ("address_data", "Extracting address details..."),
+    ("application_data", "Extracting application requirements..."),
+    ("contact_data", "Extracting contact information..."),
+    ("social_media_data", "Extracting social media links..."),
+    ("student_statistics_data", "Extracting student statistics..."),
+    ("boolean_fields_data", "Finalizing data..."),
+]
+
+# Every institution field. Execution, batching, caching and refresh are planned over this table.
+FIELDS = [
+    FieldSpec(
+        "womens_college", "new_fields_data",
+        question=(
+            "Is the university {university_name}, {url} a women's college? "
+            "Return only 'yes' or 'no', no other text. "
+            "No fabrication or guessing, just yes or no. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="static",
+    ),
+    FieldSpec(
+        "cost_of_living_min", "new_fields_data",
+        question=(
+            "What is the minimum cost of living for students at the university {university_name} ,{url}? "
+            "Return only the minimum cost of living amount, no other text. "
+            "No fabrication or guessing, just the minimum cost of living. "
+            "Only if the minimum cost of living is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the minimum cost of living is explicitly stated."
+        ),
+        value_type="money", volatility="frequent",
+    ),
+    FieldSpec(
+        "cost_of_living_max", "new_fields_data",
+        question=(
+            "What is the maximum cost of living for students at the university {university_name}, {url}? "
+            "Return only the maximum cost of living amount, no other text. "
+            "No fabrication or guessing, just the maximum cost of living. "
+            "Only if the maximum cost of living is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the maximum cost of living is explicitly stated."
+        ),
+        value_type="money", volatility="frequent",
+    ),
+    FieldSpec(
+        "orientation_available", "new_fields_data",
+        question=(
+            "Is orientation available for students at the university {university_name}, {url}? "
+            "Return only 'yes' or 'no', no other text. "
+            "No fabrication or guessing, just yes or no. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "college_tour_after_admissions", "new_fields_data",
+        question=(
+            "Does the university {university_name}, {url} offer in-person college tours after admissions? "
+            "Return only 'yes' or 'no', no other text. "
+            "No fabrication or guessing, just yes or no. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "university_name", "university_data", column="CollegeName",
+        question=(
+            "What is the name of the university {university_name} for the website {url}? "
+            "Return only the name of the university, no other text. "
+            "No fabrication or guessing, just the name of the university. "
+            "Only if the name of the university is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the name of the university is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "college_setting", "university_data", column="CollegeSetting",
+        question=(
+            "What is the college setting for the university {university_name}, {url}? "
+            "Return only the college setting, no other text. "
+            "example: urban, suburban, rural, etc. "
+            "No fabrication or guessing, just the college setting. "
+            "Only if the college setting is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the college setting is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "type_of_institution", "university_data", column="TypeofInstitution",
+        question=(
+            "What is the type of institution for the university {university_name}, {url}? "
+            "Return only the type of institution, no other text. "
+            "No fabrication or guessing, just the type of institution. "
+            "Only if the type of institution is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the type of institution is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "student_faculty", "university_data", column="Student_Faculty",
+        question=(
+            "What is the student faculty ratio for the university {university_name}, {url}? "
+            "Return only the student faculty, no other text. "
+            "No fabrication or guessing, just the student faculty ratio. "
+            "Only if the student faculty ratio is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the student faculty ratio is explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "number_of_campuses", "university_data", column="NumberOfCampuses",
+        question=(
+            "What is the number of campuses for the university {university_name}, {url}? "
+            "Return only the number of campuses, no other text. "
+            "No fabrication or guessing, just the number of campuses. "
+            "Only if the number of campuses is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the number of campuses is explicitly stated."
+        ),
+        value_type="number", volatility="static",
+    ),
+    FieldSpec(
+        "total_faculty_available", "university_data", column="TotalFacultyAvailable",
+        question=(
+            "What is the total number of faculty available for the university {university_name}, {url}? "
+            "Return only the total number of faculty available, no other text. "
+            "No fabrication or guessing, just the total number of faculty available. "
+            "Only if the total number of faculty available is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the total number of faculty available is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "total_programs_available", "university_data", column="TotalProgramsAvailable",
+        question=(
+            "What is the total number of programs available for the university {university_name}, {url}? "
+            "Return only the total number of programs available, no other text. "
+            "No fabrication or guessing, just the total number of programs available. "
+            "Only if the total number of programs available is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the total number of programs available is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    # One question answers all four enrollment figures; it is not an output column itself
+    FieldSpec(
+        "enrollment_breakdown", None,
+        question=(
+            "How many students are enrolled in the university {university_name}, {url} in total, how many are graduate students and how many are undergraduate students? "
+            "Return a JSON object with the keys 'total_students', 'graduate_students' and 'undergraduate_students'. "
+            "Each value must be an object with the keys 'value' (only the number, or null) and 'evidence' (the correct URL or page where the number is explicitly stated, or null). "
+            "No fabrication or guessing, just the numbers. "
+            "Only if a number is explicitly stated in the website, otherwise use null for its value."
+        ),
+        value_type="json", volatility="yearly",
+    ),
+    FieldSpec(
+        "total_students_enrolled", "university_data", column="TotalStudentsEnrolled", value_type="number", volatility="yearly",
+        depends_on=("enrollment_breakdown",), derive=enrollment_count("total_students"),
+    ),
+    FieldSpec(
+        "total_graduate_programs", "university_data", column="TotalGraduatePrograms",
+        question=(
+            "What is the total number of graduate programs offered by the university {university_name}, {url}? "
+            "Return only the total number of graduate programs, no other text. "
+            "No fabrication or guessing, just the total number of graduate programs. "
+            "Only if the total number of graduate programs is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the total number of graduate programs is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "total_international_students", "university_data", column="TotalInternationalStudents",
+        question=(
+            "What is the total number of international students currently enrolled in the university {university_name}, {url}? "
+            "Return only the total number of international students, no other text. "
+            "No fabrication or guessing, just the total number of international students. "
+            "Only if the total number of international students is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the total number of international students is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "total_students", "university_data", column="TotalStudents", value_type="number", volatility="yearly",
+        depends_on=("enrollment_breakdown",), derive=enrollment_count("total_students"),
+    ),
+    FieldSpec(
+        "total_undergrad_majors", "university_data", column="TotalUndergradMajors",
+        question=(
+            "What is the total number of undergrad majors offered by the university {university_name}, {url}? "
+            "Return only the total number of undergrad majors, no other text. "
+            "No fabrication or guessing, just the total number of undergrad majors. "
+            "Only if the total number of undergrad majors is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the total number of undergrad majors is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "countries_represented", "university_data", column="CountriesRepresented",
+        question=(
+            "How many countries students are represented by the university {university_name}, {url}? "
+            "Return only the countries count, no other text. "
+            "No fabrication or guessing, just the countries represented. "
+            "Only if the countries represented is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the countries represented is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "street1", "address_data", column="Street1",
+        question=(
+            "What is the street address for the university {university_name}, {url}? "
+            "Return only just the street address, no other text. "
+            "do not return extra address like city, state, country etc.No fabrication or guessing, just the address. "
+            "Only if the address is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the address is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec("street2", "address_data", column="Street2", value_type="text", volatility="static", constant=None),
+    FieldSpec(
+        "county", "address_data", column="County",
+        question=(
+            "What county is the university {university_name}, {url} located in? "
+            "Return only the county name, no other text. "
+            "No fabrication or guessing, just the county name. "
+            "Only if the county is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the county is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "city", "address_data", column="City",
+        question=(
+            "What city is the university {university_name}, {url} located in? "
+            "Return only the city name, no other text. "
+            "No fabrication or guessing, just the city name. "
+            "Only if the city is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the city is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "state", "address_data", column="State",
+        question=(
+            "What state is the university {university_name}, {url} located in? "
+            "Return only the state name, no other text. "
+            "No fabrication or guessing, just the state name. "
+            "Only if the state is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the state is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "country", "address_data", column="Country",
+        question=(
+            "What country is the university {university_name}, {url} located in? "
+            "Return only the country name, no other text. "
+            "No fabrication or guessing, just the country name. "
+            "Only if the country is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the country is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "zip_code", "address_data", column="ZipCode",
+        question=(
+            "What is the zip code for the university {university_name}, {url}? "
+            "Return only the zip code, no other text. "
+            "No fabrication or guessing, just the zip code. "
+            "Only if the zip code is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the zip code is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "application_requirements", "application_data",
+        question=(
+            "What are the application requirements for the university {university_name}, {url}? "
+            "Return only the application requirements, no other text. "
+            "No fabrication or guessing, just the application requirements. "
+            "Only if the application requirements is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the application requirements is explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "application_fees", "application_data", column="ApplicationFees",
+        question=(
+            "Find the application fee for both domestic and international applicants for the university {university_name}, {url}? "
+            "Return a line of text with the application fee for both domestic and international applicants, no other text. "
+            "Do not return the text like 'The application fee for graduate programs is not explicitly stated for domestic applicants on the university's website'. "
+            "In this case just return what you find so far in the website. "
+            "If you don't find something then don't explicitly mention in the return response.No fabrication or guessing, just the application fee for both domestic and international applicants.Example of the return response: 'The application fee for both domestic and international applicants is $amount. "
+            "(or) The application fee for domestic applicants is $amount and for international applicants is $amount. "
+            "'Only if the application fees are explicitly stated in the website, otherwise return null. "
+            "Do not return [Cite] in the return response.Only refer the {{website_url}} or the {{university_name}}.edu or it's sub domains or it's pages to find the application fees.Do not refer any other third party websites to find the application fees.Also provide the evidence for your answer with correct URL or page where the application fees are explicitly stated."
+        ),
+        value_type="text", volatility="frequent",
+    ),
+    FieldSpec(
+        "test_policy", "application_data", column="TestPolicy",
+        question=(
+            "Find a line of text about test policy for both undergraduate and graduate programs for the university {university_name}, {url}? "
+            "Return only the test policy, no other text. "
+            "No fabrication or guessing, just a short line of text not a long paragraph. "
+            "Only return the test policy if it is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the test policy is explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "courses_and_grades", "application_data", column="CoursesAndGrades",
+        question=(
+            "What are the courses and grades requirements for the university {university_name}, {url}? "
+            "Return only the courses and grades requirements, no other text. "
+            "No fabrication or guessing, just the courses and grades requirements. "
+            "Only return the courses and grades requirements if they are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the courses and grades requirements are explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "recommendations", "application_data", column="Recommendations",
+        question=(
+            "How many recommendations are required to apply for both undergraduate and graduate programs for the university {university_name}, {url}? "
+            "Return only the recommendation requirements, no other text. "
+            "No fabrication or guessing, just the recommendation requirements. "
+            "Only return the recommendation requirements if they are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the recommendation requirements are explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "personal_essay", "application_data", column="PersonalEssay",
+        question=(
+            "Does applying to the university {university_name}, {url} require a personal essay? "
+            "If yes, return Required. "
+            "if not, return Not Required. "
+            "no extra text No fabrication or guessing, just the personal essay requirements. "
+            "Only if the personal essay requirements are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the personal essay requirements are explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "writing_sample", "application_data", column="WritingSample",
+        question=(
+            "Does applying to the university {university_name}, {url} require a writing sample? "
+            "If yes, return Required. "
+            "if not, return Not Required. "
+            "no extra text No fabrication or guessing, just the writing sample requirements. "
+            "Only if the writing sample requirements are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the writing sample requirements are explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "additional_information", "application_data", column="AdditionalInformation",
+        question=(
+            "Is there any additional information required to apply to the university {university_name}, {url}? "
+            "If yes, return a short line of text about the additional information requirements. "
+            "if not, return null. "
+            "no extra text No fabrication or guessing, just the additional information requirements. "
+            "Only if the additional information requirements are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the additional information requirements are explicitly stated."
+        ),
+        value_type="text", volatility="yearly",
+    ),
+    FieldSpec(
+        "additional_deadlines", "application_data", column="AdditionalDeadlines",
+        question=(
+            "What are the additional deadlines of {university_name}, {url} apart from application deadlines? "
+            "The deadlines can be scholarships, financial aid, or other deadlines. "
+            "Return only the additional deadlines like scholarships, financial aid, or other deadlines, no other text. "
+            "No fabrication or guessing, just the additional deadlines. "
+            "Only if the additional deadlines are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the additional deadlines are explicitly stated."
+        ),
+        value_type="text", volatility="frequent",
+    ),
+    FieldSpec(
+        "tuition_fees", "application_data", column="TuitionFees",
+        url_source=('common_tuition_fee_urls',),
+        question=(
+            "What are the tuition fees for the university {university_name} at {url}? "
+            "Please find the average tution fee for the international students for both the undergraduate and graduate programs. "
+            "The answer should be like this: 'Undergraduate (Full-Time): ~$7,438 per year (Resident), ~$19,318 (Non-Resident/Supplemental Tuition).Graduate (Full-Time): ~$8,872 per year (Resident), ~$18,952 (Non-Resident/Supplemental Tuition).' Return exactly how the above format is. "
+            "No fabrication or guessing, just the answer you find in the website. "
+            "or it's pages. "
+            "Only if the tuition fees are explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the tuition fees are explicitly stated."
+        ),
+        value_type="text", volatility="frequent",
+    ),
+    FieldSpec(
+        "contact_information", "contact_data",
+        question=(
+            "What is the contact information for the university {university_name}, {url}? "
+            "Return only the contact information, no other text. "
+            "No fabrication or guessing, just the contact information. "
+            "Only if the contact information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the contact information is explicitly stated."
+        ),
+        value_type="text", volatility="static",
+    ),
+    FieldSpec(
+        "logo_path", "contact_data", column="LogoPath",
+        question=(
+            "What is the logo path or URL for the university {university_name}, {url}? "
+            "Return only the logo path or URL, no other text. "
+            "No fabrication or guessing, just the logo path. "
+            "Only if the logo path is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the logo path is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "phone", "contact_data", column="Phone",
+        question=(
+            "What is the main phone number for the university {university_name}, {url}? "
+            "Return only the phone number, no other text. "
+            "No fabrication or guessing, just the phone number. "
+            "Only if the phone number is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the phone number is explicitly stated."
+        ),
+        value_type="phone", volatility="static",
+    ),
+    FieldSpec(
+        "email", "contact_data", column="Email",
+        question=(
+            "What is the main contact email address for the university {university_name}, {url}? "
+            " If there is no main contact email address, find the admissions email address.Return only the email address, no other text. "
+            "No fabrication or guessing, just the email address. "
+            "Only if the email address is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the email address is explicitly stated."
+        ),
+        value_type="email", volatility="static",
+    ),
+    FieldSpec(
+        "secondary_email", "contact_data", column="SecondaryEmail",
+        question=(
+            "What is the secondary email address for the university {university_name}, {url}? "
+            "Return only the secondary email address, no other text. "
+            "No fabrication or guessing, just the secondary email address. "
+            "Only if the secondary email address is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the secondary email address is explicitly stated."
+        ),
+        value_type="email", volatility="static",
+    ),
+    # The official website is resolved at the start of every run
+    FieldSpec("website_url", "contact_data", column="WebsiteUrl", value_type="url", volatility="static", derive=official_website),
+    FieldSpec(
+        "admission_office_url", "contact_data", column="AdmissionOfficeUrl",
+        question=(
+            "What is the admission office URL for the university {university_name}, {url}? "
+            "Return only the admission office URL, no other text. "
+            "No fabrication or guessing, just the admission office URL. "
+            "Only if the admission office URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the admission office URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "virtual_tour_url", "contact_data", column="VirtualTourUrl",
+        question=(
+            "What is the virtual tour URL for the university {university_name}, {url}? "
+            "Return only the virtual tour URL, no other text. "
+            "No fabrication or guessing, just the virtual tour URL. "
+            "Only if the virtual tour URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the virtual tour URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "financial_aid_url", "contact_data", column="FinancialAidUrl",
+        question=(
+            "What is the financial aid URL for the university {university_name}, {url}? "
+            "Return only the financial aid URL, no other text. "
+            "No fabrication or guessing, just the financial aid URL. "
+            "Only if the financial aid URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the financial aid URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "facebook", "social_media_data", column="Facebook",
+        question=(
+            "What is the Facebook URL for the university {university_name}, {url}? "
+            "Return only the Facebook URL, no other text. "
+            "No fabrication or guessing, just the Facebook URL. "
+            "Only if the Facebook URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the Facebook URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "instagram", "social_media_data", column="Instagram",
+        question=(
+            "What is the Instagram URL for the university {university_name}, {url}? "
+            "Return only the Instagram URL, no other text. "
+            "No fabrication or guessing, just the Instagram URL. "
+            "Only if the Instagram URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the Instagram URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "twitter", "social_media_data", column="Twitter",
+        question=(
+            "What is the Twitter URL for the university {university_name}, {url}? "
+            "Return only the Twitter URL, no other text. "
+            "No fabrication or guessing, just the Twitter URL. "
+            "Only if the Twitter URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the Twitter URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "youtube", "social_media_data", column="Youtube",
+        question=(
+            "What is the YouTube URL for the university {university_name}, {url}? "
+            "Return only the YouTube URL, no other text. "
+            "No fabrication or guessing, just the YouTube URL. "
+            "Only if the YouTube URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the YouTube URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "tiktok", "social_media_data", column="Tiktok",
+        question=(
+            "What is the TikTok URL for the university {university_name}, {url}? "
+            "Return only the TikTok URL, no other text. "
+            "No fabrication or guessing, just the TikTok URL. "
+            "Only if the TikTok URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the TikTok URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "linkedin", "social_media_data", column="LinkedIn",
+        question=(
+            "What is the LinkedIn URL for the university {university_name}, {url}? "
+            "Return only the LinkedIn URL, no other text. "
+            "No fabrication or guessing, just the LinkedIn URL. "
+            "Only if the LinkedIn URL is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the LinkedIn URL is explicitly stated."
+        ),
+        value_type="url", volatility="static",
+    ),
+    FieldSpec(
+        "grad_avg_tuition", "student_statistics_data", column="GradAvgTuition",
+        url_source=('graduate_tuition_fee_urls', 'common_tuition_fee_urls'),
+        question=(
+            "What is the average graduate tuition for the university {university_name} at {url}? "
+            "Please look at the tution fees page for the university and it's pages and look for the average graduate tuition per yearReturn only the average graduate tuition, no other text. "
+            "No fabrication or guessing, just the average graduate tuition. "
+            "Only if the average graduate tuition is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the average graduate tuition is explicitly stated."
+        ),
+        value_type="money", volatility="frequent",
+    ),
+    FieldSpec(
+        "grad_international_students", "student_statistics_data", column="GradInternationalStudents",
+        question=(
+            "What is the number of graduate international students for the university {university_name}, {url}? "
+            "Return only the number of graduate international students, no other text. "
+            "No fabrication or guessing, just the number of graduate international students. "
+            "Only if the number of graduate international students is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the number of graduate international students is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "grad_scholarship_high", "student_statistics_data", column="GradScholarshipHigh",
+        url_source=('graduate_financial_aid_urls', 'common_financial_aid_urls'),
+        question=(
+            "What is the highest graduate scholarship for the university {university_name} at {url}? "
+            "Return only the highest graduate scholarship, no other text. "
+            "No fabrication or guessing, just the highest graduate scholarship. "
+            "Only if the highest graduate scholarship is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the highest graduate scholarship is explicitly stated."
+        ),
+        value_type="money", volatility="yearly",
+    ),
+    FieldSpec(
+        "grad_scholarship_low", "student_statistics_data", column="GradScholarshipLow",
+        url_source=('graduate_financial_aid_urls', 'common_financial_aid_urls'),
+        question=(
+            "What is the lowest graduate scholarship for the university {university_name} at {url}? "
+            "Return only the lowest graduate scholarship, no other text. "
+            "No fabrication or guessing, just the lowest graduate scholarship. "
+            "Only if the lowest graduate scholarship is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the lowest graduate scholarship is explicitly stated."
+        ),
+        value_type="money", volatility="yearly",
+    ),
+    FieldSpec(
+        "grad_total_students", "student_statistics_data", column="GradTotalStudents", value_type="number", volatility="yearly",
+        depends_on=("enrollment_breakdown",), derive=enrollment_count("graduate_students"),
+    ),
+    FieldSpec(
+        "ug_avg_tuition", "student_statistics_data", column="UGAvgTuition",
+        url_source=('undergraduate_tuition_fee_urls', 'common_tuition_fee_urls'),
+        question=(
+            "What is the average undergraduate tuition for the university {university_name} at {url}? "
+            "Return only the average undergraduate tuition, no other text. "
+            "No fabrication or guessing, just the average undergraduate tuition. "
+            "Only if the average undergraduate tuition is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the average undergraduate tuition is explicitly stated."
+        ),
+        value_type="money", volatility="frequent",
+    ),
+    FieldSpec(
+        "ug_international_students", "student_statistics_data", column="UGInternationalStudents",
+        question=(
+            "What is the number of undergraduate international students for the university {university_name}, {url}? "
+            "Return only the number of undergraduate international students, no other text. "
+            "No fabrication or guessing, just the number of undergraduate international students. "
+            "Only if the number of undergraduate international students is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the number of undergraduate international students is explicitly stated."
+        ),
+        value_type="number", volatility="yearly",
+    ),
+    FieldSpec(
+        "ug_scholarship_high", "student_statistics_data", column="UGScholarshipHigh",
+        url_source=('undergraduate_financial_aid_urls', 'common_financial_aid_urls'),
+        question=(
+            "What is the highest undergraduate scholarship for the university {university_name} at {url}? "
+            "Return only the highest undergraduate scholarship, no other text. "
+            "The value can be in percentage or amount. "
+            "No fabrication or guessing, just the highest undergraduate scholarship. "
+            "Only if the highest undergraduate scholarship is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the highest undergraduate scholarship is explicitly stated."
+        ),
+        value_type="money", volatility="yearly",
+    ),
+    FieldSpec(
+        "ug_scholarship_low", "student_statistics_data", column="UGScholarshipLow",
+        url_source=('undergraduate_financial_aid_urls', 'common_financial_aid_urls'),
+        question=(
+            "What is the lowest scholarship that can be awarded to undergraduate students at the university {university_name} at {url}? "
+            "The value can be in percentage or amount. "
+            "Return only the lowest undergraduate scholarship, no other text. "
+            "No fabrication or guessing, just the lowest undergraduate scholarship. "
+            "Only if the lowest undergraduate scholarship is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where the lowest undergraduate scholarship is explicitly stated."
+        ),
+        value_type="money", volatility="yearly",
+    ),
+    FieldSpec(
+        "ug_total_students", "student_statistics_data", column="UGTotalStudents", value_type="number", volatility="yearly",
+        depends_on=("enrollment_breakdown",), derive=enrollment_count("undergraduate_students"),
+    ),
+    FieldSpec(
+        "is_additional_information_available", "boolean_fields_data", column="IsAdditionalInformationAvailable", value_type="boolean", volatility="yearly",
+        depends_on=("additional_information",), derive=has_answer("additional_information"),
+    ),
+    FieldSpec(
+        "is_multiple_applications_allowed", "boolean_fields_data", column="IsMultipleApplicationsAllowed",
+        question=(
+            "Can a student apply to multiple programs at the university {university_name}, {url}? "
+            "Check through the website or its pages to find the answer. "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_act_required", "boolean_fields_data", column="IsACTRequired",
+        question=(
+            "Is ACT scorerequired for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_analytical_not_required", "boolean_fields_data", column="IsAnalyticalNotRequired",
+        question=(
+            "Is analytical writing not required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_analytical_optional", "boolean_fields_data", column="IsAnalyticalOptional",
+        question=(
+            "Is analytical writing optional for the university {university_name}, {url}? "
+            "Check through the website or its pages to find the answer. "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_duolingo_required", "boolean_fields_data", column="IsDuoLingoRequired",
+        question=(
+            "Is Duolingo required for the university {university_name}, {url}? "
+            "Check through the website or its pages to find the answer. "
+            "Does international students need to take Duolingo?If the website explicitly states that the university does not require Duolingo, return 'False'. "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_els_required", "boolean_fields_data", column="IsELSRequired",
+        question=(
+            "Is ELS required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_english_not_required", "boolean_fields_data", column="IsEnglishNotRequired",
+        question=(
+            "Is English proficiency not required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_english_optional", "boolean_fields_data", column="IsEnglishOptional",
+        question=(
+            "Is English proficiency test optional for the university {university_name}, {url}? "
+            "if the website explicitly states the international student does not need to take English proficiency test, return 'True'. "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_gmat_or_gre_required", "boolean_fields_data", column="IsGMATOrGreRequired",
+        question=(
+            "Is GMAT or GRE required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_gmat_required", "boolean_fields_data", column="IsGMATRequired",
+        question=(
+            "Is GMAT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_gre_required", "boolean_fields_data", column="IsGreRequired",
+        question=(
+            "Is GRE score required for the university {university_name}, {url} to apply for any program for the international students? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_ielts_required", "boolean_fields_data", column="IsIELTSRequired",
+        question=(
+            "Is IELTS score required for the university {university_name}, {url} to apply for any program for the international students? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_lsat_required", "boolean_fields_data", column="IsLSATRequired",
+        question=(
+            "Is LSAT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_mat_required", "boolean_fields_data", column="IsMATRequired",
+        question=(
+            "Is MAT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_mcat_required", "boolean_fields_data", column="IsMCATRequired",
+        question=(
+            "Is MCAT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_pte_required", "boolean_fields_data", column="IsPTERequired",
+        question=(
+            "Is PTE required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_sat_required", "boolean_fields_data", column="IsSATRequired",
+        question=(
+            "Is SAT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec(
+        "is_toefl_ib_required", "boolean_fields_data", column="IsTOEFLIBRequired",
+        question=(
+            "Is TOEFL iBT required for the university {university_name}, {url}? "
+            "Return only 'True' or 'False', no other text. "
+            "No fabrication or guessing, just True or False. "
+            "Only if this information is explicitly stated in the website, otherwise return null. "
+            "Also provide the evidence for your answer with correct URL or page where this information is explicitly stated."
+        ),
+        value_type="boolean", volatility="yearly",
+    ),
+    FieldSpec("is_import_verified", "boolean_fields_data", column="IsImportVerified", value_type="boolean", volatility="static", constant=False),
+    FieldSpec("is_imported", "boolean_fields_data", column="IsImported", value_type="boolean", volatility="static", constant=False),
+    FieldSpec("is_enrolled", "boolean_fields_data", column="IsEnrolled", value_type="boolean", volatility="static", constant=0),
+]
+
+FIELDS_BY_NAME = {spec.name: spec for spec in FIELDS}
+
+# Field name -> final CSV/Excel column
+COLUMN_MAPPING = {spec.name: spec.column for spec in FIELDS if spec.column}
+
+# All required final column names, in output order
+FINAL_COLUMNS = [
+    'CollegeName', 'CollegeCode', 'LogoPath', 'Phone', 'Email', 'SecondaryEmail', 'Street1', 'Street2',
+    'County', 'City', 'State', 'Country', 'ZipCode', 'WebsiteUrl', 'AdmissionOfficeUrl',
+    'VirtualTourUrl', 'Facebook', 'Instagram', 'Twitter', 'Youtube', 'Tiktok', 'ApplicationFees',
+    'TestPolicy', 'CoursesAndGrades', 'Recommendations', 'PersonalEssay', 'WritingSample',
+    'FinancialAidUrl', 'AdditionalInformation', 'AdditionalDeadlines',
+    'IsAdditionalInformationAvailable', 'Status', 'IsMultipleApplicationsAllowed',
+    'MaximumApplicationsAllowed', 'CreatedBy', 'CreatedDate', 'LiveDate', 'TuitionFees', 'UpdatedBy',
+    'UpdatedDate', 'CountryCode', 'LinkedIn', 'IsACTRequired', 'IsAnalyticalNotRequired',
+    'IsAnalyticalOptional', 'IsDuoLingoRequired', 'IsELSRequired', 'IsEnglishNotRequired',
+    'IsEnglishOptional', 'IsGMATOrGreRequired', 'IsGMATRequired', 'IsGreRequired', 'IsIELTSRequired',
+    'IsLSATRequired', 'IsMATRequired', 'IsMCATRequired', 'IsPTERequired', 'IsSATRequired',
+    'IsTOEFLIBRequired', 'QsWorldRanking', 'UsRanking', 'BatchId', 'IsImportVerified', 'IsImported',
+    'BannerImagePath', 'CollegeHtmlAdditionalInfo', 'Introduction', 'NumberOfCampuses',
+    'TotalFacultyAvailable', 'TotalProgramsAvailable', 'TotalStudentsEnrolled', 'CollegeSetting',
+    'TypeofInstitution', 'CountriesRepresented', 'GradAvgTuition', 'GradInternationalStudents',
+    'GradScholarshipHigh', 'GradScholarshipLow', 'GradTotalStudents', 'Student_Faculty',
+    'TotalGraduatePrograms', 'TotalInternationalStudents', 'TotalStudents', 'TotalUndergradMajors',
+    'UGAvgTuition', 'UGInternationalStudents', 'UGScholarshipHigh', 'UGScholarshipLow',
+    'UGTotalStudents', 'InstitutionType', 'IsEnrolled', 'OGAEnrolledProgramLevels'
+]
+
+
+def section_fields(section_key):
+    return [spec for spec in FIELDS if spec.section == section_key]
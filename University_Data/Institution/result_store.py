@@ -0,0 +1,85 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from university_registry import normalize_name
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS_PATH = os.path.join(DATA_DIR, ".cache", "institution_results.sqlite3")
+
+
+def age_days(extracted_at):
+    """Days since an ISO 8601 extraction time."""
+    extracted = datetime.fromisoformat(extracted_at)
+    if extracted.tzinfo is None:
+        extracted = extracted.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - extracted).total_seconds() / 86400
+
+
+class ResultStore:
+    """
+    SQLite store of the latest extracted record of each university (the flat CSV row),
+    keyed by the normalized university name, so a finished extraction can be served
+    again without rerunning the pipeline.
+    """
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " university_name TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " failed_fields INTEGER NOT NULL,"
+            " files TEXT NOT NULL,"
+            " extracted_at TEXT NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def put(self, university_name, record, extracted_at, failed_fields=0, files=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, university_name, record, failed_fields, files, extracted_at, stored_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalize_name(university_name), university_name, json.dumps(record, ensure_ascii=False, default=str),
+                 failed_fields, json.dumps(files or {}), extracted_at, time.time()),
+            )
+            self._conn.commit()
+
+    def get(self, university_name):
+        """{university_name, record, failed_fields, files, extracted_at} or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT university_name, record, failed_fields, files, extracted_at FROM results WHERE key = ?",
+                (normalize_name(university_name),),
+            ).fetchone()
+        if row is None:
+            return None
+        name, record, failed_fields, files, extracted_at = row
+        return {
+            "university_name": name,
+            "record": json.loads(record),
+            "failed_fields": failed_fields,
+            "files": json.loads(files),
+            "extracted_at": extracted_at,
+        }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """The process-wide result store (RESULT_STORE_PATH overrides its location)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ResultStore(os.getenv("RESULT_STORE_PATH", DEFAULT_RESULTS_PATH))
+    return _default_store
@@ -1,74 +1,29 @@
-import pandas as pd
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import json
+import sys
 import re
-import time
 
-load_dotenv()
+# Shared helpers (response cache, ...) live in University_Data/common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from model_calls import grounded_model
+import telemetry
+from program_runner import InstituteFallback, fields_schema, run_programs
+from university_registry import resolve_university
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+load_dotenv()
 
-tools = [genai.protos.Tool(google_search=genai.protos.Tool.GoogleSearch())]
-model = genai.GenerativeModel("gemini-2.5-pro", tools=tools)
+model = grounded_model("gemini-2.5-pro")
 
 # Get the directory where this script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 output_dir = os.path.join(script_dir, "Grad_prog_outputs")
-# Create directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
 csv_path = os.path.join(script_dir, 'graduate_programs.csv')
 json_path = os.path.join(output_dir, 'program_details_financial.json')
 
-# Check if CSV file exists
-if not os.path.exists(csv_path):
-    print(f"ERROR: CSV file not found: {csv_path}")
-    print("Please create a CSV file with columns: 'Program name', 'Program Page url'")
-    print("Example:")
-    print("Program name,Program Page url")
-    print("Computer Science,https://example.com/cs")
-    exit(1)
-
-program_data = pd.read_csv(csv_path)
-
-# Check if CSV has data
-if program_data.empty:
-    print(f"WARNING: CSV file is empty: {csv_path}")
-    print("Please add program data to the CSV file.")
-    exit(1)
-
-# Check if required columns exist
-required_columns = ['Program name', 'Program Page url']
-missing_columns = [col for col in required_columns if col not in program_data.columns]
-if missing_columns:
-    print(f"ERROR: CSV file is missing required columns: {', '.join(missing_columns)}")
-    print(f"Required columns: {', '.join(required_columns)}")
-    exit(1)
-
-# Institute level URL for fallback
-institute_url = "https://www.k-state.edu/"
 university_name = "Kansas State University"
-# Load existing data if the JSON file exists (for resuming)
-program_details_data = []
-processed_programs = set()
-if os.path.exists(json_path):
-    try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            program_details_data = json.load(f)
-            # Track which programs have already been processed
-            for record in program_details_data:
-                program_name = record.get('Program name')
-                if program_name:
-                    processed_programs.add(program_name)
-        print(f"Loaded {len(program_details_data)} existing records from {json_path}")
-    except Exception as e:
-        print(f"Warning: Could not load existing JSON file: {e}")
-
-def save_to_json(data, filepath):
-    """Save data to JSON file."""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+# Resolved from the university registry in main()
+institute_url = None
 
 def parse_json_from_response(text):
     """Parse JSON from Gemini response, handling markdown code blocks."""
@@ -89,6 +44,61 @@ def parse_json_from_response(text):
     except json.JSONDecodeError:
         return None
 
+# Fields the institute-level fallback can answer: JSON type and what to ask for
+institute_fields = {
+    'QsWorldRanking': ("number", "QS World University Ranking for the university. Return as number or null."),
+    'School': ("string", "General school/college information. Return null if not specified."),
+    'MaxFails': ("number", "Maximum number of failed courses allowed (general policy). Return as number or null."),
+    'MaxGPA': ("number", "Maximum GPA requirement or limit (general policy). Return as number (typically 0-4.0 scale) or null."),
+    'MinGPA': ("number", "Minimum GPA requirement (general policy). Return as number (typically 0-4.0 scale) or null."),
+    'PreviousYearAcceptanceRates': ("number", "General acceptance rate from previous year(s). Return as percentage (number) or null."),
+    'Term': ("string", "General application terms available (e.g., 'Fall', 'Spring', 'Summer'). Return as string or null."),
+    'LiveDate': ("string", "General program start dates. Return as date string (YYYY-MM-DD format preferred) or null."),
+    'DeadlineDate': ("string", "General application deadline dates. Return as date string (YYYY-MM-DD format preferred) or null."),
+    'Fees': ("number", "General application fees. Return as number (dollar amount) or null."),
+    'AverageScholarshipAmount': ("number", "Average scholarship amount offered (general). Return as number (dollar amount) or null."),
+    'ScholarshipAmount': ("number", "General scholarship amount available. Return as number (dollar amount) or null."),
+    'ScholarshipPercentage': ("number", "General scholarship percentage. Return as number (percentage) or null."),
+    'ScholarshipType': ("string", "General type of scholarship. Return as string or null."),
+}
+
+def fetch_institute_details(fields):
+    """Institute-level values of just the given fields."""
+    field_list = "".join(f"{number}. {field}: {institute_fields[field][1]}\n" for number, field in enumerate(fields, 1))
+    schema = fields_schema({field: institute_fields[field][0] for field in fields})
+    prompt_institute = (
+        f"You are extracting general program details, rankings, GPA requirements, deadlines, and financial information "
+        f"from the official {university_name} website.\n\n"
+        f"IMPORTANT: You MUST ONLY use information from the official {university_name} website ({institute_url} and its subdomains). "
+        f"Do NOT use information from any other sources. If the information is not available on the official {university_name} website, return null for that field.\n\n"
+        f"Institute URL: {institute_url}\n\n"
+        f"Extract the following fields ONLY if they are present on the official {university_name} website as GENERAL/INSTITUTE-LEVEL information:\n\n"
+        f"{field_list}\n"
+        f"CRITICAL REQUIREMENTS:\n"
+        f"- All data must be extracted ONLY from {institute_url} or other official {university_name} pages\n"
+        f"- Extract GENERAL/INSTITUTE-LEVEL information (not program-specific)\n"
+        f"- Do NOT infer, assume, or make up any information\n"
+        f"- If a field is not found, return null for that field\n"
+        f"- All URLs must be from the {university_name} domain or its subdomains\n\n"
+        f"Return a single JSON object (not an array) matching this JSON schema:\n{schema}\n"
+        f"Use null for any field where information is not available on the official website."
+    )
+
+    try:
+        response = model.generate_content(prompt_institute)
+        parsed_data = parse_json_from_response(response.text)
+    except Exception as e:
+        print(f"  Error extracting from institute level: {str(e)}")
+        raise
+    if parsed_data and isinstance(parsed_data, dict):
+        # Keys that were not asked for are dropped
+        return {field: parsed_data.get(field) for field in fields}
+    return None
+
+institute_fallback = InstituteFallback(
+    os.path.join(output_dir, 'institute_program_details_financial.json'), university_name, fetch_institute_details
+)
+
 def extract_program_details(program_name, program_url, institute_url):
     """Extract program details, rankings, and financial information.
     For Tuition fee and CostPerCredit: ONLY program level (no fallback).
@@ -156,6 +166,8 @@ def extract_program_details(program_name, program_url, institute_url):
                 program_data_result['extraction_level'] = 'program'
     except Exception as e:
         print(f"  Error extracting from program level: {str(e)}")
+        # A failed call is not "no data": record the program as failed so a rerun retries it
+        raise
     
     # For fields other than program-only fields, try institute level if not found
     # But ONLY if we didn't get program-level data for those fields
@@ -163,59 +175,14 @@ def extract_program_details(program_name, program_url, institute_url):
     
     # Check which fields need institute-level fallback (excluding program-only fields)
     fields_needing_fallback = []
-    for field in ['QsWorldRanking', 'School', 'MaxFails', 'MaxGPA', 'MinGPA', 'PreviousYearAcceptanceRates',
-                   'Term', 'LiveDate', 'DeadlineDate', 'Fees', 'AverageScholarshipAmount',
-                   'ScholarshipAmount', 'ScholarshipPercentage', 'ScholarshipType', 'Program duration']:
+    for field in institute_fields:
         if program_data_result.get(field) is None or program_data_result.get(field) == "":
             fields_needing_fallback.append(field)
     
     # Only try institute level if we have fields that need fallback
     if fields_needing_fallback:
-        print(f"  Some fields not found at program level, trying institute level for: {', '.join(fields_needing_fallback)}")
-        prompt_institute = (
-            f"You are extracting general program details, rankings, GPA requirements, deadlines, and financial information "
-            f"from the official {university_name} website.\n\n"
-            f"IMPORTANT: You MUST ONLY use information from the official {university_name} website ({institute_url} and its subdomains). "
-            f"Do NOT use information from any other sources. If the information is not available on the official {university_name} website, return null for that field.\n\n"
-            f"Institute URL: {institute_url}\n\n"
-            f"Extract the following fields ONLY if they are present on the official {university_name} website as GENERAL/INSTITUTE-LEVEL information:\n\n"
-            f"1. QsWorldRanking: QS World University Ranking for the university. Return as number or null.\n"
-            f"2. School: General school/college information. Return null if not specified.\n"
-            f"3. MaxFails: Maximum number of failed courses allowed (general policy). Return as number or null.\n"
-            f"4. MaxGPA: Maximum GPA requirement or limit (general policy). Return as number (typically 0-4.0 scale) or null.\n"
-            f"5. MinGPA: Minimum GPA requirement (general policy). Return as number (typically 0-4.0 scale) or null.\n"
-            f"6. PreviousYearAcceptanceRates: General acceptance rate from previous year(s). Return as percentage (number) or null.\n"
-            f"7. Term: General application terms available (e.g., 'Fall', 'Spring', 'Summer'). Return as string or null.\n"
-            f"8. LiveDate: General program start dates. Return as date string (YYYY-MM-DD format preferred) or null.\n"
-            f"9. DeadlineDate: General application deadline dates. Return as date string (YYYY-MM-DD format preferred) or null.\n"
-            f"10. Fees: General application fees. Return as number (dollar amount) or null.\n"
-            f"11. AverageScholarshipAmount: Average scholarship amount offered (general). Return as number (dollar amount) or null.\n"
-            f"12. ScholarshipAmount: General scholarship amount available. Return as number (dollar amount) or null.\n"
-            f"13. ScholarshipPercentage: General scholarship percentage. Return as number (percentage) or null.\n"
-            f"14. ScholarshipType: General type of scholarship. Return as string or null.\n"
-            f"15. Program duration: This field should be null at institute level (program-specific). Return null.\n\n"
-            f"CRITICAL REQUIREMENTS:\n"
-            f"- All data must be extracted ONLY from {institute_url} or other official {university_name} pages\n"
-            f"- Extract GENERAL/INSTITUTE-LEVEL information (not program-specific)\n"
-            f"- Do NOT infer, assume, or make up any information\n"
-            f"- If a field is not found, return null for that field\n"
-            f"- All URLs must be from the {university_name} domain or its subdomains\n\n"
-            f"Return the data in a JSON format with the following exact keys: "
-            f"'QsWorldRanking', 'School', 'MaxFails', 'MaxGPA', 'MinGPA', 'PreviousYearAcceptanceRates', "
-            f"'Term', 'LiveDate', 'DeadlineDate', 'Fees', 'AverageScholarshipAmount', "
-            f"'ScholarshipAmount', 'ScholarshipPercentage', 'ScholarshipType', 'Program duration'. "
-            f"Return a single JSON object, not an array. Use null for any field where information is not available on the official website."
-        )
-        
-        try:
-            response = model.generate_content(prompt_institute)
-            response_text = response.text
-            parsed_data = parse_json_from_response(response_text)
-            
-            if parsed_data and isinstance(parsed_data, dict):
-                institute_data_result = parsed_data
-        except Exception as e:
-            print(f"  Error extracting from institute level: {str(e)}")
+        print(f"  Some fields not found at program level, using institute level for: {', '.join(fields_needing_fallback)}")
+        institute_data_result = institute_fallback.values(fields_needing_fallback)
     
     # Merge results: prefer program-level data, use institute-level for missing fields (except program-only fields)
     final_result = {}
@@ -243,59 +210,76 @@ def extract_program_details(program_name, program_url, institute_url):
     
     return final_result
 
-for index, row in program_data.iterrows():
-    program_name = row['Program name']
-    program_page_url = row['Program Page url']
-    
-    # Skip if already processed
-    if program_name in processed_programs:
-        print(f"Skipping {program_name} (already processed)")
-        continue
-    
-    print(f"Processing: {program_name}")
-    
-    try:
-        extracted_data = extract_program_details(program_name, program_page_url, institute_url)
-        
-        # Add program name and URL to the data
-        extracted_data['Program name'] = program_name
-        extracted_data['Program Page url'] = program_page_url
-        program_details_data.append(extracted_data)
-        processed_programs.add(program_name)
-        
-        # Save immediately to preserve progress
-        save_to_json(program_details_data, json_path)
-        print(f"✓ Processed and saved: {program_name} (level: {extracted_data.get('extraction_level', 'unknown')})")
-        
-        # Small delay to avoid rate limiting
-        time.sleep(1)
-    
-    except Exception as e:
-        print(f"Error processing program {program_name}: {str(e)}")
-        error_record = {
-            'Program name': program_name,
-            'Program Page url': program_page_url,
-            'QsWorldRanking': None, 'School': None, 'MaxFails': None, 'MaxGPA': None, 'MinGPA': None,
-            'PreviousYearAcceptanceRates': None, 'Term': None, 'LiveDate': None, 'DeadlineDate': None,
-            'Fees': None, 'AverageScholarshipAmount': None, 'CostPerCredit': None,
-            'ScholarshipAmount': None, 'ScholarshipPercentage': None, 'ScholarshipType': None,
-            'Program duration': None, 'Tuition fee': None, 'extraction_level': 'error', 'error': str(e)
-        }
-        program_details_data.append(error_record)
-        processed_programs.add(program_name)
-        save_to_json(program_details_data, json_path)
-        print(f"✗ Error saved for program {program_name}")
+def error_record(program_name, program_url, error):
+    return {
+        'Program name': program_name,
+        'Program Page url': program_url,
+        'QsWorldRanking': None, 'School': None, 'MaxFails': None, 'MaxGPA': None, 'MinGPA': None,
+        'PreviousYearAcceptanceRates': None, 'Term': None, 'LiveDate': None, 'DeadlineDate': None,
+        'Fees': None, 'AverageScholarshipAmount': None, 'CostPerCredit': None,
+        'ScholarshipAmount': None, 'ScholarshipPercentage': None, 'ScholarshipType': None,
+        'Program duration': None, 'Tuition fee': None, 'extraction_level': 'error', 'error': str(error)
+    }
+
 
-# Final save
-save_to_json(program_details_data, json_path)
+def main():
+    global institute_url
+    import pandas as pd
+
+    # Create directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Check if CSV file exists
+    if not os.path.exists(csv_path):
+        print(f"ERROR: CSV file not found: {csv_path}")
+        print("Please create a CSV file with columns: 'Program name', 'Program Page url'")
+        print("Example:")
+        print("Program name,Program Page url")
+        print("Computer Science,https://example.com/cs")
+        exit(1)
+
+    program_data = pd.read_csv(csv_path)
+
+    # Check if CSV has data
+    if program_data.empty:
+        print(f"WARNING: CSV file is empty: {csv_path}")
+        print("Please add program data to the CSV file.")
+        exit(1)
+
+    # Check if required columns exist
+    required_columns = ['Program name', 'Program Page url']
+    missing_columns = [col for col in required_columns if col not in program_data.columns]
+    if missing_columns:
+        print(f"ERROR: CSV file is missing required columns: {', '.join(missing_columns)}")
+        print(f"Required columns: {', '.join(required_columns)}")
+        exit(1)
+
+    # Institute level URL for fallback (from the university registry)
+    telemetry.set_tags(pipeline="graduate_programs", field="extract_program_details_financial", university=university_name)
+    institute_url, university_entry = resolve_university(
+        university_name,
+        lambda prompt: model.generate_content(prompt).text.replace("**", "").replace("```", "").strip()
+    )
+
+    # Programs run on a worker pool; each finished one is journaled, the JSON is written (in CSV order) at the end
+    programs = list(zip(program_data['Program name'], program_data['Program Page url']))
+    program_details_data = run_programs(
+        programs,
+        lambda program_name, program_url: extract_program_details(program_name, program_url, institute_url),
+        error_record,
+        json_path,
+    )
+
+    # Also save as CSV
+    csv_output_path = os.path.join(output_dir, university_name + '_program_details_financial.csv')
+    if program_details_data:
+        df = pd.DataFrame(program_details_data)
+        df.to_csv(csv_output_path, index=False, encoding='utf-8')
+        print(f"\nSuccessfully processed {len(program_details_data)} programs")
+        print(f"Data saved to {json_path} and {csv_output_path}")
+    else:
+        print("No data to save")
 
-# Also save as CSV
-csv_output_path = os.path.join(output_dir, university_name + '_program_details_financial.csv')
-if program_details_data:
-    df = pd.DataFrame(program_details_data)
-    df.to_csv(csv_output_path, index=False, encoding='utf-8')
-    print(f"\nSuccessfully processed {len(program_details_data)} programs")
-    print(f"Data saved to {json_path} and {csv_output_path}")
-else:
-    print("No data to save")
 
+if __name__ == "__main__":
+    main()
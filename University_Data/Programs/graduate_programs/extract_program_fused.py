@@ -0,0 +1,302 @@
+import os
+from dotenv import load_dotenv
+import json
+import sys
+import re
+
+# Shared helpers (response cache, ...) live in University_Data/common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from model_calls import grounded_model
+import telemetry
+from program_runner import InstituteFallback, fields_schema, run_programs, save_program_records
+from university_registry import resolve_university
+from merge_and_standardize import COLUMN_MAPPING
+
+load_dotenv()
+
+model = grounded_model("gemini-2.5-pro")
+
+# Fused mode: one call per program for every field merge_and_standardize.py uses, instead of
+# the program (and institute) calls of the four per-stage extractors. Each field has its JSON
+# type, what to ask for and the per-stage JSON artifact it is written to.
+PROGRAM_FIELDS = {
+    'QsWorldRanking': ("number", "QS World University Ranking for the university. Return as number or null.", 'program_details_financial.json'),
+    'School': ("string", "The school/college/department name that offers this program. Return null if not specified.", 'program_details_financial.json'),
+    'MaxFails': ("number", "Maximum number of failed courses allowed. Return as number or null.", 'program_details_financial.json'),
+    'MaxGPA': ("number", "Maximum GPA requirement or limit. Return as number (typically 0-4.0 scale) or null.", 'program_details_financial.json'),
+    'MinGPA': ("number", "Minimum GPA requirement. Return as number (typically 0-4.0 scale) or null.", 'program_details_financial.json'),
+    'PreviousYearAcceptanceRates': ("number", "Acceptance rate from previous year(s). Return as percentage (number) or null.", 'program_details_financial.json'),
+    'Term': ("string", "Application terms available (e.g., 'Fall', 'Spring', 'Summer', 'Fall, Spring'). Return as string or null.", 'program_details_financial.json'),
+    'LiveDate': ("string", "Program start date or live date. Return as date string (YYYY-MM-DD format preferred) or null.", 'program_details_financial.json'),
+    'DeadlineDate': ("string", "Application deadline date. Return as date string (YYYY-MM-DD format preferred) or null.", 'program_details_financial.json'),
+    'Fees': ("number", "Application fees or other fees. Return as number (dollar amount) or null.", 'program_details_financial.json'),
+    'AverageScholarshipAmount': ("number", "Average scholarship amount offered. Return as number (dollar amount) or null.", 'program_details_financial.json'),
+    'CostPerCredit': ("number", "Cost per credit hour for THIS SPECIFIC PROGRAM. Return as number (dollar amount) or null. IMPORTANT: This must be program-specific, not general university tuition.", 'program_details_financial.json'),
+    'ScholarshipAmount': ("number", "Scholarship amount available. Return as number (dollar amount) or null.", 'program_details_financial.json'),
+    'ScholarshipPercentage': ("number", "Scholarship percentage. Return as number (percentage) or null.", 'program_details_financial.json'),
+    'ScholarshipType': ("string", "Type of scholarship (e.g., 'Merit-based', 'Need-based', 'Graduate Assistantship'). Return as string or null.", 'program_details_financial.json'),
+    'Tuition fee': ("number", "Total tuition fee for THIS SPECIFIC PROGRAM. Return as number (dollar amount) or null. IMPORTANT: This must be program-specific tuition, not general university tuition. If only general university tuition is available, return null.", 'program_details_financial.json'),
+    'GreOrGmat': ("string", "Whether GRE or GMAT is required, optional, or not required. Return 'GRE', 'GMAT', 'Either', 'Optional', 'Not Required', or null.", 'test_scores_requirements.json'),
+    'EnglishScore': ("string", "General English language requirement description if mentioned. Return null if not specified.", 'test_scores_requirements.json'),
+    'IsDuoLingoRequired': ("boolean", "Boolean (true/false) - Is Duolingo English test required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsELSRequired': ("boolean", "Boolean (true/false) - Is ELS (English Language Services) required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsGMATOrGreRequired': ("boolean", "Boolean (true/false) - Is either GMAT or GRE required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsGMATRequired': ("boolean", "Boolean (true/false) - Is GMAT specifically required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsGreRequired': ("boolean", "Boolean (true/false) - Is GRE specifically required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsIELTSRequired': ("boolean", "Boolean (true/false) - Is IELTS required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsLSATRequired': ("boolean", "Boolean (true/false) - Is LSAT required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsMATRequired': ("boolean", "Boolean (true/false) - Is MAT required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsMCATRequired': ("boolean", "Boolean (true/false) - Is MCAT required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsPTERequired': ("boolean", "Boolean (true/false) - Is PTE (Pearson Test of English) required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsTOEFLIBRequired': ("boolean", "Boolean (true/false) - Is TOEFL iBT (Internet-based Test) required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsTOEFLPBTRequired': ("boolean", "Boolean (true/false) - Is TOEFL PBT (Paper-based Test) required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsEnglishNotRequired': ("boolean", "Boolean (true/false) - Is English test not required? Return true, false, or null.", 'test_scores_requirements.json'),
+    'IsEnglishOptional': ("boolean", "Boolean (true/false) - Is English test optional? Return true, false, or null.", 'test_scores_requirements.json'),
+    'MinimumDuoLingoScore': ("number", "Minimum required Duolingo score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumELSScore': ("number", "Minimum required ELS score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumGMATScore': ("number", "Minimum required GMAT score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumGreScore': (["string", "number"], "Minimum required GRE score. Can be total score or section scores. Return as string or number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumIELTSScore': ("number", "Minimum required IELTS score as a number (typically 0-9). Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumMATScore': ("number", "Minimum required MAT score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumMCATScore': ("number", "Minimum required MCAT score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumPTEScore': ("number", "Minimum required PTE score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumTOEFLScore': ("number", "Minimum required TOEFL score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'MinimumLSATScore': ("number", "Minimum required LSAT score as a number. Return null if not specified.", 'test_scores_requirements.json'),
+    'Resume': ("string", "Is a resume/CV required? Return 'Required', 'Optional', 'Not Required', or null.", 'application_requirements.json'),
+    'StatementOfPurpose': ("string", "Is a statement of purpose required? Return 'Required', 'Optional', 'Not Required', or null.", 'application_requirements.json'),
+    'Requirements': ("string", "General application requirements text/description. Return null if not specified.", 'application_requirements.json'),
+    'WritingSample': ("string", "Is a writing sample required? Return 'Required', 'Optional', 'Not Required', or null.", 'application_requirements.json'),
+    'IsAnalyticalNotRequired': ("boolean", "Boolean (true/false) - Is analytical writing section not required? Return true, false, or null.", 'application_requirements.json'),
+    'IsAnalyticalOptional': ("boolean", "Boolean (true/false) - Is analytical writing section optional? Return true, false, or null.", 'application_requirements.json'),
+    'IsRecommendationSystemOpted': ("boolean", "Boolean (true/false) - Is a recommendation system/letters of recommendation used? Return true, false, or null.", 'application_requirements.json'),
+    'IsStemProgram': ("boolean", "Boolean (true/false) - Is this a STEM program? Return true, false, or null.", 'application_requirements.json'),
+    'IsACTRequired': ("boolean", "Boolean (true/false) - Is ACT required? Return true, false, or null.", 'application_requirements.json'),
+    'IsSATRequired': ("boolean", "Boolean (true/false) - Is SAT required? Return true, false, or null.", 'application_requirements.json'),
+    'MinimumACTScore': ("number", "Minimum required ACT score as a number. Return null if not specified.", 'application_requirements.json'),
+    'MinimumSATScore': ("number", "Minimum required SAT score as a number. Return null if not specified.", 'application_requirements.json'),
+    'Concentration name': ("string", "The specific concentration, specialization, or track name if the program offers concentrations. If no concentration is mentioned, return null.", 'extra_fields_data.json'),
+    'description': ("string", "A comprehensive description of the program, its objectives, and what students will learn. Extract the full program description from the official page. If not available, return null.", 'extra_fields_data.json'),
+    'Accreditation status': ("string", "Any accreditation information mentioned for this specific program. Include the accrediting body name and status if available. If not mentioned, return null.", 'extra_fields_data.json'),
+}
+ARTIFACTS = ['program_details_financial.json', 'test_scores_requirements.json',
+             'application_requirements.json', 'extra_fields_data.json']
+# Only the program itself can answer these; they never fall back to institute level
+PROGRAM_ONLY_FIELDS = ['Tuition fee', 'CostPerCredit', 'IsStemProgram',
+                       'Concentration name', 'description', 'Accreditation status']
+# As in the per-stage extractors: these artifacts use institute-level values only for programs
+# without any program-level value, the financial one falls back field by field
+WHOLE_ARTIFACT_FALLBACK = ['test_scores_requirements.json', 'application_requirements.json']
+# The extra fields artifact never had an extraction level
+LEVELLED_ARTIFACTS = ARTIFACTS[:3]
+BASE_COLUMNS = ['Program name', 'Level', 'Program Page url']
+
+
+def has_value(value):
+    return value is not None and value != ""
+
+# Get the directory where this script is located
+script_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.join(script_dir, "Grad_prog_outputs")
+csv_path = os.path.join(script_dir, 'graduate_programs.csv')
+json_path = os.path.join(output_dir, 'program_fused.json')
+
+university_name = "Kansas State University"
+# Resolved from the university registry in main()
+institute_url = None
+
+def parse_json_from_response(text):
+    """Parse JSON from Gemini response, handling markdown code blocks."""
+    # Remove markdown formatting
+    text = text.replace("**", "").replace("```json", "").replace("```", "").strip()
+
+    # Try to extract JSON from the text
+    json_match = re.search(r'\{.*\}', text, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group())
+        except json.JSONDecodeError:
+            pass
+
+    # If no match, try parsing the whole text
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+def field_list(fields):
+    return "".join(f"{number}. {field}: {PROGRAM_FIELDS[field][1]}\n" for number, field in enumerate(fields, 1))
+
+def field_schema(fields):
+    return fields_schema({field: PROGRAM_FIELDS[field][0] for field in fields})
+
+program_fields = list(PROGRAM_FIELDS)
+program_field_list = field_list(program_fields)
+program_schema = field_schema(program_fields)
+
+def fetch_institute_fields(fields):
+    """Institute-level values of just the given fields."""
+    prompt_institute = (
+        f"You are extracting general program details, financial information, test score requirements and application requirements "
+        f"from the official {university_name} website.\n\n"
+        f"IMPORTANT: You MUST ONLY use information from the official {university_name} website ({institute_url} and its subdomains). "
+        f"Do NOT use information from any other sources. If the information is not available on the official {university_name} website, return null for that field.\n\n"
+        f"Institute URL: {institute_url}\n\n"
+        f"Extract the following fields ONLY if they are present on the official {university_name} website as GENERAL/INSTITUTE-LEVEL information:\n\n"
+        f"{field_list(fields)}\n"
+        f"CRITICAL REQUIREMENTS:\n"
+        f"- All data must be extracted ONLY from {institute_url} or other official {university_name} pages\n"
+        f"- Extract GENERAL/INSTITUTE-LEVEL information (not program-specific)\n"
+        f"- Do NOT infer, assume, or make up any information\n"
+        f"- If a field is not found, return null for that field\n"
+        f"- All URLs must be from the {university_name} domain or its subdomains\n\n"
+        f"Return a single JSON object (not an array) matching this JSON schema:\n{field_schema(fields)}\n"
+        f"Use null for any field where information is not available on the official website."
+    )
+
+    try:
+        response = model.generate_content(prompt_institute)
+        parsed_data = parse_json_from_response(response.text)
+    except Exception as e:
+        print(f"  Error extracting from institute level: {str(e)}")
+        raise
+    if parsed_data and isinstance(parsed_data, dict):
+        # Keys that were not asked for are dropped
+        return {field: parsed_data.get(field) for field in fields}
+    return None
+
+institute_fallback = InstituteFallback(
+    os.path.join(output_dir, 'institute_program_fused.json'), university_name, fetch_institute_fields
+)
+
+def artifact_fields(artifact):
+    return [field for field in program_fields if PROGRAM_FIELDS[field][2] == artifact]
+
+def extract_program_fused(program_name, program_url):
+    """All fields of one program in one call; institute-level values fill the gaps."""
+    prompt_program = (
+        f"You are extracting program details, rankings, GPA requirements, deadlines, financial information, "
+        f"test score and English language requirements, application requirements and a program description "
+        f"for the program '{program_name}' from the official {university_name} website.\n\n"
+        f"IMPORTANT: You MUST ONLY use information from the official {university_name} website ({institute_url} and its subdomains). "
+        f"Do NOT use information from any other sources. If the information is not available on the official {university_name} website, return null for that field.\n\n"
+        f"Program URL: {program_url}\n\n"
+        f"Extract the following fields ONLY if they are present on the official {university_name} website for THIS SPECIFIC PROGRAM:\n\n"
+        f"{program_field_list}\n"
+        f"CRITICAL REQUIREMENTS:\n"
+        f"- All data must be extracted ONLY from {program_url} or other official {university_name} pages\n"
+        f"- Extract information SPECIFIC to this program '{program_name}'\n"
+        f"- For 'Tuition fee' and 'CostPerCredit': These MUST be program-specific. If only general university tuition is mentioned, return null.\n"
+        f"- Do NOT infer, assume, or make up any information\n"
+        f"- If a field is not found on the program page, return null for that field\n"
+        f"- All URLs must be from the {university_name} domain or its subdomains\n"
+        f"- Ensure all extracted text is accurate and verbatim from the source\n\n"
+        f"Return a single JSON object (not an array) matching this JSON schema:\n{program_schema}\n"
+        f"Use null for any field where information is not available on the official website."
+    )
+
+    response = model.generate_content(prompt_program)
+    parsed_data = parse_json_from_response(response.text)
+    if isinstance(parsed_data, list) and len(parsed_data) > 0:
+        parsed_data = parsed_data[0]
+    if not isinstance(parsed_data, dict):
+        # Saved as failed, so a rerun retries the program
+        raise ValueError('Failed to parse JSON response')
+    program_values = {field: parsed_data.get(field) for field in program_fields}
+
+    # Fields to take from institute level, asked (once per university) in a single call
+    fallback_fields = []
+    for artifact in LEVELLED_ARTIFACTS:
+        fields = [field for field in artifact_fields(artifact) if field not in PROGRAM_ONLY_FIELDS]
+        if artifact in WHOLE_ARTIFACT_FALLBACK:
+            if not any(has_value(program_values[field]) for field in artifact_fields(artifact)):
+                fallback_fields.extend(fields)
+        else:
+            fallback_fields.extend(field for field in fields if not has_value(program_values[field]))
+    institute_values = institute_fallback.values(fallback_fields) if fallback_fields else {}
+
+    artifacts = {}
+    for artifact in ARTIFACTS:
+        fields = artifact_fields(artifact)
+        record = {field: program_values[field] for field in fields}
+        if artifact in LEVELLED_ARTIFACTS:
+            fallback = [field for field in fields if field in fallback_fields and field in institute_values]
+            for field in fallback:
+                record[field] = institute_values[field]
+            if any(has_value(program_values[field]) for field in fields if field not in PROGRAM_ONLY_FIELDS):
+                record['extraction_level'] = 'program'
+            elif fallback and (artifact in WHOLE_ARTIFACT_FALLBACK or any(has_value(record[field]) for field in fallback)):
+                record['extraction_level'] = 'institute'
+            else:
+                record['extraction_level'] = 'none'
+        artifacts[artifact] = record
+    return {'artifacts': artifacts}
+
+def error_record(program_name, program_url, error):
+    return {'Program name': program_name, 'Program Page url': program_url, 'error': str(error)}
+
+
+def main():
+    global institute_url
+    import pandas as pd
+
+    # Create directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Every mapped field must be asked for, or the merged CSV silently loses a column
+    unknown_fields = [field for field in COLUMN_MAPPING if field not in BASE_COLUMNS and field not in PROGRAM_FIELDS]
+    if unknown_fields:
+        print(f"ERROR: merge_and_standardize.COLUMN_MAPPING has fields without a description here: {', '.join(unknown_fields)}")
+        exit(1)
+
+    # Check if CSV file exists
+    if not os.path.exists(csv_path):
+        print(f"ERROR: CSV file not found: {csv_path}")
+        print("Please create a CSV file with columns: 'Program name', 'Program Page url'")
+        exit(1)
+
+    program_data = pd.read_csv(csv_path)
+
+    # Check if CSV has data
+    if program_data.empty:
+        print(f"WARNING: CSV file is empty: {csv_path}")
+        exit(1)
+
+    # Check if required columns exist
+    required_columns = ['Program name', 'Program Page url']
+    missing_columns = [col for col in required_columns if col not in program_data.columns]
+    if missing_columns:
+        print(f"ERROR: CSV file is missing required columns: {', '.join(missing_columns)}")
+        exit(1)
+
+    # Institute level URL for fallback (from the university registry)
+    telemetry.set_tags(pipeline="graduate_programs", field="extract_program_fused", university=university_name)
+    institute_url, university_entry = resolve_university(
+        university_name,
+        lambda prompt: model.generate_content(prompt).text.replace("**", "").replace("```", "").strip()
+    )
+
+    # Programs run on a worker pool; each finished one is journaled, the JSON is written (in CSV order) at the end
+    programs = list(zip(program_data['Program name'], program_data['Program Page url']))
+    fused_data = run_programs(programs, extract_program_fused, error_record, json_path)
+
+    # Write the four per-stage artifacts, so merge_and_standardize.py works unchanged
+    for artifact in ARTIFACTS:
+        artifact_records = []
+        for record in fused_data:
+            base = {'Program name': record.get('Program name'), 'Program Page url': record.get('Program Page url')}
+            if record.get('error'):
+                error_fields = dict.fromkeys(artifact_fields(artifact))
+                if artifact in LEVELLED_ARTIFACTS:
+                    error_fields['extraction_level'] = 'error'
+                artifact_records.append({**base, **error_fields, 'error': record['error']})
+            else:
+                artifact_records.append({**record['artifacts'][artifact], **base})
+        save_program_records(artifact_records, os.path.join(output_dir, artifact))
+
+    failed_count = sum(1 for record in fused_data if record.get('error'))
+    print(f"\nSuccessfully processed {len(fused_data) - failed_count} programs ({failed_count} failed)")
+    print(f"Data saved to {json_path} and the per-stage files: {', '.join(ARTIFACTS)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,26 @@
-import pandas as pd
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import json
+import sys
 import re
 
-load_dotenv()
+# Shared helpers (response cache, ...) live in University_Data/common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from model_calls import grounded_model
+import telemetry
+from university_registry import resolve_university
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+load_dotenv()
 
-tools = [
-    genai.protos.Tool(
-        google_search=genai.protos.Tool.GoogleSearch()
-    )
-]
-model = genai.GenerativeModel("gemini-2.5-pro", tools=tools)
+model = grounded_model("gemini-2.5-pro")
 
 # Get the directory where this script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
 output_dir = os.path.join(script_dir, "Grad_prog_outputs")
-# Create directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
 
 university_name = "Kansas State University"
-prompt = f"What is the official university website for {university_name}?"
-website_url = model.generate_content(prompt).text.replace("**", "").replace("```", "").strip()
-print(website_url)
-institute_url = website_url
-# Use a more generic search or let the model find the grad page if needed, 
-# but for now, we'll try to find the grad programs page dynamically or start from the main page if specific URL is unknown
-graduate_program_url = "https://www.k-state.edu/grad/academics/degrees-certificates.html"
+# Resolved from the university registry in main()
+institute_url = None
 
 def get_program_names(website_url):
     prompt = (
@@ -94,34 +85,55 @@ def get_graduate_programs(website_url):
             
     return complete_programs
 
-graduate_programs = get_graduate_programs(graduate_program_url)
 
-if graduate_programs:
-    # Save the graduate programs to JSON file
-    json_path = os.path.join(output_dir, 'graduate_programs.json')
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(graduate_programs, f, indent=4, ensure_ascii=False)
-    print(f"Data saved to JSON: {json_path}")
+def main():
+    global institute_url
+    import pandas as pd
     
-    # Save the graduate programs to CSV file
-    csv_path = os.path.join(output_dir, 'graduate_programs.csv')
-    df = pd.DataFrame(graduate_programs)
-    df.to_csv(csv_path, index=False, encoding='utf-8')
-    print(f"Data saved to CSV: {csv_path}")
-    print(f"Total programs found: {len(graduate_programs)}")
+    # Create directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
     
-    # Also save to the script directory for easy access
-    script_json_path = os.path.join(script_dir, 'graduate_programs.json')
-    script_csv_path = os.path.join(script_dir, 'graduate_programs.csv')
+    telemetry.set_tags(pipeline="graduate_programs", field="extract_programs_list", university=university_name)
+    website_url, university_entry = resolve_university(
+        university_name,
+        lambda prompt: model.generate_content(prompt).text.replace("**", "").replace("```", "").strip()
+    )
+    print(website_url)
+    institute_url = website_url
+    # Start from the program list page recorded in the registry, falling back to the main site
+    graduate_program_url = (university_entry or {}).get("key_urls", {}).get("graduate_programs", institute_url)
     
-    with open(script_json_path, 'w', encoding='utf-8') as f:
-        json.dump(graduate_programs, f, indent=4, ensure_ascii=False)
+    graduate_programs = get_graduate_programs(graduate_program_url)
     
-    df.to_csv(script_csv_path, index=False, encoding='utf-8')
-    print(f"Also saved to script directory: {script_csv_path}")
+    if graduate_programs:
+        # Save the graduate programs to JSON file
+        json_path = os.path.join(output_dir, 'graduate_programs.json')
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(graduate_programs, f, indent=4, ensure_ascii=False)
+        print(f"Data saved to JSON: {json_path}")
     
-    print("\nFirst few programs:")
-    print(graduate_programs[:3] if len(graduate_programs) > 3 else graduate_programs)
-else:
-    print("No graduate programs found or error occurred.")
+        # Save the graduate programs to CSV file
+        csv_path = os.path.join(output_dir, 'graduate_programs.csv')
+        df = pd.DataFrame(graduate_programs)
+        df.to_csv(csv_path, index=False, encoding='utf-8')
+        print(f"Data saved to CSV: {csv_path}")
+        print(f"Total programs found: {len(graduate_programs)}")
+
+        # Also save to the script directory for easy access
+        script_json_path = os.path.join(script_dir, 'graduate_programs.json')
+        script_csv_path = os.path.join(script_dir, 'graduate_programs.csv')
+
+        with open(script_json_path, 'w', encoding='utf-8') as f:
+            json.dump(graduate_programs, f, indent=4, ensure_ascii=False)
+
+        df.to_csv(script_csv_path, index=False, encoding='utf-8')
+        print(f"Also saved to script directory: {script_csv_path}")
+
+        print("\nFirst few programs:")
+        print(graduate_programs[:3] if len(graduate_programs) > 3 else graduate_programs)
+    else:
+        print("No graduate programs found or error occurred.")
+
 
+if __name__ == "__main__":
+    main()
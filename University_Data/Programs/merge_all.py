@@ -1,7 +1,8 @@
-import pandas as pd
 import os
 
 def main():
+    import pandas as pd
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
     # Paths to the final CSVs
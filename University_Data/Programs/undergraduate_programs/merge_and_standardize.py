@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 import json
 
@@ -114,6 +113,8 @@ def load_json_data(filepath):
         return []
 
 def main():
+    import pandas as pd
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     output_dir = os.path.join(script_dir, "undergrad_prog_outputs")
     os.makedirs(output_dir, exist_ok=True)
@@ -159,6 +160,8 @@ def main():
             # Drop Program Page url from merge tables to avoid suffixes, keep it from base
             if 'Program Page url' in df.columns:
                 df = df.drop(columns=['Program Page url'])
+            # Per-file bookkeeping (not target columns) would collide between the merged files
+            df = df.drop(columns=[col for col in ['extraction_level', 'error'] if col in df.columns])
             
             final_df = pd.merge(final_df, df, on=merge_key, how='left')
             print(f"Merged dataset {i+1}, columns now: {len(final_df.columns)}")
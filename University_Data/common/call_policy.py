@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+from rate_limiter import is_throttle_error
+
+logger = logging.getLogger(__name__)
+
+# Grounded gemini-2.5-pro answers routinely take a minute; anything far beyond that is hung
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_CALL_TIMEOUT_SECONDS", "180"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("GEMINI_MAX_ATTEMPTS", "4"))
+DEFAULT_BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", "2"))
+DEFAULT_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", "60"))
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "60"))
+
+RETRYABLE_CODES = (408, 429, 500, 502, 503, 504)
+RETRYABLE_MARKERS = ("DEADLINE_EXCEEDED", "INTERNAL", "timed out", "timeout", "connection reset", "temporarily")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the API while the model's circuit breaker is open."""
+
+
+def is_retryable_error(error):
+    """Transient failures worth retrying: throttling, 5xx, timeouts and dropped connections."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if is_throttle_error(error):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        if int(code) in RETRYABLE_CODES:
+            return True
+    except (TypeError, ValueError):
+        pass
+    message = str(error).lower()
+    return any(marker.lower() in message for marker in RETRYABLE_MARKERS)
+
+
+def call_timeout_seconds():
+    """Per-call deadline, passed to the SDKs' own request timeout options."""
+    return DEFAULT_TIMEOUT_SECONDS
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive retryable failures and rejects calls for
+    reset_seconds. After that a single probe call is let through: success closes the
+    breaker, failure opens it again.
+    """
+    def __init__(self, name, failure_threshold=DEFAULT_BREAKER_THRESHOLD, reset_seconds=DEFAULT_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at >= self.reset_seconds and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(f"{self.name}: model API circuit is open after repeated failures")
+
+    def cancel_probe(self):
+        """The probe call was cancelled before it finished; let the next call probe instead."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name}: model API recovered, circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.error(f"{self.name}: opening circuit for {self.reset_seconds:.0f}s after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+class CallStats:
+    """Counters for one model: calls, retries, failed calls and calls rejected by the breaker."""
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self):
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "failures": self.failures, "rejected": self.rejected}
+
+
+class CallPolicy:
+    """Retry policy: up to max_attempts tries with full-jitter exponential backoff between them."""
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff_base=DEFAULT_BACKOFF_BASE_SECONDS,
+                 backoff_max=DEFAULT_BACKOFF_MAX_SECONDS):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+DEFAULT_POLICY = CallPolicy()
+
+_breakers = {}
+_stats = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(model_name):
+    with _registry_lock:
+        if model_name not in _breakers:
+            _breakers[model_name] = CircuitBreaker(model_name)
+        return _breakers[model_name]
+
+
+def get_stats(model_name):
+    with _registry_lock:
+        if model_name not in _stats:
+            _stats[model_name] = CallStats()
+        return _stats[model_name]
+
+
+def call_stats():
+    """{model name: counters} for every model called in this process."""
+    with _registry_lock:
+        stats = dict(_stats)
+    return {model_name: counters.as_dict() for model_name, counters in stats.items()}
+
+
+def call_with_policy(model_name, send, policy=None):
+    """Run send() under the model's circuit breaker, retrying transient errors with backoff."""
+    policy = policy or DEFAULT_POLICY
+    breaker = get_breaker(model_name)
+    stats = get_stats(model_name)
+    for attempt in range(policy.max_attempts):
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            stats.add(rejected=1)
+            raise
+        stats.add(calls=1)
+        try:
+            response = send()
+        except Exception as e:
+            if not is_retryable_error(e):
+                # The API answered (e.g. a 400), so this says nothing about its availability
+                breaker.record_success()
+                stats.add(failures=1)
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= policy.max_attempts:
+                stats.add(failures=1)
+                raise
+            delay = policy.backoff_delay(attempt)
+            logger.warning(f"{model_name} call failed ({type(e).__name__}: {e}); retry {attempt + 1}/{policy.max_attempts - 1} in {delay:.1f}s")
+            stats.add(retries=1)
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return response
+
+
+async def call_with_policy_async(model_name, send, policy=None):
+    """Async version of call_with_policy; send() returns an awaitable."""
+    policy = policy or DEFAULT_POLICY
+    breaker = get_breaker(model_name)
+    stats = get_stats(model_name)
+    for attempt in range(policy.max_attempts):
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            stats.add(rejected=1)
+            raise
+        stats.add(calls=1)
+        try:
+            response = await send()
+        except asyncio.CancelledError:
+            breaker.cancel_probe()
+            raise
+        except Exception as e:
+            if not is_retryable_error(e):
+                # The API answered (e.g. a 400), so this says nothing about its availability
+                breaker.record_success()
+                stats.add(failures=1)
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= policy.max_attempts:
+                stats.add(failures=1)
+                raise
+            delay = policy.backoff_delay(attempt)
+            logger.warning(f"{model_name} call failed ({type(e).__name__}: {e}); retry {attempt + 1}/{policy.max_attempts - 1} in {delay:.1f}s")
+            stats.add(retries=1)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return response
@@ -0,0 +1,100 @@
+"""
+Import-time budget for the web backend and each CLI stage.
+
+    python University_Data/common/import_budget.py [--budget-ms N] [--top N]
+
+Every target is imported in a fresh interpreter with `python -X importtime` (its main()
+is not run) and the measured time is compared with the target's budget. For targets over
+budget the slowest top-level imports are listed. Exits with status 1 if any target is over
+budget or fails to import. IMPORT_BUDGET_MS overrides every budget.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(DATA_DIR)
+
+# (label, file, budget in ms). Model SDKs, pandas and openpyxl are loaded on first use,
+# so none of these should pay for them at import time.
+TARGETS = [
+    ("backend", os.path.join(REPO_DIR, "web-app", "backend", "app.py"), 600),
+    ("institution", os.path.join(DATA_DIR, "Institution", "Institution.py"), 250),
+    ("institution batch", os.path.join(DATA_DIR, "Institution", "batch_runner.py"), 250),
+    ("departments", os.path.join(DATA_DIR, "Departments", "Department.py"), 200),
+] + [
+    (f"{level} {stage}", os.path.join(DATA_DIR, "Programs", f"{level}_programs", f"{stage}.py"), 200)
+    for level in ("graduate", "undergraduate")
+    for stage in (
+        "extract_programs_list",
+        "extract_program_details_financial",
+        "extract_test_scores_requirements",
+        "extract_application_requirements",
+        "program_extra_fields",
+        "extract_program_fused",
+        "merge_and_standardize",
+    )
+] + [
+    ("programs merge", os.path.join(DATA_DIR, "Programs", "merge_all.py"), 200),
+]
+
+# Runs in the child interpreter: import the file as a module (as a test or worker would)
+IMPORT_SNIPPET = """
+import importlib.util, os, sys, time
+path = sys.argv[1]
+sys.path.insert(0, os.path.dirname(path))
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("budget_target", path)
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(f"IMPORT_MS {(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(path):
+    """(import time in ms, [(cumulative ms, module)] of top-level imports, error or None)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET, path],
+        capture_output=True, text=True, cwd=os.path.dirname(path),
+    )
+    match = re.search(r"IMPORT_MS ([\d.]+)", result.stdout)
+    if result.returncode != 0 or not match:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+        return None, [], error
+    modules = []
+    for line in result.stderr.splitlines():
+        parsed = IMPORTTIME_LINE.match(line)
+        if parsed and not parsed.group(3):
+            modules.append((int(parsed.group(2)) / 1000, parsed.group(4)))
+    return float(match.group(1)), sorted(modules, reverse=True), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import time of the backend and CLI stages.")
+    parser.add_argument("--budget-ms", type=float, default=os.getenv("IMPORT_BUDGET_MS"),
+                        help="Budget for every target instead of the per-target defaults")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed for targets over budget")
+    args = parser.parse_args()
+
+    failed = 0
+    for label, path, budget in TARGETS:
+        budget = float(args.budget_ms) if args.budget_ms else budget
+        elapsed, modules, error = measure(path)
+        if error:
+            failed += 1
+            print(f"ERROR {label:48} {error}")
+            continue
+        over = elapsed > budget
+        failed += over
+        print(f"{'OVER ' if over else 'ok   '} {label:48} {elapsed:8.1f} ms  (budget {budget:.0f} ms)")
+        if over:
+            for cumulative, module in modules[:args.top]:
+                print(f"        {cumulative:8.1f} ms  {module}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Shared by Institution, Departments and Programs so a re-run of any stage reuses earlier answers
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(DATA_DIR, ".cache", "llm_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_MB = 512
+
+
+class CachedResponse:
+    """Stand-in for an SDK response served from the cache. Only the text is kept."""
+    def __init__(self, text):
+        self.text = text
+        self.candidates = []
+        self.usage_metadata = None
+        self.from_cache = True
+
+
+def make_cache_key(model_name, tools_config, prompt):
+    """Content address of a model call: model name, tools configuration and prompt hash."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    payload = json.dumps([model_name, tools_config, prompt_hash], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed cache of model response texts.
+    Entries expire after a per-entry TTL; expired entries are kept so they can still be
+    served when the API fails (stale-if-error) until size-based LRU eviction removes them.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # One connection shared by all threads; WAL + busy timeout lets the grad and
+        # undergrad scripts use the same file at the same time
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        # Prompts some process is fetching right now, so other processes wait for its answer
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS in_flight ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key, allow_stale=False, created_after=None):
+        """
+        Return the cached text for key, or None if missing (or expired, unless allow_stale).
+        With created_after (a time.time() value), entries written before it count as missing.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at, expires_at = row
+            if expires_at < now and not allow_stale:
+                return None
+            if created_after is not None and created_at < created_after:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return response
+
+    def put(self, key, model_name, response, ttl_seconds=None):
+        """Store a response text, then evict least recently used entries if over the size limit."""
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, size, now, now + ttl, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def acquire_lease(self, key, owner, ttl_seconds):
+        """Take the in-flight lease for key; False while another owner holds an unexpired one."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM in_flight WHERE key = ? AND (expires_at < ? OR owner = ?)", (key, now, owner)
+            )
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO in_flight (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + ttl_seconds),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def release_lease(self, key, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM in_flight WHERE key = ? AND owner = ?", (key, owner))
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% of the limit so eviction does not run on every insert
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.info(f"LLM cache evicted {len(evicted)} least recently used entries")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the process-wide cache configured from the environment, or None when disabled.
+    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_MB, LLM_CACHE_DISABLED=1
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLED", "0") == "1":
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                ttl_seconds=int(os.getenv("LLM_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))),
+                max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", str(DEFAULT_MAX_MB))) * 1024 * 1024,
+            )
+    return _default_cache
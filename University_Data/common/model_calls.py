@@ -0,0 +1,261 @@
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from call_policy import call_timeout_seconds, call_with_policy, call_with_policy_async
+from llm_cache import CachedResponse, get_cache, make_cache_key
+from rate_limiter import get_limiter
+from single_flight import SingleFlight
+from telemetry import count_attempt, mark_shared, record_call
+
+logger = logging.getLogger(__name__)
+
+# Identical prompts in flight at the same time (two jobs on one university, the website
+# lookup, institute-level fallbacks, ...) share one model call: in this process through the
+# in-flight table, across processes through a lease in the response cache
+_in_flight = SingleFlight()
+LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_POLL_SECONDS = float(os.getenv("LLM_LEASE_POLL_SECONDS", "0.5"))
+
+_fresh_after = contextvars.ContextVar("fresh_after", default=None)
+
+
+@contextlib.contextmanager
+def fresh_answers(after):
+    """
+    Every model call inside the block skips answers cached before after (a time.time()
+    value), like passing fresh_after; for callers that do not make the calls themselves.
+    """
+    token = _fresh_after.set(after)
+    try:
+        yield
+    finally:
+        _fresh_after.reset(token)
+
+
+def lease_seconds():
+    """How long another process waits for our answer before asking itself (one call plus a retry)."""
+    return call_timeout_seconds() * 2
+
+
+def response_text(response):
+    """Text of an SDK response, or None (the legacy SDK raises when a response has no text)."""
+    try:
+        return response.text if response is not None else None
+    except Exception:
+        return None
+
+
+def fetch(prompt, model_name, send):
+    """
+    One uncached model call: rate limited, retried on transient errors and guarded by the
+    model's circuit breaker. send() must apply the per-call deadline (call_timeout_seconds()).
+    """
+    limiter = get_limiter(model_name)
+
+    def attempt():
+        count_attempt()
+        return send()
+
+    return call_with_policy(model_name, lambda: limiter.call(prompt, attempt))
+
+
+async def fetch_async(prompt, model_name, send):
+    """Async version of fetch; the deadline is also enforced around send() here."""
+    limiter = get_limiter(model_name)
+
+    def send_with_deadline():
+        count_attempt()
+        return asyncio.wait_for(send(), call_timeout_seconds())
+
+    return await call_with_policy_async(model_name, lambda: limiter.call_async(prompt, send_with_deadline))
+
+
+def generate_with_cache(prompt, model_name, tools_config, send, fresh_after=None):
+    """
+    Return the response for prompt, from the response cache when possible.
+    send() performs the real model call; cache misses go through fetch().
+    If it still fails and an expired entry exists, the stale entry is served instead of raising.
+    fresh_after (a time.time() value) skips answers cached before it, e.g. for a refresh run
+    that re-asks fields; the new answer is still cached, and if the call fails the error is
+    raised rather than serving one of the skipped answers.
+    Every call is recorded in the telemetry log.
+    """
+    if fresh_after is None:
+        fresh_after = _fresh_after.get()
+    with record_call(model_name, prompt) as call:
+        return call.finish(_generate_with_cache(prompt, model_name, tools_config, send, fresh_after))
+
+
+def claim_or_wait(cache, key, fresh_after=None):
+    """
+    Take the cross-process lease for key. While another process holds it (e.g. the grad and
+    undergrad scripts asking the same question), wait for its answer to land in the cache.
+    Returns the cached text, or None once we hold the lease and should make the call.
+    """
+    while not cache.acquire_lease(key, LEASE_OWNER, lease_seconds()):
+        time.sleep(LEASE_POLL_SECONDS)
+        text = cache.get(key, created_after=fresh_after)
+        if text is not None:
+            return text
+    # The other process may have finished between our cache miss and taking the lease
+    text = cache.get(key, created_after=fresh_after)
+    if text is not None:
+        cache.release_lease(key, LEASE_OWNER)
+    return text
+
+
+def _fetch_and_store(cache, key, prompt, model_name, send, fresh_after=None):
+    """The one call made for key by this process: fetch() and cache the answer."""
+    if cache is None:
+        return fetch(prompt, model_name, send)
+    text = claim_or_wait(cache, key, fresh_after)
+    if text is not None:
+        return CachedResponse(text)
+    try:
+        response = fetch(prompt, model_name, send)
+        text = response_text(response)
+        if text:
+            cache.put(key, model_name, text)
+        return response
+    finally:
+        cache.release_lease(key, LEASE_OWNER)
+
+
+def _generate_with_cache(prompt, model_name, tools_config, send, fresh_after=None):
+    cache = get_cache()
+    key = make_cache_key(model_name, tools_config, prompt)
+    if cache is not None:
+        cached = cache.get(key, created_after=fresh_after)
+        if cached is not None:
+            return CachedResponse(cached)
+
+    try:
+        response, shared = _in_flight.do(key, lambda: _fetch_and_store(cache, key, prompt, model_name, send, fresh_after))
+    except Exception as e:
+        # A refresh asked to skip answers older than fresh_after, so those are not served either
+        stale = cache.get(key, allow_stale=True, created_after=fresh_after) if cache is not None else None
+        if stale is not None:
+            logger.warning(f"Model call failed ({e}); serving stale cached response")
+            return CachedResponse(stale)
+        raise
+    if shared:
+        mark_shared()
+    return response
+
+
+async def generate_with_cache_async(prompt, model_name, tools_config, send, fresh_after=None):
+    """Async version of generate_with_cache; send() returns an awaitable."""
+    if fresh_after is None:
+        fresh_after = _fresh_after.get()
+    with record_call(model_name, prompt) as call:
+        return call.finish(await _generate_with_cache_async(prompt, model_name, tools_config, send, fresh_after))
+
+
+async def claim_or_wait_async(cache, key, fresh_after=None):
+    """Async version of claim_or_wait."""
+    while not cache.acquire_lease(key, LEASE_OWNER, lease_seconds()):
+        await asyncio.sleep(LEASE_POLL_SECONDS)
+        text = cache.get(key, created_after=fresh_after)
+        if text is not None:
+            return text
+    text = cache.get(key, created_after=fresh_after)
+    if text is not None:
+        cache.release_lease(key, LEASE_OWNER)
+    return text
+
+
+async def _fetch_and_store_async(cache, key, prompt, model_name, send, fresh_after=None):
+    """Async version of _fetch_and_store."""
+    if cache is None:
+        return await fetch_async(prompt, model_name, send)
+    text = await claim_or_wait_async(cache, key, fresh_after)
+    if text is not None:
+        return CachedResponse(text)
+    try:
+        response = await fetch_async(prompt, model_name, send)
+        text = response_text(response)
+        if text:
+            cache.put(key, model_name, text)
+        return response
+    finally:
+        cache.release_lease(key, LEASE_OWNER)
+
+
+async def _generate_with_cache_async(prompt, model_name, tools_config, send, fresh_after=None):
+    cache = get_cache()
+    key = make_cache_key(model_name, tools_config, prompt)
+    if cache is not None:
+        cached = cache.get(key, created_after=fresh_after)
+        if cached is not None:
+            return CachedResponse(cached)
+
+    try:
+        response, shared = await _in_flight.do_async(
+            key, lambda: _fetch_and_store_async(cache, key, prompt, model_name, send, fresh_after)
+        )
+    except Exception as e:
+        # A refresh asked to skip answers older than fresh_after, so those are not served either
+        stale = cache.get(key, allow_stale=True, created_after=fresh_after) if cache is not None else None
+        if stale is not None:
+            logger.warning(f"Model call failed ({e}); serving stale cached response")
+            return CachedResponse(stale)
+        raise
+    if shared:
+        mark_shared()
+    return response
+
+
+class CachedGenerativeModel:
+    """
+    Wraps a google.generativeai GenerativeModel (as used by the Programs and Departments
+    scripts) so that generate_content goes through the shared response cache, rate limiter
+    and retry policy. model may also be a zero-argument factory; it is then only called on
+    the first request that misses the cache.
+    """
+    def __init__(self, model, model_name, tools_config="google_search"):
+        self._model = model if hasattr(model, "generate_content") else None
+        self._factory = None if self._model is not None else model
+        self._lock = threading.Lock()
+        self.model_name = model_name
+        self.tools_config = tools_config
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def generate_content(self, prompt, **kwargs):
+        tools_config = self.tools_config
+        if kwargs:
+            # Generation settings change the answer, so they are part of the cache key
+            tools_config = [self.tools_config, json.dumps(kwargs, sort_keys=True, default=str)]
+        return generate_with_cache(
+            prompt, self.model_name, tools_config,
+            lambda: self.model.generate_content(
+                prompt, request_options={"timeout": call_timeout_seconds()}, **kwargs
+            )
+        )
+
+
+def grounded_model(model_name):
+    """
+    CachedGenerativeModel for a Google Search grounded google.generativeai model. The SDK is
+    imported and configured (GOOGLE_API_KEY) on first use, so importing a script is cheap
+    and needs no API key.
+    """
+    def build():
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        tools = [genai.protos.Tool(google_search=genai.protos.Tool.GoogleSearch())]
+        return genai.GenerativeModel(model_name, tools=tools)
+    return CachedGenerativeModel(build, model_name)
@@ -0,0 +1,295 @@
+import concurrent.futures
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from llm_cache import DEFAULT_TTL_SECONDS
+from model_calls import fresh_answers
+from telemetry import current_tags, run_tagged
+
+# Programs extracted at the same time. Model calls still go through the process-wide rate
+# limiter, so this only needs to be large enough to keep the limiter's concurrency busy
+DEFAULT_PROGRAM_WORKERS = int(os.getenv("PROGRAM_WORKERS", "8"))
+# The checkpoint journal is fsynced after this many records or seconds (and when the run ends)
+JOURNAL_SYNC_RECORDS = int(os.getenv("PROGRAM_JOURNAL_SYNC_RECORDS", "16"))
+JOURNAL_SYNC_SECONDS = float(os.getenv("PROGRAM_JOURNAL_SYNC_SECONDS", "1"))
+# Saved institute-level answers older than this are asked again (default: the response cache TTL)
+INSTITUTE_FALLBACK_TTL_SECONDS = int(os.getenv(
+    "INSTITUTE_FALLBACK_TTL_SECONDS", os.getenv("LLM_CACHE_TTL_SECONDS", str(DEFAULT_TTL_SECONDS))
+))
+# PROGRAM_REFRESH=1: ask the institute-level values again (bypassing the response cache)
+# instead of reusing the saved ones
+PROGRAM_REFRESH = os.getenv("PROGRAM_REFRESH", "0") == "1"
+
+
+def load_program_records(json_path):
+    """Records saved by a previous run, without the failed ones (so those programs are retried)."""
+    if not os.path.exists(json_path):
+        return []
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not load existing JSON file: {e}")
+        return []
+    failed_count = sum(1 for record in records if record.get('error'))
+    records = [record for record in records if not record.get('error')]
+    print(f"Loaded {len(records)} existing records from {json_path} ({failed_count} failed programs will be retried)")
+    return records
+
+
+def save_program_records(records, json_path):
+    """Write the JSON output through a temporary file, so an interrupted write never truncates it."""
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+
+
+class ProgramJournal:
+    """
+    Append-only JSONL checkpoint of the programs finished since the JSON output was last
+    written: one record per line, flushed as each program finishes. fsync is batched
+    (JOURNAL_SYNC_RECORDS / JOURNAL_SYNC_SECONDS), so a machine crash loses at most the
+    last batch; a torn last line is skipped when the journal is loaded.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def load(self):
+        records = []
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping unreadable line {line_number} of {self.path}")
+        return records
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a+b')
+                # Start on a fresh line if a crash left a torn record at the end
+                if self._file.seek(0, os.SEEK_END) > 0:
+                    self._file.seek(-1, os.SEEK_END)
+                    if self._file.read(1) != b"\n":
+                        line = "\n" + line
+            self._file.write(line.encode("utf-8"))
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= JOURNAL_SYNC_RECORDS or time.monotonic() - self._synced_at >= JOURNAL_SYNC_SECONDS:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    def discard(self):
+        """Remove the journal once its records are in the JSON output."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def fields_schema(field_types):
+    """
+    JSON schema (as text, for a prompt) of an object holding exactly the given fields, each
+    nullable. field_types maps a field to its JSON type or list of types.
+    """
+    return json.dumps({
+        "type": "object",
+        "properties": {
+            field: {"type": (field_type if isinstance(field_type, list) else [field_type]) + ["null"]}
+            for field, field_type in field_types.items()
+        },
+        "required": list(field_types),
+        "additionalProperties": False,
+    })
+
+
+class InstituteFallback:
+    """
+    Institute-level answers of one extractor. They do not depend on the program, so each field
+    is asked at most once per university and program level (each level has its own output
+    directory), shared by every program of the run and saved to json_path for later runs.
+    Saved values older than ttl_seconds are asked again; with refresh, every value is asked
+    again once per run, skipping answers cached before the run.
+    fetch(fields) asks for just those fields and returns {field: value}, or None when the
+    answer was unusable.
+    """
+    def __init__(self, json_path, university_name, fetch, ttl_seconds=None, refresh=None):
+        self.json_path = json_path
+        self.university_name = university_name
+        self._fetch = fetch
+        self.ttl_seconds = INSTITUTE_FALLBACK_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.refresh = PROGRAM_REFRESH if refresh is None else refresh
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self._values = None
+        self._times = {}
+        # Fields whose answer was unusable: not asked again in this run, but not saved either
+        self._unanswered = set()
+
+    def _load(self):
+        """Saved {field: value} still within the TTL (all of them are dropped on refresh)."""
+        if self.refresh or not os.path.exists(self.json_path):
+            return {}
+        try:
+            with open(self.json_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load institute-level values from {self.json_path}: {e}")
+            return {}
+        if saved.get('university_name') != self.university_name:
+            return {}
+        # Files written before per-field times were kept are dated by their extracted_at
+        default_time = saved.get('extracted_at')
+        field_times = saved.get('field_extracted_at') or {}
+        values = {}
+        expired = []
+        for field, value in (saved.get('values') or {}).items():
+            extracted_at = field_times.get(field, default_time)
+            if extracted_at is None or time.time() - datetime.fromisoformat(extracted_at).timestamp() > self.ttl_seconds:
+                expired.append(field)
+                continue
+            values[field] = value
+            self._times[field] = extracted_at
+        if expired:
+            print(f"  Institute-level values older than the TTL will be asked again: {', '.join(expired)}")
+        return values
+
+    def _save(self):
+        save_program_records({
+            'university_name': self.university_name,
+            'extracted_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'values': self._values,
+            'field_extracted_at': self._times,
+        }, self.json_path)
+
+    def values(self, fields):
+        """
+        {field: value} at institute level for the fields that have an answer. Fields not known
+        yet are asked together in one call; concurrent callers wait for it instead of asking.
+        """
+        with self._lock:
+            if self._values is None:
+                self._values = self._load()
+            missing = [field for field in fields if field not in self._values and field not in self._unanswered]
+            if missing:
+                print(f"  Asking institute level of {self.university_name} for: {', '.join(missing)}")
+                with fresh_answers(self._started if self.refresh else None):
+                    answer = self._fetch(missing)
+                if answer is None:
+                    self._unanswered.update(missing)
+                else:
+                    # A field left out of the answer is not available at institute level
+                    extracted_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+                    self._values.update({field: answer.get(field) for field in missing})
+                    self._times.update({field: extracted_at for field in missing})
+                    self._save()
+            return {field: self._values[field] for field in fields if field in self._values}
+
+
+def run_programs(programs, extract, error_record, json_path, max_workers=None):
+    """
+    Run extract(program_name, program_url) for every (program name, program page url) of
+    programs on a bounded worker pool and return the records in the order of programs.
+
+    extract returns the program's fields and raises when the program failed; the failure is
+    stored as error_record(program_name, program_url, error). Every finished program is
+    appended to a journal next to json_path (<name>.jsonl); when the run ends, also on Ctrl-C,
+    the JSON is rewritten once (in input order) and the journal removed. Programs saved in
+    the JSON or a leftover journal without an error are skipped, so an interrupted or
+    crashed run picks up where it stopped.
+    """
+    journal = ProgramJournal(os.path.splitext(json_path)[0] + ".jsonl")
+    recovered = journal.load()
+    if recovered:
+        print(f"Recovered {len(recovered)} records from {journal.path} (run did not finish)")
+    saved = {}
+    # Journal records are newer than the JSON, so they win
+    for record in load_program_records(json_path) + [record for record in recovered if not record.get('error')]:
+        saved[record.get('Program name')] = record
+
+    ordered_programs = []
+    seen = set()
+    for program_name, program_url in programs:
+        if program_name not in seen:
+            seen.add(program_name)
+            ordered_programs.append((program_name, program_url))
+    # Records of programs no longer in the input are kept after the others
+    others = [record for name, record in saved.items() if name not in seen]
+    results = {name: saved[name] for name, _ in ordered_programs if name in saved}
+    pending = [(name, url) for name, url in ordered_programs if name not in results]
+    if results:
+        print(f"Skipping {len(results)} programs (already processed)")
+
+    def ordered_records():
+        return [results[name] for name, _ in ordered_programs if name in results] + others
+
+    def process(program_name, program_url):
+        print(f"Processing: {program_name}")
+        record = extract(program_name, program_url)
+        record['Program name'] = program_name
+        record['Program Page url'] = program_url
+        return record
+
+    try:
+        if pending:
+            workers = max(1, min(max_workers or DEFAULT_PROGRAM_WORKERS, len(pending)))
+            # Worker threads do not inherit the script's telemetry tags; pass them on with the program name
+            call_tags = current_tags()
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+            try:
+                futures = {
+                    executor.submit(run_tagged, {**call_tags, "program": name}, process, name, url): (name, url)
+                    for name, url in pending
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    program_name, program_url = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"Error processing program {program_name}: {str(e)}")
+                        results[program_name] = error_record(program_name, program_url, e)
+                        journal.append(results[program_name])
+                        print(f"✗ Error saved for program {program_name}")
+                        continue
+                    results[program_name] = record
+                    journal.append(record)
+                    level = f" (level: {record['extraction_level']})" if 'extraction_level' in record else ""
+                    print(f"✓ Processed and saved: {program_name}{level}")
+            except BaseException:
+                # Ctrl-C: drop the queued programs instead of running them all before exiting
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+            executor.shutdown(wait=True)
+    finally:
+        # Compact: the JSON gets every record once, then the journal is no longer needed
+        journal.close()
+        records = ordered_records()
+        save_program_records(records, json_path)
+        journal.discard()
+    return records
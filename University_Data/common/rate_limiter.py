@@ -0,0 +1,253 @@
+import asyncio
+import collections
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Defaults match the paid-tier quota for gemini-2.5-pro; override per deployment
+DEFAULT_RPM = int(os.getenv("GEMINI_RPM", "150"))
+DEFAULT_TPM = int(os.getenv("GEMINI_TPM", "2000000"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+DEFAULT_INITIAL_CONCURRENCY = int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "4"))
+# Grounded answers are much longer than the prompts; this is charged up front and
+# corrected from usage_metadata once the response arrives
+EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+THROTTLE_CODES = (429, 503)
+THROTTLE_STATUSES = ("RESOURCE_EXHAUSTED", "UNAVAILABLE")
+# google.api_core.exceptions classes, checked by name so the SDK is not imported here
+THROTTLE_EXCEPTIONS = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable")
+# Only for errors without a status code. Bare numbers are not enough: URLs, program IDs
+# and token counts in a message often contain 429 or 503
+THROTTLE_MESSAGE = re.compile(
+    r"^\s*(?:429|503)\b|\b(?:HTTP|status|code)[\s:=]+(?:429|503)\b|\b(?:RESOURCE_EXHAUSTED|UNAVAILABLE)\b"
+    r"|(?i:\btoo many requests\b|\brate limit|\bquota\b)"
+)
+
+
+def estimate_tokens(prompt):
+    """Rough token count (about 4 characters per token) plus the expected answer length."""
+    return len(prompt) // 4 + EXPECTED_OUTPUT_TOKENS
+
+
+def is_throttle_error(error):
+    """
+    True for 429 / 503 style errors from either Gemini SDK: by exception type, by the
+    status code (google.api_core exceptions and genai.errors.APIError both carry .code)
+    or status, and only for errors without a code by the wording of the message.
+    """
+    if any(cls.__name__ in THROTTLE_EXCEPTIONS for cls in type(error).__mro__):
+        return True
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    try:
+        return int(code) in THROTTLE_CODES
+    except (TypeError, ValueError):
+        pass
+    if getattr(error, "status", None) in THROTTLE_STATUSES:
+        return True
+    return bool(THROTTLE_MESSAGE.search(str(error)))
+
+
+def used_tokens(response):
+    """Total tokens reported by the SDK for a response, or None."""
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage is not None else None
+
+
+class TokenBucket:
+    """
+    Bucket refilled continuously at capacity per minute.
+    reserve() takes the amount immediately (the level may go negative) and returns how
+    long the caller must wait, so waiting callers are served in arrival order.
+    """
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # A single request larger than the bucket must still be able to go through
+            amount = min(amount, self.capacity)
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, delta):
+        """Correct an earlier reservation once the real usage is known (positive delta = more used)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.capacity, self.level - delta)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight calls: +1 after a full window of successes,
+    halved on a throttling error (at most once per cooldown so one burst of 429s
+    only counts as a single congestion signal).
+    """
+    def __init__(self, initial, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY, cooldown_seconds=5.0):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._async_waiters = collections.deque()
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit or self._async_waiters:
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        # Async callers may live on different event loops than each other, so a freed
+        # slot is handed to a waiting coroutine through its own loop's future
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.in_flight < self.limit and not self._async_waiters:
+                self.in_flight += 1
+                return
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._cond:
+                if (loop, waiter) in self._async_waiters:
+                    self._async_waiters.remove((loop, waiter))
+                    self._cond.notify_all()
+                    raise
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def _hand_over(self, waiter):
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+    def _wake(self):
+        # Called with the lock held: give free slots to queued coroutines first
+        while self._async_waiters and self.in_flight < self.limit:
+            loop, waiter = self._async_waiters.popleft()
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._hand_over, waiter)
+            except RuntimeError:
+                # The waiter's loop is closed; nobody will use the slot
+                self.in_flight -= 1
+        self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._wake()
+
+    def on_throttle(self):
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown_seconds:
+                return
+            self._last_decrease = now
+            self._successes = 0
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit != self.limit:
+                logger.warning(f"Model API throttled; concurrency limit {self.limit} -> {new_limit}")
+            self.limit = new_limit
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets plus adaptive concurrency for one model.
+    call()/call_async() wrap a single model request.
+    """
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM,
+                 initial_concurrency=DEFAULT_INITIAL_CONCURRENCY, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+
+    def _reserve(self, estimate):
+        return max(self.requests.reserve(1), self.tokens.reserve(estimate))
+
+    def _record(self, response, estimate):
+        actual = used_tokens(response)
+        if actual:
+            self.tokens.adjust(actual - estimate)
+        self.concurrency.on_success()
+
+    def call(self, prompt, send):
+        estimate = estimate_tokens(prompt)
+        self.concurrency.acquire()
+        try:
+            wait = self._reserve(estimate)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                response = send()
+            except Exception as e:
+                if is_throttle_error(e):
+                    self.concurrency.on_throttle()
+                raise
+            self._record(response, estimate)
+            return response
+        finally:
+            self.concurrency.release()
+
+    async def call_async(self, prompt, send):
+        estimate = estimate_tokens(prompt)
+        await self.concurrency.acquire_async()
+        try:
+            wait = self._reserve(estimate)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await send()
+            except Exception as e:
+                if is_throttle_error(e):
+                    self.concurrency.on_throttle()
+                raise
+            self._record(response, estimate)
+            return response
+        finally:
+            self.concurrency.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model_name):
+    """
+    Process-wide limiter for a model (quotas are per model).
+    GEMINI_RPM, GEMINI_TPM, GEMINI_INITIAL_CONCURRENCY, GEMINI_MAX_CONCURRENCY
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = _limiters[model_name] = RateLimiter()
+    return limiter
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_JOURNAL_DIR = os.getenv("RUN_JOURNAL_DIR", os.path.join(DATA_DIR, ".cache", "run_journals"))
+
+
+def make_run_id(*inputs, **named_inputs):
+    """Stable id of a run: the same inputs give the same id, so a restarted run finds its journal."""
+    payload = json.dumps([inputs, named_inputs], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RunJournal:
+    """
+    Append-only JSONL log of the fields a run has completed, one record per line:
+    {"section": ..., "field": ..., "value": ..., "failure": ..., "at": ...}.
+    Each append is flushed and fsynced, so after a crash at most the line being written
+    is lost; a torn last line is skipped when the journal is loaded.
+    """
+    def __init__(self, kind, name, run_id, journal_dir=None):
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')
+        self.run_id = run_id
+        self.path = os.path.join(journal_dir or DEFAULT_JOURNAL_DIR, kind, f"{safe_name}_{run_id}.jsonl")
+        self._lock = threading.Lock()
+
+    def load(self):
+        """{section: {field: record}}; a field recorded twice keeps its latest record."""
+        completed = {}
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping unreadable line {line_number} of run journal {self.path}")
+                    continue
+                completed.setdefault(record["section"], {})[record["field"]] = record
+        return completed
+
+    def completed_records(self):
+        """{section: {field: record}} of the fields the journal holds without a failure."""
+        return {
+            section: {field: record for field, record in records.items() if not record.get("failure")}
+            for section, records in self.load().items()
+        }
+
+    def record_section(self, section, values, failures=None, extracted_at=None):
+        """
+        Append every field of a finished section in one write. extracted_at ({field: time.time()
+        value}) keeps the original time of values the run did not fetch itself; the others get now.
+        """
+        failures = failures or {}
+        extracted_at = extracted_at or {}
+        now = time.time()
+        lines = "".join(
+            json.dumps({"section": section, "field": field, "value": value, "failure": failures.get(field),
+                        "at": extracted_at.get(field, now)},
+                       ensure_ascii=False, default=str) + "\n"
+            for field, value in values.items()
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a+b') as f:
+                # Start on a fresh line if a crash left a torn record at the end
+                if f.seek(0, os.SEEK_END) > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        lines = "\n" + lines
+                f.write(lines.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def discard(self):
+        """Remove the journal once the run's outputs are written."""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
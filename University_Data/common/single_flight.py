@@ -0,0 +1,85 @@
+import asyncio
+import concurrent.futures
+import threading
+
+
+class _Abandoned(Exception):
+    """The leading call was cancelled before it finished; its waiters make the call themselves."""
+
+
+class SingleFlight:
+    """
+    In-flight call table: concurrent callers with the same key share one execution and its
+    result (or exception) instead of each making the call. Works across threads and event
+    loops; the first caller runs the call and the others wait on a shared future.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def _join(self, key):
+        """(future, leader): the in-flight future for key, created (with us as leader) if there is none."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = concurrent.futures.Future()
+            # A running future cannot be cancelled, so a cancelled waiter never cancels it for the others
+            future.set_running_or_notify_cancel()
+            self._in_flight[key] = future
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._in_flight)
+
+    def do(self, key, func):
+        """(func() result, shared): shared is True when the result came from another caller's call."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(), True
+            except _Abandoned:
+                continue
+        try:
+            result = func()
+        except Exception as e:
+            self._settle(key, future, error=e)
+            raise
+        except BaseException:
+            self._settle(key, future, error=_Abandoned())
+            raise
+        self._settle(key, future, result=result)
+        return result, False
+
+    async def do_async(self, key, func):
+        """Async version of do; func() returns an awaitable. A cancelled leader hands the call to a waiter."""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return await asyncio.wrap_future(future), True
+            except _Abandoned:
+                continue
+        try:
+            result = await func()
+        except Exception as e:
+            self._settle(key, future, error=e)
+            raise
+        except BaseException:
+            self._settle(key, future, error=_Abandoned())
+            raise
+        self._settle(key, future, result=result)
+        return result, False
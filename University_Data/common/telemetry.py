@@ -0,0 +1,280 @@
+"""
+Per-call telemetry for model requests: one JSONL record per call with wall time, attempts,
+token counts, grounding searches and the pipeline/field/university tags of the caller.
+
+    python telemetry.py report [--path metrics.jsonl] [--pipeline institution] [--since 2026-01-01]
+
+TELEMETRY_PATH sets the log file; TELEMETRY_DISABLED=1 turns recording off.
+"""
+import argparse
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_METRICS_PATH = os.path.join(DATA_DIR, ".cache", "metrics", "model_calls.jsonl")
+
+# Estimated USD per million input / output tokens and per grounded (Google Search) prompt;
+# override with TELEMETRY_PRICES='{"model": [input, output]}' and TELEMETRY_SEARCH_PRICE
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-3-pro-preview": (2.0, 12.0),
+}
+MODEL_PRICES.update({name: tuple(prices) for name, prices in json.loads(os.getenv("TELEMETRY_PRICES", "{}")).items()})
+SEARCH_PRICE = float(os.getenv("TELEMETRY_SEARCH_PRICE", "0.035"))
+
+_tags = contextvars.ContextVar("telemetry_tags", default={})
+_current_call = contextvars.ContextVar("telemetry_call", default=None)
+
+
+def current_tags():
+    return dict(_tags.get())
+
+
+@contextlib.contextmanager
+def tags(**values):
+    """Tag every model call made inside the block (pipeline, field, university, ...)."""
+    token = _tags.set({**_tags.get(), **{k: v for k, v in values.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+def set_tags(**values):
+    """Tag every later model call of this context; for scripts that tag a whole run."""
+    _tags.set({**_tags.get(), **{k: v for k, v in values.items() if v is not None}})
+
+
+def run_tagged(call_tags, func, *args, **kwargs):
+    """func(*args) with call_tags set; for work handed to a thread pool, which does not inherit them."""
+    with tags(**call_tags):
+        return func(*args, **kwargs)
+
+
+async def run_tagged_async(call_tags, func, *args, **kwargs):
+    """Async version of run_tagged; wrap a coroutine function before making it a task."""
+    with tags(**call_tags):
+        return await func(*args, **kwargs)
+
+
+def count_attempt():
+    """Called by the fetch layer for every request actually sent for the current call."""
+    call = _current_call.get()
+    if call is not None:
+        call.attempts += 1
+
+
+def mark_shared():
+    """Called when the current call got its response from an identical call already in flight."""
+    call = _current_call.get()
+    if call is not None:
+        call.shared = True
+
+
+def usage_counts(response):
+    """(input tokens, output tokens, total tokens, grounding search queries) of an SDK response."""
+    usage = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    output_tokens = getattr(usage, "candidates_token_count", None) if usage is not None else None
+    total_tokens = getattr(usage, "total_token_count", None) if usage is not None else None
+    searches = 0
+    for candidate in getattr(response, "candidates", None) or []:
+        grounding = getattr(candidate, "grounding_metadata", None)
+        searches += len(getattr(grounding, "web_search_queries", None) or [])
+    return input_tokens, output_tokens, total_tokens, searches
+
+
+class CallRecord:
+    """Telemetry of one generate_with_cache call, written when the call ends."""
+    def __init__(self, model_name, prompt):
+        self.model_name = model_name
+        self.prompt_chars = len(prompt)
+        self.tags = current_tags()
+        self.started = time.perf_counter()
+        self.attempts = 0
+        self.shared = False
+        self.response = None
+        self.error = None
+
+    def finish(self, response):
+        self.response = response
+        return response
+
+    def as_dict(self):
+        input_tokens, output_tokens, total_tokens, searches = usage_counts(self.response)
+        record = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "model": self.model_name,
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "attempts": self.attempts,
+            "retries": max(0, self.attempts - 1),
+            "cached": bool(getattr(self.response, "from_cache", False)),
+            "shared": self.shared,
+            "status": "error" if self.error is not None else "ok",
+            "prompt_chars": self.prompt_chars,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "search_queries": searches,
+        }
+        if self.error is not None:
+            record["error_type"] = type(self.error).__name__
+        record.update(self.tags)
+        return record
+
+
+class MetricsLog:
+    """Append-only JSONL metrics file shared by all threads of the process."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_metrics_log():
+    """Process-wide metrics log, or None when TELEMETRY_DISABLED=1."""
+    global _log
+    if os.getenv("TELEMETRY_DISABLED") == "1":
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = MetricsLog(os.getenv("TELEMETRY_PATH", DEFAULT_METRICS_PATH))
+    return _log
+
+
+@contextlib.contextmanager
+def record_call(model_name, prompt):
+    """Measure one model call (cached or not); the caller passes its response to call.finish()."""
+    call = CallRecord(model_name, prompt)
+    token = _current_call.set(call)
+    try:
+        yield call
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        _current_call.reset(token)
+        log = get_metrics_log()
+        if log is not None:
+            try:
+                log.write(call.as_dict())
+            except Exception as e:
+                logger.warning(f"Could not write model call telemetry: {e}")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def estimated_cost(record):
+    """Estimated USD of one record; cached calls and calls that shared another's response cost nothing."""
+    if record.get("cached") or record.get("shared"):
+        return 0.0
+    input_price, output_price = MODEL_PRICES.get(record.get("model"), (0.0, 0.0))
+    cost = (record.get("input_tokens") or 0) * input_price / 1e6 + (record.get("output_tokens") or 0) * output_price / 1e6
+    if record.get("search_queries"):
+        cost += SEARCH_PRICE
+    return cost
+
+
+def load_records(path, pipeline=None, since=None):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if pipeline and record.get("pipeline") != pipeline:
+                continue
+            if since and record.get("at", "") < since:
+                continue
+            records.append(record)
+    return records
+
+
+def summarize(records):
+    """({(pipeline, field): stats}, {university: stats}) for the report."""
+    by_field = {}
+    by_university = {}
+    for record in records:
+        by_field.setdefault((record.get("pipeline", "-"), record.get("field", "-")), []).append(record)
+        by_university.setdefault(record.get("university", "-"), []).append(record)
+
+    def stats(group):
+        live = [r for r in group if not r.get("cached")]
+        return {
+            "calls": len(group),
+            "cached": len(group) - len(live),
+            "errors": sum(1 for r in group if r.get("status") == "error"),
+            "retries": sum(r.get("retries", 0) for r in group),
+            "p50_ms": percentile([r["wall_ms"] for r in live], 0.5),
+            "p95_ms": percentile([r["wall_ms"] for r in live], 0.95),
+            "input_tokens": sum(r.get("input_tokens") or 0 for r in group),
+            "output_tokens": sum(r.get("output_tokens") or 0 for r in group),
+            "search_queries": sum(r.get("search_queries") or 0 for r in group),
+            "cost_usd": sum(estimated_cost(r) for r in group),
+        }
+
+    return (
+        {key: stats(group) for key, group in by_field.items()},
+        {key: stats(group) for key, group in by_university.items()},
+    )
+
+
+def format_ms(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_report(records):
+    by_field, by_university = summarize(records)
+    print(f"{len(records)} model calls\n")
+    print(f"{'pipeline':24} {'field':40} {'calls':>6} {'cached':>6} {'err':>4} {'retry':>5} {'p50 ms':>8} {'p95 ms':>8} {'in tok':>9} {'out tok':>9} {'cost $':>8}")
+    for (pipeline, field), s in sorted(by_field.items(), key=lambda item: -(item[1]["p95_ms"] or 0)):
+        print(f"{pipeline[:24]:24} {str(field)[:40]:40} {s['calls']:>6} {s['cached']:>6} {s['errors']:>4} {s['retries']:>5} "
+              f"{format_ms(s['p50_ms']):>8} {format_ms(s['p95_ms']):>8} {s['input_tokens']:>9} {s['output_tokens']:>9} {s['cost_usd']:>8.3f}")
+    print(f"\n{'university':48} {'calls':>6} {'cached':>6} {'searches':>8} {'in tok':>9} {'out tok':>9} {'cost $':>8}")
+    for university, s in sorted(by_university.items(), key=lambda item: -item[1]["cost_usd"]):
+        print(f"{str(university)[:48]:48} {s['calls']:>6} {s['cached']:>6} {s['search_queries']:>8} "
+              f"{s['input_tokens']:>9} {s['output_tokens']:>9} {s['cost_usd']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize model call telemetry.")
+    parser.add_argument("command", choices=["report"])
+    parser.add_argument("--path", default=os.getenv("TELEMETRY_PATH", DEFAULT_METRICS_PATH))
+    parser.add_argument("--pipeline", help="Only calls of this pipeline")
+    parser.add_argument("--since", help="Only calls at or after this ISO date/time (UTC)")
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error(f"no metrics log at {args.path}")
+    print_report(load_records(args.path, args.pipeline, args.since))
+
+
+if __name__ == "__main__":
+    main()
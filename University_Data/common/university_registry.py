@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Checked-in seed entries; only read at runtime
+SEED_REGISTRY_PATH = os.path.join(DATA_DIR, "university_registry.json")
+# Universities resolved and key URLs learned at runtime, kept out of the working tree
+DEFAULT_REGISTRY_PATH = os.path.join(DATA_DIR, ".cache", "university_registry.json")
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\')\]]+')
+
+
+def website_prompt(university_name):
+    """The question every stage used to ask first; kept identical so cached answers still match."""
+    return f"What is the official university website for {university_name}?"
+
+
+def normalize_name(university_name):
+    return " ".join((university_name or "").lower().split())
+
+
+def extract_url(text):
+    """First URL in a model answer, without trailing punctuation, or None."""
+    match = URL_PATTERN.search(text or "")
+    return match.group(0).rstrip(".,;:") if match else None
+
+
+def registrable_domain(url):
+    """Host of url without a leading 'www.' (e.g. https://www.k-state.edu/ -> k-state.edu)."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class UniversityRegistry:
+    """
+    JSON file mapping a university name to its canonical website, allowed domains and
+    known key URLs (program lists, tuition, financial aid, catalog, ...).
+    Each university is resolved with the model once; every later stage reads it from here.
+    Entries of seed_path are the starting point; what is learned at runtime goes to path
+    (its entries win, key URLs are merged), so the seed file is never rewritten.
+    """
+    def __init__(self, path=DEFAULT_REGISTRY_PATH, seed_path=SEED_REGISTRY_PATH):
+        self.path = path
+        self.seed_path = seed_path
+        self._lock = threading.Lock()
+        self._entries = self._load(seed_path)
+        self._learned = self._load(path)
+        for name, entry in self._learned.items():
+            key_urls = dict(self._entries.get(name, {}).get("key_urls", {}), **entry.get("key_urls", {}))
+            self._entries[name] = dict(entry, key_urls=key_urls)
+
+    @staticmethod
+    def _load(path):
+        if not path or not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Could not read university registry {path}: {e}")
+            return {}
+        return {normalize_name(entry.get("name")): entry for entry in data.get("universities", [])}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        universities = sorted(self._learned.values(), key=lambda entry: normalize_name(entry["name"]))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"universities": universities}, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def get(self, university_name):
+        """Registry entry for university_name, or None if it has not been resolved yet."""
+        with self._lock:
+            entry = self._entries.get(normalize_name(university_name))
+            return dict(entry) if entry else None
+
+    def record(self, university_name, answer):
+        """
+        Store the website found in a model answer and return the new entry.
+        Returns None (and stores nothing) when the answer contains no URL.
+        """
+        website = extract_url(answer)
+        if not website:
+            return None
+        entry = {
+            "name": university_name,
+            "website": website,
+            "allowed_domains": [registrable_domain(website)],
+            "key_urls": {},
+            "resolved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with self._lock:
+            existing = self._entries.get(normalize_name(university_name))
+            if existing:
+                entry["key_urls"] = existing.get("key_urls", {})
+            self._entries[normalize_name(university_name)] = entry
+            self._learned[normalize_name(university_name)] = entry
+            self._save()
+        return dict(entry)
+
+    def set_key_urls(self, university_name, **key_urls):
+        """Remember key URLs (e.g. graduate_programs=...) for an already resolved university."""
+        with self._lock:
+            entry = self._entries.get(normalize_name(university_name))
+            if entry is None:
+                raise KeyError(f"{university_name} is not in the university registry")
+            key_urls = {name: url for name, url in key_urls.items() if url}
+            if all(entry.get("key_urls", {}).get(name) == url for name, url in key_urls.items()):
+                return
+            entry.setdefault("key_urls", {}).update(key_urls)
+            self._learned[normalize_name(university_name)] = entry
+            self._save()
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide registry; UNIVERSITY_REGISTRY_PATH overrides the location of the runtime file."""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = UniversityRegistry(os.getenv("UNIVERSITY_REGISTRY_PATH", DEFAULT_REGISTRY_PATH))
+    return _default_registry
+
+
+def resolve_university(university_name, ask):
+    """
+    (website_url, entry) for a university, where ask(prompt) is the model call used on a miss.
+    If the model answer has no URL the raw answer is returned as website_url and entry is None.
+    """
+    registry = get_registry()
+    entry = registry.get(university_name)
+    if entry is not None:
+        return entry["website"], entry
+    answer = ask(website_prompt(university_name))
+    entry = registry.record(university_name, answer)
+    if entry is None:
+        return answer, None
+    return entry["website"], entry
+
+
+def primary_domain(entry, website_url):
+    """Main allowed domain for prompts that restrict sources (e.g. 'k-state.edu')."""
+    domains = (entry or {}).get("allowed_domains")
+    return domains[0] if domains else registrable_domain(website_url) or website_url
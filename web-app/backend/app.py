@@ -1,8 +1,14 @@
-from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context, abort
+from werkzeug.utils import safe_join
 import sys
 import os
 import threading
 import json
+import asyncio
+import gzip
+import hashlib
+
+from jobs import FINISHED_STATUSES, JobLimitError, JobQueue
 
 # Add the directory containing the scraping script to sys.path
 # Assuming the structure:
@@ -14,11 +20,110 @@ OUTPUT_DIR = os.path.join(INSTITUTION_DIR, "Inst_outputs")
 sys.path.append(INSTITUTION_DIR)
 
 try:
-    from Institution import process_institution_extraction
+    from Institution import (
+        MAX_WORKERS, ensure_excel_output, latest_institution_result, process_institution_extraction,
+        process_institution_extraction_async,
+    )
+    from result_store import age_days
+    from batch_runner import BATCH_PARALLEL_UNIVERSITIES, new_batch_id, run_batch, university_job
 except ImportError as e:
     print(f"Error importing Institution script: {e}")
     # We will handle this error gracefully in the route if needed
 
+# "async" drives the asyncio extraction path on one shared event loop instead of
+# a thread pool per request; the request body can override it with {"async": true}
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "threads")
+
+_async_loop = None
+_async_loop_lock = threading.Lock()
+
+def get_async_loop():
+    """Start (once) and return the background event loop that runs async extractions."""
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            threading.Thread(target=_async_loop.run_forever, name="extraction-loop", daemon=True).start()
+    return _async_loop
+
+async def _next_update(agen):
+    return await agen.__anext__()
+
+def iterate_async_generator(agen):
+    """
+    Iterate an async generator from synchronous Flask code. If the SSE client goes away,
+    the generator is closed on the loop, which cancels its in-flight model calls.
+    """
+    loop = get_async_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(_next_update(agen), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Create (once) the job queue; jobs left running by a previous backend process resume then."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(run_job)
+    return _job_queue
+
+def download_links(files):
+    """Map output file paths of a complete event to their download URLs."""
+    return {key: f"/api/download/{os.path.basename(path)}" for key, path in files.items()}
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_BYTES = 1024
+
+# Comment lines sent on idle event streams so proxies and load balancers keep them open
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+def event_stream(generator):
+    """text/event-stream response that proxies do not buffer or cache."""
+    response = Response(stream_with_context(generator), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+def conditional_json_response(payload):
+    """
+    JSON response with a weak ETag: 304 when it matches If-None-Match, gzip-encoded when the
+    client accepts it. Clients revalidate on every use (Cache-Control: no-cache).
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+        if "gzip" in request.accept_encodings and len(body) >= GZIP_MIN_BYTES:
+            response.set_data(gzip.compress(body))
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_etag(etag, weak=True)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def stored_result_payload(result, fields=None):
+    """Read API view of a stored result; fields limits the record to those columns."""
+    record = result["record"]
+    if fields:
+        record = {column: record[column] for column in fields}
+    return {
+        "university_name": result["university_name"],
+        "extracted_at": result["extracted_at"],
+        "failed_fields": result["failed_fields"],
+        "record": record,
+        "files": download_links(result["files"]),
+    }
+
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../frontend")
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path="")
 
@@ -28,62 +133,260 @@ def index():
 
 @app.route("/api/download/<path:filename>")
 def download_file(filename):
+    if filename.endswith(".xlsx"):
+        # Workbooks are built from the run's JSON output on first download, then cached
+        excel_path = safe_join(OUTPUT_DIR, filename)
+        if excel_path is None:
+            abort(404)
+        try:
+            ensure_excel_output(excel_path)
+        except FileNotFoundError:
+            abort(404)
+        except ImportError:
+            return jsonify({"error": "Excel export needs openpyxl (pip install openpyxl); the CSV is available."}), 501
     return send_from_directory(OUTPUT_DIR, filename, as_attachment=True)
 
+URL_OPTIONS = (
+    "undergraduate_tuition_fee_urls",
+    "graduate_tuition_fee_urls",
+    "undergraduate_financial_aid_urls",
+    "graduate_financial_aid_urls",
+    "common_financial_aid_urls",
+    "common_tuition_fee_urls",
+)
+
+def run_job(name, options):
+    """Generator of the JSON updates of a queued job: one university, or a whole batch."""
+    if options.get("kind") == "batch":
+        return run_batch_job(options)
+    return run_extraction_job(name, options)
+
+def run_extraction_job(university_name, options):
+    """Generator of the JSON updates of one extraction job (run by the job queue's workers)."""
+    options = dict(options)
+    use_async = options.pop("async", EXTRACTION_MODE == "async")
+    max_workers = options.pop("max_workers", None)
+    if use_async:
+        generator = iterate_async_generator(
+            process_institution_extraction_async(university_name, **options)
+        )
+    else:
+        generator = process_institution_extraction(
+            university_name, max_workers=max_workers, **options
+        )
+    try:
+        for update in generator:
+            try:
+                update_obj = json.loads(update)
+            except json.JSONDecodeError:
+                # Fallback if raw string
+                yield json.dumps({'status': 'progress', 'message': update})
+                continue
+            # The final result gets download links; progress and per-field updates pass through
+            if update_obj.get("status") == "complete":
+                update_obj["files"] = download_links(update_obj["files"])
+                yield json.dumps(update_obj)
+            else:
+                yield update
+    finally:
+        generator.close()
+
+def run_batch_job(options):
+    """Generator of the JSON updates of a batch job; download links replace the file paths."""
+    generator = run_batch(
+        options["universities"],
+        batch_id=options["batch_id"],
+        parallel=options.get("parallel"),
+        batched=options.get("batched"),
+        retry_failed=options.get("retry_failed", False),
+        refresh=options.get("refresh", False),
+    )
+    try:
+        for update in generator:
+            update_obj = json.loads(update)
+            if update_obj.get("status") == "complete":
+                update_obj["files"] = download_links(update_obj["files"])
+            elif "university" in update_obj:
+                update_obj["university"]["files"] = download_links(update_obj["university"]["files"])
+            yield json.dumps(update_obj)
+    finally:
+        # Closing the batch early (the job was cancelled) stops its remaining universities
+        generator.close()
+
+def job_summary(job, joined=None):
+    summary = {
+        "job_id": job["id"],
+        "university_name": job["university_name"],
+        "status": job["status"],
+        "error": job["error"],
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+    if joined is not None:
+        summary["joined"] = joined
+    return summary
+
+def requested_max_workers(value, limit=None):
+    """
+    A worker count from a request, capped at limit (by default the server's MAX_WORKERS,
+    INSTITUTION_MAX_WORKERS), or None when not given. Raises ValueError unless it is a
+    positive integer.
+    """
+    if value in (None, ""):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    max_workers = int(value)
+    if max_workers < 1:
+        raise ValueError(value)
+    return min(max_workers, limit or MAX_WORKERS)
+
 @app.route("/api/extract", methods=["POST"])
 def extract_data():
-    data = request.json
-    university_name = data.get("university_name")
+    """
+    Enqueue an extraction job and return its ID (202). A request for a university that
+    already has a queued or running job with the same options joins that job.
+    Progress is streamed from /api/jobs/<id>/events.
+    With "max_age_days": N, a stored result at most N days old is returned right away
+    (200, "cached": true) instead of starting a job.
+    """
+    data = request.json or {}
+    university_name = (data.get("university_name") or "").strip()
     
     if not university_name:
         return jsonify({"error": "University name is required"}), 400
     
+    max_age_days = data.get("max_age_days")
+    if max_age_days not in (None, ""):
+        try:
+            max_age_days = float(max_age_days)
+        except (TypeError, ValueError):
+            return jsonify({"error": "max_age_days must be a number"}), 400
+        result = latest_institution_result(university_name)
+        if result is not None and age_days(result["extracted_at"]) <= max_age_days:
+            return jsonify(dict(stored_result_payload(result), cached=True, status="complete"))
+
+    try:
+        max_workers = requested_max_workers(data.get("max_workers"))
+    except ValueError:
+        return jsonify({"error": "max_workers must be a positive integer"}), 400
+
     # Optional parameters
-    undergraduate_tuition_fee_urls = data.get("undergraduate_tuition_fee_urls")
-    graduate_tuition_fee_urls = data.get("graduate_tuition_fee_urls")
-    undergraduate_financial_aid_urls = data.get("undergraduate_financial_aid_urls")
-    graduate_financial_aid_urls = data.get("graduate_financial_aid_urls")
-    common_financial_aid_urls = data.get("common_financial_aid_urls")
-    common_tuition_fee_urls = data.get("common_tuition_fee_urls")
+    options = {name: data.get(name) for name in URL_OPTIONS}
+    options.update(
+        batched=data.get("batched"),
+        retry_failed=data.get("retry_failed", False),
+        refresh=data.get("refresh", False),
+        max_workers=max_workers,
+    )
+    options["async"] = data.get("async", EXTRACTION_MODE == "async")
+
+    try:
+        job, joined = get_job_queue().submit(university_name, options)
+    except JobLimitError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "60"
+        return response, 429
+    return jsonify(job_summary(job, joined)), 202
+
+@app.route("/api/institutions/<path:university_name>")
+def get_institution(university_name):
+    """
+    Latest stored record of a university, without running the pipeline.
+    ?fields=CollegeName,City limits the record to those columns. Supports
+    If-None-Match (304) and gzip.
+    """
+    result = latest_institution_result(university_name)
+    if result is None:
+        return jsonify({"error": f"No stored result for {university_name}"}), 404
+    fields = [field.strip() for field in request.args.get("fields", "").split(",") if field.strip()]
+    unknown = [field for field in fields if field not in result["record"]]
+    if unknown:
+        return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+    return conditional_json_response(stored_result_payload(result, fields))
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id):
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job_summary(job))
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job_summary(job))
+
+@app.route("/api/jobs/<job_id>/events")
+def job_events(job_id):
+    """
+    Server-sent events of a job: every stored event, then live ones until the job ends.
+    Each event carries its sequence number as the SSE id, so a reconnecting EventSource
+    (Last-Event-ID) or ?after=<seq> only gets the events it has not seen. Disconnecting
+    does not affect the job. Idle streams get a comment line every SSE_HEARTBEAT_SECONDS.
+    """
+    queue = get_job_queue()
+    job = queue.store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    try:
+        after = int(request.headers.get("Last-Event-ID") or request.args.get("after") or 0)
+    except ValueError:
+        after = 0
 
     def generate():
-        try:
-            # Run extraction - now returns a generator
-            generator = process_institution_extraction(
-                university_name,
-                undergraduate_tuition_fee_urls=undergraduate_tuition_fee_urls,
-                graduate_tuition_fee_urls=graduate_tuition_fee_urls,
-                undergraduate_financial_aid_urls=undergraduate_financial_aid_urls,
-                graduate_financial_aid_urls=graduate_financial_aid_urls,
-                common_financial_aid_urls=common_financial_aid_urls,
-                common_tuition_fee_urls=common_tuition_fee_urls
-            )
-            
-            for update in generator:
-                # Assuming update is a JSON string already from the generator
-                # Check if it's the final result or a progress update
-                try:
-                    update_obj = json.loads(update)
-                    if update_obj.get("status") == "complete":
-                        # Modify result_files to return relative filenames for download
-                        download_links = {}
-                        for key, path in update_obj["files"].items():
-                            filename = os.path.basename(path)
-                            download_links[key] = f"/api/download/{filename}"
-                        update_obj["files"] = download_links
-                        yield f"data: {json.dumps(update_obj)}\n\n"
-                    else:
-                         yield f"data: {update}\n\n"
-                except json.JSONDecodeError:
-                    # Fallback if raw string
-                     yield f"data: {json.dumps({'status': 'progress', 'message': update})}\n\n"
-                     
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+        for seq, data in queue.follow(job_id, after, heartbeat_seconds=SSE_HEARTBEAT_SECONDS):
+            if seq is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {seq}\ndata: {data}\n\n"
+        final = queue.store.get(job_id)
+        if final is not None and final["status"] in FINISHED_STATUSES:
+            yield f"event: end\ndata: {json.dumps(job_summary(final))}\n\n"
+
+    return event_stream(generate())
+
+@app.route("/api/batch", methods=["POST"])
+def extract_batch():
+    """
+    Enqueue the extraction of many universities as one job and return its ID (202); the
+    batch runs through a shared worker pool and counts against MAX_ACTIVE_JOBS like any
+    other job. Progress is streamed from /api/jobs/<id>/events.
+    Body: {"universities": ["Name", {"university_name": ..., "<url field>": ...}, ...],
+           "batch_id": optional, "parallel": optional, "batched": optional, "retry_failed": optional,
+           "refresh": optional}
+    """
+    data = request.json or {}
+    universities = data.get("universities") or []
+    if not universities or not isinstance(universities, list):
+        return jsonify({"error": "A list of universities is required"}), 400
+    try:
+        universities = [university_job(item) for item in universities]
+    except (AttributeError, ValueError) as e:
+        return jsonify({"error": f"Invalid batch entry: {e}"}), 400
+    try:
+        parallel = requested_max_workers(data.get("parallel"), BATCH_PARALLEL_UNIVERSITIES)
+    except ValueError:
+        return jsonify({"error": "parallel must be a positive integer"}), 400
+
+    batch_id = data.get("batch_id") or new_batch_id()
+    options = {
+        "kind": "batch",
+        "universities": universities,
+        "batch_id": batch_id,
+        "parallel": parallel,
+        "batched": data.get("batched"),
+        "retry_failed": data.get("retry_failed", False),
+        "refresh": data.get("refresh", False),
+    }
+    try:
+        job, joined = get_job_queue().submit(f"Batch {batch_id}", options)
+    except JobLimitError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "60"
+        return response, 429
+    return jsonify(dict(job_summary(job, joined), batch_id=batch_id)), 202
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000, threaded=True)
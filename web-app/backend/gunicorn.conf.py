@@ -0,0 +1,27 @@
+"""
+Production server settings for the web backend:
+
+    cd web-app/backend && gunicorn -c gunicorn.conf.py app:app
+
+Extractions run as background jobs (jobs.py), so a request thread only holds an event
+stream that mostly sleeps until the job emits its next event. The gthread worker gives
+every open stream its own cheap thread; WEB_THREADS bounds how many streams (plus
+ordinary requests) one worker process serves at once.
+"""
+import os
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+worker_class = "gthread"
+# One process keeps every job, its worker pool and the process-wide rate limiter together.
+# More processes work (they share the SQLite job store and follow each other's jobs by
+# polling), but each then has its own rate limiter and JOB_WORKERS pool.
+workers = int(os.getenv("WEB_WORKERS", "1"))
+threads = int(os.getenv("WEB_THREADS", "256"))
+# The gthread worker's main loop reports liveness, so streams open for the whole
+# extraction do not trip this; heartbeats (SSE_HEARTBEAT_SECONDS) keep them open through proxies
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 75
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
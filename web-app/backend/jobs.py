@@ -0,0 +1,371 @@
+"""
+Background extraction jobs for the web backend.
+
+/api/extract enqueues a job instead of running the extraction inside the request, so a
+browser refresh or a proxy timeout no longer kills or orphans the run. Jobs and every
+event they emit are kept in SQLite; /api/jobs/<id>/events replays the stored events and
+then follows the live ones. A request for a university that already has a queued or
+running job with the same options joins that job instead of starting another run.
+"""
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MAIN_PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+DEFAULT_JOBS_PATH = os.path.join(MAIN_PROJECT_DIR, "University_Data", ".cache", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))
+# Queued + running jobs accepted at once; further new jobs are refused until some finish
+MAX_ACTIVE_JOBS = int(os.getenv("MAX_ACTIVE_JOBS", "20"))
+# Streams of jobs run by another backend process poll the store this often; streams of
+# this process's jobs are woken by its own events and only re-check the store this often
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+LOCAL_JOB_POLL_SECONDS = float(os.getenv("LOCAL_JOB_POLL_SECONDS", "15"))
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("complete", "failed", "cancelled")
+
+# Options that change how a job runs but not what it extracts; they do not stop a request from joining
+EXECUTION_OPTIONS = ("async", "max_workers", "parallel")
+
+
+class JobLimitError(RuntimeError):
+    """Raised for a new job while MAX_ACTIVE_JOBS jobs are already queued or running."""
+
+
+def job_key(university_name, options):
+    """Jobs with the same key extract the same data: same university (any case/spacing) and options."""
+    normalized = " ".join(university_name.lower().split())
+    relevant = {name: value for name, value in options.items() if name not in EXECUTION_OPTIONS}
+    payload = json.dumps([normalized, relevant], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# Random id of this process, so a restarted backend that gets the old hostname and PID
+# (e.g. PID 1 in a container) never takes the jobs of the dead process for its own
+_boot_ids = {}
+
+
+def process_owner():
+    """hostname:pid:boot id of this process."""
+    pid = os.getpid()
+    # Keyed by PID so forked worker processes each get their own id
+    boot_id = _boot_ids.setdefault(pid, uuid.uuid4().hex[:12])
+    return f"{socket.gethostname()}:{pid}:{boot_id}"
+
+
+def owner_is_alive(owner):
+    """Whether the process that owns a job still runs (owners on other hosts are assumed alive)."""
+    # Owners written before boot ids existed are hostname:pid
+    host, _, pid = owner.partition(":")
+    pid = pid.partition(":")[0]
+    if host != socket.gethostname():
+        return True
+    try:
+        pid = int(pid)
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        # Our own PID: the owner is this process only if it also has our boot id
+        return owner == process_owner()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """SQLite store of jobs and their events (the JSON updates of the extraction generator)."""
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " key TEXT NOT NULL,"
+            " university_name TEXT NOT NULL,"
+            " options TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " owner TEXT NOT NULL,"
+            " cancel_requested INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        # At most one queued/running job per key, also across backend processes
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_key ON jobs(key) WHERE status IN ('queued', 'running')"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " data TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (job_id, seq))"
+        )
+        self._conn.commit()
+
+    def _job(self, row):
+        if row is None:
+            return None
+        job_id, key, university_name, options, status, owner, cancel_requested, error, created_at, updated_at = row
+        return {
+            "id": job_id, "key": key, "university_name": university_name, "options": json.loads(options),
+            "status": status, "owner": owner, "cancel_requested": bool(cancel_requested), "error": error,
+            "created_at": created_at, "updated_at": updated_at,
+        }
+
+    def get(self, job_id):
+        with self._lock:
+            return self._job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def create_or_join(self, university_name, options, owner, max_active=None):
+        """
+        (job, joined): a new queued job, or the active job with the same key.
+        Raises JobLimitError instead of creating a job when max_active jobs are already active.
+        """
+        key = job_key(university_name, options)
+        now = time.time()
+        with self._lock:
+            active = self._conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+            ).fetchone()
+            if active is not None:
+                return self._job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (active[0],)).fetchone()), True
+            if max_active is not None:
+                count = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+                if count >= max_active:
+                    raise JobLimitError(f"{count} extraction jobs are already queued or running; try again later")
+            try:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, key, university_name, options, status, owner, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, key, university_name, json.dumps(options, default=str), owner, now, now),
+                )
+                self._conn.commit()
+                joined = False
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                job_id = self._conn.execute(
+                    "SELECT id FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)
+                ).fetchone()[0]
+                joined = True
+            return self._job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()), joined
+
+    def claim(self, job_id, owner):
+        """Mark a queued job running for owner; False if it was cancelled or claimed meanwhile."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                (owner, time.time(), job_id),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def finish(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def request_cancel(self, job_id):
+        """Flag a job for cancellation; a queued job is cancelled right away. Returns the job."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (now, job_id),
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            self._conn.commit()
+            return self._job(self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def cancel_requested(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def append_event(self, job_id, data):
+        """Store one event of a job; returns its sequence number (1, 2, ...)."""
+        with self._lock:
+            seq = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM job_events WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, seq, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, seq, data, time.time()),
+            )
+            self._conn.commit()
+        return seq
+
+    def events_after(self, job_id, seq):
+        """[(seq, data)] of the job's events after seq, in order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq)
+            ).fetchall()
+
+    def active_jobs(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        return [self._job(row) for row in rows]
+
+    def requeue(self, job_id, owner):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', owner = ?, updated_at = ? WHERE id = ?", (owner, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def prune(self, older_than_seconds):
+        """Delete finished jobs (and their events) last updated longer ago than older_than_seconds."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            old = [row[0] for row in self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('complete', 'failed', 'cancelled') AND updated_at < ?", (cutoff,)
+            ).fetchall()]
+            self._conn.executemany("DELETE FROM job_events WHERE job_id = ?", [(job_id,) for job_id in old])
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in old])
+            self._conn.commit()
+        return len(old)
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded worker pool. run_job(university_name, options) returns the
+    generator of JSON updates for one job; every update is stored as an event.
+    Jobs left active by a backend process that died are resumed (the extraction's run
+    journal keeps the fields they had already extracted).
+    """
+    def __init__(self, run_job, store=None, workers=None, max_active=None):
+        self.run_job = run_job
+        self.max_active = max_active or MAX_ACTIVE_JOBS
+        self.store = store or JobStore(os.getenv("JOBS_DB_PATH", DEFAULT_JOBS_PATH))
+        self.owner = process_owner()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers or JOB_WORKERS, thread_name_prefix="extraction-job")
+        self._changed = threading.Condition()
+        self._version = 0
+        pruned = self.store.prune(JOB_RETENTION_DAYS * 24 * 3600)
+        if pruned:
+            logger.info(f"Pruned {pruned} finished jobs older than {JOB_RETENTION_DAYS:g} days")
+        self._resume_orphaned_jobs()
+
+    def _resume_orphaned_jobs(self):
+        for job in self.store.active_jobs():
+            if owner_is_alive(job["owner"]):
+                continue
+            logger.info(f"Resuming job {job['id']} ({job['university_name']}) left by {job['owner']}")
+            self.store.requeue(job["id"], self.owner)
+            self._append(job["id"], json.dumps({"status": "progress", "message": "Backend restarted, resuming extraction..."}))
+            self._pool.submit(self._run, job["id"])
+
+    def _notify(self):
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+
+    def _append(self, job_id, data):
+        seq = self.store.append_event(job_id, data)
+        self._notify()
+        return seq
+
+    def submit(self, university_name, options):
+        """
+        (job, joined): enqueue an extraction, or join the active job for the same university
+        and options. Raises JobLimitError when the queue is full.
+        """
+        job, joined = self.store.create_or_join(university_name, options, self.owner, self.max_active)
+        if joined:
+            logger.info(f"Request for {university_name} joined active job {job['id']}")
+        else:
+            self._append(job["id"], json.dumps({"status": "progress", "message": "Queued extraction..."}))
+            self._pool.submit(self._run, job["id"])
+        return job, joined
+
+    def cancel(self, job_id):
+        job = self.store.request_cancel(job_id)
+        if job is not None and job["status"] == "cancelled":
+            self._append(job_id, json.dumps({"status": "cancelled", "message": "Extraction cancelled."}))
+        self._notify()
+        return job
+
+    def _run(self, job_id):
+        if not self.store.claim(job_id, self.owner):
+            return
+        job = self.store.get(job_id)
+        status, error = "complete", None
+        generator = None
+        try:
+            generator = self.run_job(job["university_name"], job["options"])
+            for update in generator:
+                self._append(job_id, update)
+                if self.store.cancel_requested(job_id):
+                    status = "cancelled"
+                    break
+        except Exception as e:
+            logger.exception(f"Job {job_id} ({job['university_name']}) failed")
+            status, error = "failed", str(e)
+            self._append(job_id, json.dumps({"error": str(e)}))
+        finally:
+            # Closing the generator early cancels its outstanding model calls
+            if generator is not None:
+                generator.close()
+        if status == "cancelled":
+            self._append(job_id, json.dumps({"status": "cancelled", "message": "Extraction cancelled."}))
+        self.store.finish(job_id, status, error)
+        self._notify()
+
+    def follow(self, job_id, after=0, poll_seconds=None, heartbeat_seconds=None):
+        """
+        Yield (seq, data) for the job's events after seq `after`: the stored ones first, then
+        live ones until the job finishes. A job run by this process wakes its streams when it
+        emits an event, so an idle stream only reads the store every LOCAL_JOB_POLL_SECONDS;
+        jobs run by another backend process are polled every poll_seconds (JOB_POLL_SECONDS).
+        With heartbeat_seconds, (None, None) is yielded after that long without an event so
+        the caller can keep an idle connection alive.
+        """
+        last_yield = time.monotonic()
+        while True:
+            with self._changed:
+                seen = self._version
+            job = self.store.get(job_id)
+            events = self.store.events_after(job_id, after)
+            for seq, data in events:
+                after = seq
+                last_yield = time.monotonic()
+                yield seq, data
+            if job is None or job["status"] in FINISHED_STATUSES:
+                return
+            if heartbeat_seconds is not None and time.monotonic() - last_yield >= heartbeat_seconds:
+                last_yield = time.monotonic()
+                yield None, None
+            if job["owner"] == self.owner:
+                timeout = LOCAL_JOB_POLL_SECONDS
+            else:
+                timeout = poll_seconds or JOB_POLL_SECONDS
+            if heartbeat_seconds is not None:
+                timeout = max(0, min(timeout, last_yield + heartbeat_seconds - time.monotonic()))
+            with self._changed:
+                if self._version == seen:
+                    self._changed.wait(timeout)
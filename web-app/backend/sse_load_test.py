@@ -0,0 +1,119 @@
+"""
+Load test for the job event streams: opens many concurrent /api/jobs/<id>/events streams
+against a running backend and reports how they held up.
+
+    python sse_load_test.py --streams 150 --university "Kansas State University"
+    python sse_load_test.py --streams 150 --job-id <id> --duration 120
+
+With --university a job is started (or joined) first; every stream follows that job from
+its first event. Streams end when the job ends or after --duration seconds.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def start_job(base_url, university_name):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request("POST", "/api/extract", json.dumps({"university_name": university_name}),
+                 {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    body = json.loads(response.read())
+    conn.close()
+    if response.status != 202:
+        raise SystemExit(f"Could not start a job ({response.status}): {body}")
+    return body["job_id"]
+
+
+class StreamResult:
+    def __init__(self):
+        self.connected = None
+        self.first_event = None
+        self.events = 0
+        self.heartbeats = 0
+        self.ended = False
+        self.error = None
+
+
+def follow_stream(base_url, job_id, duration, started, result):
+    """Read one event stream until the job ends, the duration passes or the connection fails."""
+    parts = urlsplit(base_url)
+    try:
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=duration + 30)
+        conn.request("GET", f"/api/jobs/{job_id}/events", headers={"Accept": "text/event-stream"})
+        response = conn.getresponse()
+        if response.status != 200:
+            result.error = f"HTTP {response.status}"
+            return
+        result.connected = time.monotonic() - started
+        deadline = started + duration
+        while time.monotonic() < deadline:
+            line = response.readline()
+            if not line:
+                break
+            if line.startswith(b": keep-alive"):
+                result.heartbeats += 1
+            elif line.startswith(b"data: "):
+                result.events += 1
+                if result.first_event is None:
+                    result.first_event = time.monotonic() - started
+            elif line.startswith(b"event: end"):
+                result.ended = True
+        conn.close()
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open many concurrent job event streams.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Backend base URL")
+    parser.add_argument("--streams", type=int, default=150, help="Concurrent event streams")
+    parser.add_argument("--job-id", help="Follow this job")
+    parser.add_argument("--university", help="Start (or join) an extraction for this university and follow it")
+    parser.add_argument("--duration", type=float, default=120, help="Seconds to keep the streams open at most")
+    args = parser.parse_args()
+    if not args.job_id and not args.university:
+        parser.error("give --job-id or --university")
+
+    job_id = args.job_id or start_job(args.url, args.university)
+    print(f"Following job {job_id} with {args.streams} concurrent streams...")
+    results = [StreamResult() for _ in range(args.streams)]
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=follow_stream, args=(args.url, job_id, args.duration, started, result), daemon=True)
+        for result in results
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    connected = [r.connected for r in results if r.connected is not None]
+    first_events = [r.first_event for r in results if r.first_event is not None]
+    errors = [r.error for r in results if r.error]
+    print(f"streams opened:      {len(connected)}/{args.streams} in {elapsed:.1f}s")
+    if connected:
+        print(f"connect time:        p50 {percentile(connected, 0.5) * 1000:.0f} ms, p95 {percentile(connected, 0.95) * 1000:.0f} ms")
+    if first_events:
+        print(f"first event:         p50 {percentile(first_events, 0.5) * 1000:.0f} ms, p95 {percentile(first_events, 0.95) * 1000:.0f} ms")
+    print(f"events per stream:   min {min((r.events for r in results), default=0)}, max {max((r.events for r in results), default=0)}")
+    print(f"heartbeats received: {sum(r.heartbeats for r in results)}")
+    print(f"streams ended:       {sum(r.ended for r in results)} (job finished), errors: {len(errors)}")
+    for error in sorted(set(errors))[:5]:
+        print(f"  {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 document.addEventListener('DOMContentLoaded', () => {
     const extractBtn = document.getElementById('extractBtn');
     const universityNameInput = document.getElementById('universityName');
+    const maxAgeDaysInput = document.getElementById('maxAgeDays');
     
     // URL Inputs
     const commonTuitionUrl = document.getElementById('commonTuitionUrl');
@@ -10,6 +11,24 @@ document.addEventListener('DOMContentLoaded', () => {
     const gradTuitionUrl = document.getElementById('gradTuitionUrl');
     const gradAidUrl = document.getElementById('gradAidUrl');
 
+    // Extractions run as server-side jobs; the page only follows their events, so a
+    // refresh re-attaches to the running job instead of killing it
+    const stopBtn = document.getElementById('stopBtn');
+    let currentJobId = null;
+    let eventSource = null;
+
+    stopBtn.addEventListener('click', async () => {
+        if (!currentJobId) return;
+        stopBtn.disabled = true;
+        try {
+            await fetch(`/api/jobs/${currentJobId}/cancel`, { method: 'POST' });
+        } finally {
+            stopBtn.disabled = false;
+        }
+    });
+
+    resumeActiveJob();
+
     extractBtn.addEventListener('click', async () => {
         const universityName = universityNameInput.value.trim();
         
@@ -28,7 +47,8 @@ document.addEventListener('DOMContentLoaded', () => {
             undergraduate_tuition_fee_urls: ugTuitionUrl.value.trim() || null,
             undergraduate_financial_aid_urls: ugAidUrl.value.trim() || null,
             graduate_tuition_fee_urls: gradTuitionUrl.value.trim() || null,
-            graduate_financial_aid_urls: gradAidUrl.value.trim() || null
+            graduate_financial_aid_urls: gradAidUrl.value.trim() || null,
+            max_age_days: maxAgeDaysInput.value.trim() || null
         };
 
         // UI State: Processing
@@ -37,50 +57,24 @@ document.addEventListener('DOMContentLoaded', () => {
         log(`Starting extraction for ${universityName}...`);
         
         try {
-            const startTime = Date.now();
-            
             const response = await fetch('/api/extract', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(payload)
             });
 
+            const result = await response.json();
             if (!response.ok) {
-                 const result = await response.json();
                  throw new Error(result.error || 'Server error');
             }
-
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-            let buffer = '';
-
-            while (true) {
-                const { done, value } = await reader.read();
-                if (done) break;
-                
-                buffer += decoder.decode(value, { stream: true });
-                const lines = buffer.split('\n\n');
-                buffer = lines.pop(); // Keep incomplete chunk
-
-                for (const line of lines) {
-                    if (line.startsWith('data: ')) {
-                        const data = JSON.parse(line.slice(6));
-                        
-                        if (data.status === 'progress') {
-                             log(data.message, 'system');
-                        } else if (data.status === 'complete') {
-                             const duration = ((Date.now() - startTime) / 1000).toFixed(1);
-                             log(`Extraction completed in ${duration}s`, 'success');
-                             setStatus('Success', 'success');
-                             showResults(data.files);
-                             setLoading(false);
-                             return;
-                        } else if (data.error) {
-                             throw new Error(data.error);
-                        }
-                    }
-                }
+            if (result.cached) {
+                showStoredResult(result);
+                return;
+            }
+            if (result.joined) {
+                log(`An extraction for ${result.university_name} is already running, following it...`, 'system');
             }
+            followJob(result.job_id);
 
         } catch (error) {
             console.error(error);
@@ -90,6 +84,91 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    function followJob(jobId) {
+        const startTime = Date.now();
+        currentJobId = jobId;
+        localStorage.setItem('activeJobId', jobId);
+
+        // EventSource reconnects by itself and sends Last-Event-ID, so no event is repeated or lost
+        eventSource = new EventSource(`/api/jobs/${jobId}/events`);
+
+        eventSource.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+
+            if (data.status === 'progress') {
+                 log(data.message, 'system');
+            } else if (data.status === 'field') {
+                 addField(data);
+            } else if (data.status === 'complete') {
+                 const duration = ((Date.now() - startTime) / 1000).toFixed(1);
+                 log(`Extraction completed in ${duration}s`, 'success');
+                 if (data.record) {
+                     const columns = Object.values(data.record);
+                     const filled = columns.filter(value => value !== null && value !== '').length;
+                     log(`${filled} of ${columns.length} columns filled, ${data.failed_fields || 0} fields failed`, 'system');
+                 }
+                 setStatus('Success', 'success');
+                 showResults(data.files);
+                 finishJob();
+            } else if (data.status === 'cancelled') {
+                 log(data.message || 'Extraction stopped.', 'error');
+                 setStatus('Stopped', 'error');
+                 finishJob();
+            } else if (data.error) {
+                 log(`Error: ${data.error}`, 'error');
+                 setStatus('Failed', 'error');
+                 finishJob();
+            }
+        };
+
+        // Sent once the job has ended; stops the browser from reconnecting
+        eventSource.addEventListener('end', (event) => {
+            if (currentJobId !== jobId) return;
+            const job = JSON.parse(event.data);
+            setStatus(job.status === 'complete' ? 'Success' : 'Failed', job.status === 'complete' ? 'success' : 'error');
+            finishJob();
+        });
+    }
+
+    function showStoredResult(result) {
+        const extractedAt = new Date(result.extracted_at).toLocaleString();
+        log(`Using the stored result extracted on ${extractedAt}`, 'success');
+        for (const [column, value] of Object.entries(result.record)) {
+            addField({ section: 'stored', field: column, column, value, evidence: [] });
+        }
+        setStatus('Stored result', 'success');
+        showResults(result.files);
+        setLoading(false);
+    }
+
+    function finishJob() {
+        if (eventSource) eventSource.close();
+        eventSource = null;
+        currentJobId = null;
+        localStorage.removeItem('activeJobId');
+        setLoading(false);
+    }
+
+    async function resumeActiveJob() {
+        const jobId = localStorage.getItem('activeJobId');
+        if (!jobId) return;
+        try {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            const job = await response.json();
+            if (!response.ok || !['queued', 'running'].includes(job.status)) {
+                localStorage.removeItem('activeJobId');
+                return;
+            }
+            universityNameInput.value = job.university_name;
+            setLoading(true);
+            setStatus('Processing', 'initializing');
+            log(`Re-attached to the extraction for ${job.university_name}...`);
+            followJob(jobId);
+        } catch (error) {
+            console.error(error);
+        }
+    }
+
     // --- Helper Functions ---
 
     function setLoading(isLoading) {
@@ -100,13 +179,18 @@ document.addEventListener('DOMContentLoaded', () => {
         if (isLoading) {
             loader.classList.remove('hidden');
             text.textContent = 'Processing...';
+            stopBtn.classList.remove('hidden');
             document.getElementById('statusArea').classList.remove('hidden');
             document.getElementById('results').classList.add('hidden');
+            document.getElementById('fieldsArea').classList.add('hidden');
+            document.getElementById('fieldRows').innerHTML = ''; // Clear old fields
+            document.getElementById('fieldCount').textContent = '';
             document.getElementById('logs').innerHTML = ''; // Clear old logs
             window.scrollTo({ top: document.body.scrollHeight, behavior: 'smooth' });
         } else {
             loader.classList.add('hidden');
             text.textContent = 'Extract Data';
+            stopBtn.classList.add('hidden');
         }
     }
 
@@ -125,6 +209,46 @@ document.addEventListener('DOMContentLoaded', () => {
         logs.scrollTop = logs.scrollHeight;
     }
 
+    function addField(data) {
+        const rows = document.getElementById('fieldRows');
+        document.getElementById('fieldsArea').classList.remove('hidden');
+
+        const row = document.createElement('tr');
+        const hasValue = data.value !== null && data.value !== '';
+        if (data.failure) {
+            row.className = 'failed';
+        } else if (!hasValue) {
+            row.className = 'empty';
+        }
+
+        const name = document.createElement('td');
+        name.textContent = data.column;
+        name.title = `${data.section} / ${data.field}`;
+
+        const value = document.createElement('td');
+        if (data.failure) {
+            value.textContent = `Failed: ${data.failure.error_type}`;
+            value.title = data.failure.error;
+        } else {
+            value.textContent = hasValue ? data.value : '—';
+        }
+
+        const evidence = document.createElement('td');
+        for (const url of data.evidence || []) {
+            const link = document.createElement('a');
+            link.href = url;
+            link.target = '_blank';
+            link.rel = 'noopener noreferrer';
+            link.textContent = url;
+            evidence.appendChild(link);
+            evidence.appendChild(document.createElement('br'));
+        }
+
+        row.append(name, value, evidence);
+        rows.appendChild(row);
+        document.getElementById('fieldCount').textContent = `(${rows.children.length})`;
+    }
+
     function showResults(files) {
         const container = document.getElementById('results');
         const list = document.getElementById('fileList');